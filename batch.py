@@ -0,0 +1,287 @@
+"""Module for playing many games at once, for play-testing and training agents.
+
+GameBatch keeps N independent games of one world as NumPy arrays, one per
+part of the state, and step() applies an array of actions to all of them
+with a few vectorized operations. The rules are not written out here: they
+come from solver.Model, which works them out from the world's caves and
+characters with the game's own checks, and are laid out as lookup tables
+indexed by cave.
+
+    cave          int32 per game
+    inventory     uint64 bitmask per game, bit i for item i (see items)
+    health        int8 per game
+    enemy_alive   bitset per game, one bit per enemy (see enemy_slot)
+    quest_done    bitset per game, one bit per person (see person_slot)
+    item_taken    bitset per game, one bit per cave item (see item_slot)
+    outcome       int8 per game: PLAYING, WON or DEAD
+
+Bitsets are rows of uint64 words. A batch of a large generated world holds
+a bit per game for every enemy, person and item in it, so it takes about
+N * (enemies + people + items) / 8 bytes.
+
+Actions are the commands that change the state: MOVE (first is an index
+into directions), PICKUP, FIGHT (first is an item id, and second the other
+item against the boss) and GIVE (first is an item id). They play out as in
+GameSession, including doing nothing when the game would only say why not.
+
+Needs NumPy, which the rest of the game does not.
+"""
+
+import numpy as np
+
+import health
+from cave import DIRECTIONS
+from solver import Model
+
+MOVE, PICKUP, FIGHT, GIVE = range(4)
+ACTIONS = ("move", "pickup", "fight", "give")
+PLAYING, WON, DEAD = range(3)
+MAX_ITEMS = 64
+
+
+def _words(bits: int):
+    """Return how many uint64 words a bitset of this many bits takes."""
+    return max(1, (bits + 63) // 64)
+
+
+def _test(bitset, rows, slots):
+    """Return whether bit slots[k] is set in row rows[k] of a bitset, as a bool array."""
+    words = bitset[rows, slots >> 6]
+    return (words >> (slots & 63).astype(np.uint64)) & np.uint64(1) != 0
+
+
+def _set(bitset, rows, slots):
+    """Set bit slots[k] in row rows[k] of a bitset."""
+    bitset[rows, slots >> 6] |= np.uint64(1) << (slots & 63).astype(np.uint64)
+
+
+def _clear(bitset, rows, slots):
+    """Clear bit slots[k] in row rows[k] of a bitset."""
+    bitset[rows, slots >> 6] &= ~(np.uint64(1) << (slots & 63).astype(np.uint64))
+
+
+def _full(bits: int):
+    """Return a bitset row with the first bits set."""
+    row = np.zeros(_words(bits), dtype=np.uint64)
+    for slot in range(bits):
+        row[slot >> 6] |= np.uint64(1 << (slot & 63))
+    return row
+
+
+class GameBatch:
+    """Class holding a batch of games of one world as arrays."""
+
+    def __init__(self, world, size: int, model: Model | None = None):
+        """
+        Initialize a GameBatch, with every game at its start.
+
+        Args:
+            world (World): The world every game is played in.
+            size (int): How many games to play at once.
+            model (Model): The world's rules, if already worked out.
+        Raises:
+            ValueError: If the world has more than MAX_ITEMS kinds of item.
+        """
+        model = model or Model(world)
+        if len(model.items) > MAX_ITEMS:
+            raise ValueError(
+                f"a batch holds at most {MAX_ITEMS} kinds of item, not {len(model.items)}"
+            )
+        caves = len(model.names)
+        self.size = size
+        self.names = model.names
+        self.items = model.items
+        self.item_ids = {name: number for number, name in enumerate(model.items)}
+        self.start = model.start
+        self.start_inventory = np.uint64(model.start_inventory)
+
+        seen = {direction for exits in model.exits for _, (_, direction) in exits}
+        self.directions = [d for d in DIRECTIONS if d in seen] + sorted(seen - set(DIRECTIONS))
+        direction_ids = {direction: number for number, direction in enumerate(self.directions)}
+        # Where moving in each direction leads from each cave, or -1 to stay put.
+        self.exits = np.full((caves, max(1, len(self.directions))), -1, dtype=np.int32)
+        for cave, exits in enumerate(model.exits):
+            for destination, (_, direction) in exits:
+                self.exits[cave, direction_ids[direction]] = destination
+
+        # Per cave: the bit of its item and the item's slot in item_taken (-1 if none),
+        # its enemy's slot in enemy_alive, the items that defeat it and its drop,
+        # and its person's slot in quest_done, the items they want and the reward.
+        self.item_bit = np.array(model.cave_items, dtype=np.uint64)
+        self.item_slot = np.full(caves, -1, dtype=np.int64)
+        self.enemy_slot = np.full(caves, -1, dtype=np.int64)
+        self.weakness = np.zeros(caves, dtype=np.uint64)
+        self.drop = np.zeros(caves, dtype=np.uint64)
+        self.person_slot = np.full(caves, -1, dtype=np.int64)
+        self.wanted = np.zeros(caves, dtype=np.uint64)
+        self.reward = np.zeros(caves, dtype=np.uint64)
+        # Per cave, the boss's index into boss_wins, which is True for each
+        # pair of item ids that defeats it.
+        self.boss_slot = np.full(caves, -1, dtype=np.int64)
+        bosses = [cave for cave in range(caves) if model.bosses[cave] is not None]
+        self.boss_wins = np.zeros((len(bosses), len(self.items), len(self.items)), dtype=bool)
+        counts = [0, 0, 0]
+        for cave in range(caves):
+            if model.cave_items[cave]:
+                self.item_slot[cave] = counts[0]
+                counts[0] += 1
+            if model.enemies[cave] is not None:
+                self.enemy_slot[cave] = counts[1]
+                counts[1] += 1
+                self.weakness[cave], self.drop[cave] = model.enemies[cave]
+            if model.people[cave] is not None:
+                self.person_slot[cave] = counts[2]
+                counts[2] += 1
+                self.wanted[cave], self.reward[cave] = model.people[cave]
+        for number, cave in enumerate(bosses):
+            self.boss_slot[cave] = number
+            for pair, _ in model.bosses[cave]:
+                first, second = (index for index in range(len(self.items)) if pair >> index & 1)
+                self.boss_wins[number, first, second] = True
+                self.boss_wins[number, second, first] = True
+        item_count, enemy_count, person_count = counts
+        self._all_enemies = _full(enemy_count)
+
+        self.cave = np.empty(size, dtype=np.int32)
+        self.inventory = np.empty(size, dtype=np.uint64)
+        self.health = np.empty(size, dtype=np.int8)
+        self.outcome = np.empty(size, dtype=np.int8)
+        self.enemy_alive = np.empty((size, _words(enemy_count)), dtype=np.uint64)
+        self.quest_done = np.empty((size, _words(person_count)), dtype=np.uint64)
+        self.item_taken = np.empty((size, _words(item_count)), dtype=np.uint64)
+        self.reset()
+
+    def reset(self, games=None):
+        """
+        Start games again from the beginning.
+
+        Args:
+            games (array): Indices or a boolean mask of the games to reset.
+                Defaults to every game.
+        """
+        games = slice(None) if games is None else games
+        self.cave[games] = self.start
+        self.inventory[games] = self.start_inventory
+        self.health[games] = health.STARTING_HEALTH
+        self.outcome[games] = PLAYING
+        self.enemy_alive[games] = self._all_enemies
+        self.quest_done[games] = 0
+        self.item_taken[games] = 0
+
+    @property
+    def done(self):
+        """Return a boolean array of the games that have been won or lost."""
+        return self.outcome != PLAYING
+
+    def step(self, actions, first=None, second=None):
+        """
+        Take one action in every game. Games that are over are left as they are.
+
+        Args:
+            actions (array): An action (MOVE, PICKUP, FIGHT or GIVE) per game.
+            first (array): Per game, the direction id to move in, or the item
+                id to fight with or give. Ignored by PICKUP.
+            second (array): Per game, the other item id to fight the boss with.
+        Returns:
+            array: The outcome of every game, PLAYING, WON or DEAD.
+        Raises:
+            ValueError: If an action, direction or item id is out of range.
+        """
+        actions = np.asarray(actions)
+        zeros = np.zeros(self.size, dtype=np.int64)
+        first = zeros if first is None else np.asarray(first, dtype=np.int64)
+        second = zeros if second is None else np.asarray(second, dtype=np.int64)
+        if actions.shape != (self.size,) or first.shape != actions.shape:
+            raise ValueError(f"expected one action per game ({self.size})")
+        if actions.min() < 0 or actions.max() >= len(ACTIONS):
+            raise ValueError("unknown action")
+        items = max(1, len(self.items))
+        limit = np.where(actions == MOVE, self.exits.shape[1], items)
+        used = actions != PICKUP
+        if (first[used] < 0).any() or (first[used] >= limit[used]).any():
+            raise ValueError("direction or item id out of range")
+        if (second < 0).any() or (second >= items).any():
+            raise ValueError("item id out of range")
+
+        live = self.outcome == PLAYING
+        rows = np.flatnonzero(live & (actions == MOVE))
+        self._move(rows, first[rows])
+        rows = np.flatnonzero(live & (actions == PICKUP))
+        self._pickup(rows)
+        rows = np.flatnonzero(live & (actions == FIGHT))
+        self._fight(rows, first[rows], second[rows])
+        rows = np.flatnonzero(live & (actions == GIVE))
+        self._give(rows, first[rows])
+        return self.outcome
+
+    def _held(self, rows, items):
+        """Return whether each game holds an item, as a bool array."""
+        return (self.inventory[rows] >> items.astype(np.uint64)) & np.uint64(1) != 0
+
+    def _enemy_alive(self, rows, caves):
+        """Return whether each game's cave has an enemy still alive."""
+        slots = self.enemy_slot[caves]
+        alive = slots >= 0
+        alive[alive] = _test(self.enemy_alive, rows[alive], slots[alive])
+        return alive
+
+    def _hurt(self, rows, amount: int):
+        """Take damage in some games, ending those it kills (see health.update)."""
+        hp = self.health[rows]
+        died = hp <= amount
+        self.health[rows] = np.where(died, 0, hp - amount)
+        self.outcome[rows[died]] = DEAD
+
+    def _move(self, rows, directions):
+        """Move in a direction, staying put if there is no way that way."""
+        destinations = self.exits[self.cave[rows], directions]
+        moved = destinations >= 0
+        self.cave[rows[moved]] = destinations[moved]
+
+    def _pickup(self, rows):
+        """Pick up the cave's item, or be hurt by the enemy guarding it."""
+        caves = self.cave[rows]
+        slots = self.item_slot[caves]
+        there = slots >= 0
+        there[there] = ~_test(self.item_taken, rows[there], slots[there])
+        rows, caves, slots = rows[there], caves[there], slots[there]
+        guarded = self._enemy_alive(rows, caves) | (self.boss_slot[caves] >= 0)
+        self._hurt(rows[guarded], 1)
+        free = ~guarded
+        self.inventory[rows[free]] |= self.item_bit[caves[free]]
+        _set(self.item_taken, rows[free], slots[free])
+
+    def _fight(self, rows, first, second):
+        """Fight the cave's enemy with an item, or its boss with two."""
+        caves = self.cave[rows]
+        held = self._held(rows, first)
+
+        enemy = held & self._enemy_alive(rows, caves)
+        enemy_rows, enemy_caves, items = rows[enemy], caves[enemy], first[enemy]
+        won = (self.weakness[enemy_caves] >> items.astype(np.uint64)) & np.uint64(1) != 0
+        _clear(self.enemy_alive, enemy_rows[won], self.enemy_slot[enemy_caves[won]])
+        self.inventory[enemy_rows[won]] |= self.drop[enemy_caves[won]]
+        # Losing a fight ends the game, even if the damage alone would not.
+        self._hurt(enemy_rows[~won], 2)
+        self.outcome[enemy_rows[~won]] = DEAD
+
+        boss = held & (self.boss_slot[caves] >= 0) & self._held(rows, second)
+        boss_rows = rows[boss]
+        won = self.boss_wins[self.boss_slot[caves[boss]], first[boss], second[boss]]
+        self.outcome[boss_rows] = np.where(won, WON, DEAD)
+
+    def _give(self, rows, items):
+        """Give an item to the cave's inhabitant: enemies hurt, people may reward."""
+        caves = self.cave[rows]
+        held = self._held(rows, items)
+        rows, caves, items = rows[held], caves[held], items[held]
+
+        hostile = self._enemy_alive(rows, caves) | (self.boss_slot[caves] >= 0)
+        self._hurt(rows[hostile], 2)
+
+        wanted = self.person_slot[caves] >= 0
+        wanted[wanted] = (
+            (self.wanted[caves[wanted]] >> items[wanted].astype(np.uint64)) & np.uint64(1) != 0
+        )
+        self.inventory[rows[wanted]] |= self.reward[caves[wanted]]
+        _set(self.quest_done, rows[wanted], self.person_slot[caves[wanted]])
@@ -0,0 +1,160 @@
+"""Benchmark: stepping many games at once with GameBatch.
+
+Plays random actions in a batch of games, restarting each game as it ends,
+and reports game steps per second against GameSession playing the same kind
+of random game one command at a time. First it checks the batch against
+GameSession: games are played in both side by side, with the same actions,
+and their states compared after every step.
+
+Run from the repository root:
+    python -m benchmarks.batch [--world default|SIZE] [--games 100000] [--steps 100]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from batch import ACTIONS, DEAD, FIGHT, GIVE, MOVE, PLAYING, WON, GameBatch
+from generator import generate_world
+from session import GameSession
+from world import build_world
+
+OUTCOMES = {None: PLAYING, "win": WON, "dead": DEAD}
+
+
+def random_actions(batch, rng):
+    """Return random (actions, first, second) arrays for every game in a batch."""
+    actions = rng.integers(0, len(ACTIONS), batch.size)
+    limits = np.where(actions == MOVE, len(batch.directions), len(batch.items))
+    first = (rng.random(batch.size) * limits).astype(np.int64)
+    second = rng.integers(0, len(batch.items), batch.size)
+    return actions, first, second
+
+
+def play_session(session, batch, action: int, first: int, second: int):
+    """Take an action in a GameSession by typing the commands for it."""
+    inhabitant = session.current_cave.get_character()
+    if action == MOVE:
+        lines = ["move", batch.directions[first]]
+    elif action == FIGHT and hasattr(inhabitant, "is_boss"):
+        lines = ["fight", f"{batch.items[first]}, {batch.items[second]}"]
+    elif action in (FIGHT, GIVE):
+        lines = [ACTIONS[action], batch.items[first]]
+    else:
+        lines = [ACTIONS[action]]
+    # Stop once the session is back at a turn: it did not ask for the rest.
+    session.step(lines[0])
+    for line in lines[1:]:
+        if session.over or session.at_turn_start:
+            break
+        session.step(line)
+
+
+def session_state(session):
+    """Return (cave name, item names, health, outcome) of a GameSession."""
+    return (
+        session.current_cave.get_name(),
+        set(session.inventory.stacks),
+        session.health,
+        OUTCOMES[session.outcome],
+    )
+
+
+def batch_state(batch, game: int):
+    """Return (cave name, item names, health, outcome) of one game in a batch."""
+    inventory = int(batch.inventory[game])
+    return (
+        batch.names[batch.cave[game]],
+        {name for number, name in enumerate(batch.items) if inventory >> number & 1},
+        int(batch.health[game]),
+        int(batch.outcome[game]),
+    )
+
+
+def check(world, games: int, steps: int, seed: int):
+    """
+    Play games in a GameBatch and in GameSessions side by side, comparing states.
+
+    Raises:
+        AssertionError: At the first step where a game's states differ.
+    """
+    rng = np.random.default_rng(seed)
+    batch = GameBatch(world, games)
+    sessions = [GameSession(world) for _ in range(games)]
+    for session in sessions:
+        session.start(show_tutorial=False)
+    for step in range(steps):
+        actions, first, second = random_actions(batch, rng)
+        for game, session in enumerate(sessions):
+            if actions[game] == MOVE:
+                # With one way out, move takes it without asking which way.
+                exits = session.current_cave.get_exits()
+                if len(exits) == 1:
+                    first[game] = batch.directions.index(exits[0][0])
+            if not session.over:
+                play_session(session, batch, actions[game], first[game], second[game])
+        batch.step(actions, first, second)
+        for game, session in enumerate(sessions):
+            expected, got = session_state(session), batch_state(batch, game)
+            assert expected == got, (
+                f"game {game} differs after step {step} ({ACTIONS[actions[game]]} "
+                f"{first[game]} {second[game]}):\n  session {expected}\n  batch   {got}"
+            )
+    won = int(np.count_nonzero(batch.outcome == WON))
+    lost = int(np.count_nonzero(batch.outcome == DEAD))
+    print(f"checked {games} games x {steps} steps against GameSession: {won} won, {lost} lost")
+
+
+def batch_steps_per_s(world, games: int, steps: int, seed: int):
+    """Return game steps per second for random play in a GameBatch."""
+    rng = np.random.default_rng(seed)
+    batch = GameBatch(world, games)
+    moves = [random_actions(batch, rng) for _ in range(steps)]
+    start = time.perf_counter()
+    for actions, first, second in moves:
+        batch.step(actions, first, second)
+        batch.reset(batch.done)
+    return games * steps / (time.perf_counter() - start)
+
+
+def session_steps_per_s(world, steps: int, seed: int):
+    """Return game steps per second for the same random play, one GameSession at a time."""
+    rng = np.random.default_rng(seed)
+    batch = GameBatch(world, steps)
+    actions, first, second = random_actions(batch, rng)
+    session = GameSession(world)
+    session.start(show_tutorial=False)
+    start = time.perf_counter()
+    for action, one, other in zip(actions.tolist(), first.tolist(), second.tolist()):
+        if session.over:
+            session = GameSession(world)
+            session.start(show_tutorial=False)
+        play_session(session, batch, action, one, other)
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--world", default="default", help='"default" or a generated size')
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--check-games", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.world == "default":
+        world = build_world()
+    else:
+        world = generate_world(args.seed, int(args.world), int(args.world))
+    check(world, args.check_games, 50, args.seed)
+
+    batched = batch_steps_per_s(world, args.games, args.steps, args.seed)
+    single = session_steps_per_s(world, 50_000, args.seed)
+    print(f"GameSession: {single:14,.0f} steps/s")
+    print(f"GameBatch:   {batched:14,.0f} steps/s ({batched / single:,.0f}x), {args.games:,} games")
+
+
+if __name__ == "__main__":
+    main()
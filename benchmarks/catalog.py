@@ -0,0 +1,63 @@
+"""Benchmark: loading locale catalogs and filling in messages.
+
+Measures the time and memory each locale takes to load, what a message costs
+to fill in compared with an f-string and str.format, and checks that sessions
+playing in different languages share one catalog per locale.
+
+Run from the repository root:
+    python -m benchmarks.catalog
+"""
+
+import gc
+import json
+import time
+import timeit
+import tracemalloc
+
+import catalog
+from session import GameSession
+
+TEMPLATE = "You wander through a tunnel and reach the {name}."
+
+
+def per_call_ns(function, calls: int = 200_000):
+    """Return the fastest time per call of function, in nanoseconds."""
+    return min(timeit.repeat(function, number=calls, repeat=5)) / calls * 1e9
+
+
+def main():
+    """Print the results."""
+    for locale in catalog.available():
+        gc.collect()
+        tracemalloc.start()
+        loaded = catalog.load(locale)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # Time compiling it again without tracemalloc, which slows it down.
+        messages = json.loads((catalog.LOCALE_DIR / f"{locale}.json").read_text(encoding="utf-8"))
+        fallback = catalog.load() if locale != catalog.DEFAULT_LOCALE else None
+        start = time.perf_counter()
+        catalog.compile_catalog(locale, messages, fallback)
+        seconds = time.perf_counter() - start
+        print(
+            f"compile {locale}: {seconds * 1000:.2f} ms, {size / 1024:.0f} KiB, "
+            f"{len(loaded.templates)} messages"
+        )
+
+    with catalog.using("en"):
+        print(f"tr, no fields:   {per_call_ns(lambda: catalog.tr('cave.no_path')):6.0f} ns")
+        print(f"tr, one field:   {per_call_ns(lambda: catalog.tr('cave.moved', name='grotto')):6.0f} ns")
+    print(f"str.format:      {per_call_ns(lambda: TEMPLATE.format(name='grotto')):6.0f} ns")
+    name = "grotto"
+    print(f"f-string:        {per_call_ns(lambda: f'You wander through a tunnel and reach the {name}.'):6.0f} ns")
+
+    locales = catalog.available()
+    sessions = [GameSession(locale=locales[index % len(locales)]) for index in range(1000)]
+    for session in sessions:
+        session.start(show_tutorial=False)
+    shared = len({id(catalog.load(session.locale)) for session in sessions})
+    print(f"1000 sessions in {len(locales)} languages use {shared} catalogs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark: memory and access speed of very large cave worlds.
+
+Builds a square grid of caves, linked north/east/south/west, once with a links
+dict on every Cave and once with a shared CaveGraph, then reports bytes per
+cave, build time, and the speed of attribute access and link lookups.
+
+Run from the repository root:
+    python -m benchmarks.cave_memory [--caves 1000000]
+"""
+
+import argparse
+import gc
+import math
+import random
+import time
+import tracemalloc
+
+from cave import Cave, CaveGraph
+
+
+def build_grid(count: int, compact: bool):
+    """
+    Build a square grid of about count caves.
+
+    Args:
+        count (int): Number of caves wanted.
+        compact (bool): Use a CaveGraph instead of a links dict per cave.
+    Returns:
+        list: The caves, row by row.
+    """
+    side = math.isqrt(count)
+    graph = CaveGraph() if compact else None
+    caves = []
+    for index in range(side * side):
+        cave = graph.add_cave(f"cave {index}") if compact else Cave(f"cave {index}")
+        cave.set_description("A damp and dirty cave.")
+        caves.append(cave)
+    for index, cave in enumerate(caves):
+        row, column = divmod(index, side)
+        if row > 0:
+            cave.link_cave(caves[index - side], "north")
+        if column < side - 1:
+            cave.link_cave(caves[index + 1], "east")
+        if row < side - 1:
+            cave.link_cave(caves[index + side], "south")
+        if column > 0:
+            cave.link_cave(caves[index - 1], "west")
+    return caves
+
+
+def measure(count: int, compact: bool, steps: int):
+    """Build one grid and return (bytes per cave, build seconds, access ns, walk ns)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    caves = build_grid(count, compact)
+    build = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for cave in caves:
+        cave.get_name()
+        cave.get_description()
+        cave.get_item()
+    access = (time.perf_counter() - start) / len(caves) * 1e9
+
+    rng = random.Random(0)
+    directions = [rng.choice(("north", "east", "south", "west")) for _ in range(steps)]
+    cave = caves[len(caves) // 2]
+    start = time.perf_counter()
+    for direction in directions:
+        cave = cave.get_linked_cave(direction) or cave
+    walk = (time.perf_counter() - start) / steps * 1e9
+    return used / len(caves), build, access, walk
+
+
+def main():
+    """Parse the command line and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--caves", type=int, default=1_000_000)
+    parser.add_argument("--steps", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'layout':>8} {'bytes/cave':>11} {'build s':>8} {'get_* ns':>9} {'link ns':>8}")
+    for compact in (False, True):
+        per_cave, build, access, walk = measure(args.caves, compact, args.steps)
+        layout = "graph" if compact else "dict"
+        print(f"{layout:>8} {per_cave:>11,.0f} {build:>8.2f} {access:>9.0f} {walk:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark: narrative text held as strings versus in a content pack.
+
+Makes a large set of cave descriptions, then compares the memory of holding
+them as Python strings with holding Text handles into a content pack, and
+reports the pack's size and the speed of reading texts back.
+
+Run from the repository root:
+    python -m benchmarks.content [--texts 200000]
+"""
+
+import argparse
+import gc
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from content import ContentStore, write_pack
+
+WORDS = (
+    "damp dark narrow echoing vast flooded mossy crystal ancient collapsed "
+    "tunnel cavern grotto passage chamber water drips from the ceiling and "
+    "a cold wind blows through cracks in the rock while bats stir above"
+).split()
+
+
+def make_texts(count: int, seed: int):
+    """Return count pseudo-random descriptions of 30 to 80 words."""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choices(WORDS, k=rng.randint(30, 80))).capitalize() + "."
+        for _ in range(count)
+    ]
+
+
+def held_memory(build):
+    """Return the bytes still allocated by build() while its result is alive."""
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return used
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=200_000)
+    parser.add_argument("--reads", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.seed)
+    raw = sum(len(text.encode()) for text in texts)
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "bench.pack"
+        start = time.perf_counter()
+        write_pack(path, texts)
+        written = time.perf_counter() - start
+
+        as_strings = held_memory(lambda: [text.encode().decode() for text in texts])
+        store = ContentStore(path)
+        as_handles = held_memory(lambda: [store.text(index) for index in range(len(texts))])
+
+        rng = random.Random(args.seed)
+        indexes = [rng.randrange(len(texts)) for _ in range(args.reads)]
+        start = time.perf_counter()
+        for index in indexes:
+            store.get(index)
+        random_reads = time.perf_counter() - start
+        start = time.perf_counter()
+        for index in range(min(args.reads, len(texts))):
+            store.get(index)
+        in_order = time.perf_counter() - start
+        correct = all(store.get(index) == text for index, text in enumerate(texts))
+        size = path.stat().st_size
+        store.close()
+
+    print(f"texts:              {len(texts):,} ({raw / 2**20:.1f} MiB of UTF-8)")
+    print(f"pack on disk:       {size / 2**20:.1f} MiB (written in {written:.2f} s)")
+    print(f"held as strings:    {as_strings / 2**20:.1f} MiB per process")
+    print(f"held as handles:    {as_handles / 2**20:.1f} MiB per process")
+    print(f"random reads:       {random_reads / args.reads * 1e6:.1f} us/text")
+    print(f"sequential reads:   {in_order / min(args.reads, len(texts)) * 1e6:.1f} us/text")
+    print(f"round trip correct: {correct}")
+
+
+if __name__ == "__main__":
+    main()
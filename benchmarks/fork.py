@@ -0,0 +1,58 @@
+"""Benchmark: branching a running game with GameSession.fork.
+
+Plays into a game, then compares forking the session with copy.deepcopy of
+it, and measures how many what-if branches (a fork plus one command) can be
+explored from that checkpoint per second.
+
+Run from the repository root:
+    python -m benchmarks.fork [--branches 100000]
+"""
+
+import argparse
+import copy
+import random
+import time
+
+from session import GameSession
+from world import shared_world
+
+OPENING = ("pickup", "", "move", "south", "fight", "torch", "", "move", "west", "fight", "torch", "")
+COMMANDS = ("pickup", "talk", "move", "fight", "give", "inventory")
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--branches", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    checkpoint = GameSession(shared_world())
+    checkpoint.start(show_tutorial=False)
+    for text in OPENING:
+        checkpoint.step(text)
+
+    count = 10_000
+    start = time.perf_counter()
+    for _ in range(count):
+        checkpoint.fork()
+    forking = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    for _ in range(count // 100):
+        copy.deepcopy(checkpoint)
+    deep = (time.perf_counter() - start) / (count // 100)
+
+    rng = random.Random(args.seed)
+    texts = [rng.choice(COMMANDS) for _ in range(args.branches)]
+    start = time.perf_counter()
+    for text in texts:
+        checkpoint.fork().step(text)
+    exploring = time.perf_counter() - start
+
+    print(f"fork:          {forking * 1e6:.2f} us")
+    print(f"deepcopy:      {deep * 1e6:.1f} us")
+    print(f"branches/s:    {args.branches / exploring:,.0f} (fork + one command)")
+
+
+if __name__ == "__main__":
+    main()
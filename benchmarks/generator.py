@@ -0,0 +1,75 @@
+"""Benchmark: lazily generated worlds.
+
+Creates a seeded world of millions of caves, walks a player through it, then
+drops every resident cave and walks the same path again to check that the
+caves come back identical.
+
+Run from the repository root:
+    python -m benchmarks.generator [--size 3000] [--steps 20000]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from generator import generate_world
+from output import capture
+
+
+def walk(world, steps: int, seed: int):
+    """Walk randomly from the start, returning a fingerprint of each cave visited."""
+    rng = random.Random(seed)
+    cave = world.start
+    seen = []
+    with capture():
+        for _ in range(steps):
+            direction = rng.choice([direction for direction, _ in cave.get_exits()])
+            cave = cave.move(direction)
+            item = cave.get_item()
+            character = cave.get_character()
+            seen.append(
+                (
+                    cave.get_name(),
+                    cave.get_description(),
+                    item.get_name() if item else None,
+                    character.get_name() if character else None,
+                )
+            )
+    return seen
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=3000, help="width and height in caves")
+    parser.add_argument("--steps", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    world = generate_world(args.seed, args.size, args.size)
+    created = time.perf_counter() - start
+    generator = world.start.generator
+
+    start = time.perf_counter()
+    first = walk(world, args.steps, args.seed)
+    walked = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    resident = len(generator.resident)
+
+    generator.drop_cold()
+    second = walk(world, args.steps, args.seed)
+
+    print(f"world size:       {args.size * args.size:,} caves")
+    print(f"create world:     {created * 1000:.2f} ms")
+    print(f"walk {args.steps:,} steps: {walked:.2f} s ({walked / args.steps * 1e6:.0f} us/step)")
+    print(f"caves built:      {resident:,}")
+    print(f"memory:           {memory / 2**20:.1f} MiB")
+    print(f"regenerated same: {first == second}")
+
+
+if __name__ == "__main__":
+    main()
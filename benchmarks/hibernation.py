@@ -0,0 +1,127 @@
+"""Benchmark: memory and latency of hibernating idle sessions to SQLite.
+
+Starts many sessions and plays a few turns in each, so that they hold caves
+and characters of their own, then measures the memory they take (traced
+Python allocations) held in memory, and held by a SessionManager that keeps
+only --resident of them in memory. It then plays on in random sessions and
+reports the time per step when the session has to be restored first, and
+how long hibernating takes with writes batched and with one transaction per
+session.
+
+Run from the repository root:
+    python -m benchmarks.hibernation [--sessions 10000] [--resident 1000]
+"""
+
+import argparse
+import gc
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from hibernation import SessionManager, SessionStore
+from session import GameSession
+from world import shared_world
+
+OPENING = ("pickup", "", "move", "south", "fight", "torch", "", "talk", "")
+COMMANDS = ("talk", "pickup", "inventory", "none")
+
+
+def start_sessions(world, count: int):
+    """Return sessions that have each played the opening."""
+    sessions = []
+    for _ in range(count):
+        session = GameSession(world)
+        session.start(show_tutorial=False)
+        for text in OPENING:
+            session.step(text)
+        sessions.append(session)
+    return sessions
+
+
+def traced(build):
+    """Return what build() returns, and the bytes it left allocated."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, allocated
+
+
+def managed(world, path: Path, count: int, resident: int, batch: int):
+    """Return a SessionManager holding count played sessions, at most resident in memory."""
+    manager = SessionManager(world, SessionStore(path, batch), max_resident=resident)
+    for number, session in enumerate(start_sessions(world, count)):
+        manager.add(str(number), session)
+    manager.store.flush()
+    return manager
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--resident", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    world = shared_world()
+    start_sessions(world, 10)
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "sessions.db"
+        sessions, held = traced(lambda: start_sessions(world, args.sessions))
+        del sessions
+        manager, hibernating = traced(
+            lambda: managed(world, path, args.sessions, args.resident, 256)
+        )
+        # The database and its write-ahead log.
+        on_disk = sum(file.stat().st_size for file in Path(directory).glob("sessions.db*"))
+        print(f"{args.sessions:,} sessions in memory:  {held / 2**20:7.1f} MiB")
+        print(
+            f"at most {args.resident:,} in memory:     {hibernating / 2**20:7.1f} MiB "
+            f"(database {on_disk / 2**20:.1f} MiB)"
+        )
+
+        rng = random.Random(args.seed)
+        keys = [str(rng.randrange(args.sessions)) for _ in range(args.steps)]
+        texts = [rng.choice(COMMANDS) for _ in range(args.steps)]
+        restored = manager.restored
+        start = time.perf_counter()
+        for key, text in zip(keys, texts):
+            manager.step(key, text)
+        elapsed = time.perf_counter() - start
+        print(
+            f"random steps:  {elapsed / args.steps * 1e6:6.1f} us/step, "
+            f"{manager.restored - restored:,} of {args.steps:,} restored first"
+        )
+        session = GameSession(world)
+        session.start(show_tutorial=False)
+        start = time.perf_counter()
+        for text in texts:
+            session.step(text)
+        print(f"in memory:     {(time.perf_counter() - start) / args.steps * 1e6:6.1f} us/step")
+        manager.store.close()
+
+        for batch in (256, 1):
+            path = Path(directory) / f"batch{batch}.db"
+            manager = SessionManager(world, SessionStore(path, batch))
+            for number, session in enumerate(start_sessions(world, args.resident)):
+                manager.add(str(number), session)
+            manager.hibernate_after = 0
+            start = time.perf_counter()
+            manager.sweep()
+            elapsed = time.perf_counter() - start
+            per_session = elapsed / args.resident * 1e6
+            print(
+                f"hibernating, {batch:3} per write: {per_session:6.1f} us/session, "
+                f"{manager.store.writes:,} writes"
+            )
+            manager.store.close()
+
+
+if __name__ == "__main__":
+    main()
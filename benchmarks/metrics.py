@@ -0,0 +1,84 @@
+"""Benchmark: cost of recording metrics while playing.
+
+Plays the same random games with metrics off, on, and on with the hot game
+operations instrumented, and reports the time per step of each. Then prints
+the latencies recorded.
+
+Run from the repository root:
+    python -m benchmarks.metrics [--turns 100000]
+"""
+
+import argparse
+import random
+import time
+
+import metrics
+from generator import generate_world
+from session import GameSession
+
+COMMANDS = ("move", "get", "talk", "fight", "give", "inventory")
+
+
+def play(world, inputs):
+    """Play through a list of random inputs, starting a new game whenever one ends."""
+    session = GameSession(world)
+    session.start(show_tutorial=False)
+    answers = iter(inputs)
+    start = time.perf_counter()
+    for roll in answers:
+        if session.over:
+            session = GameSession(world)
+            session.start(show_tutorial=False)
+        if session.at_turn_start:
+            text = COMMANDS[roll % len(COMMANDS)]
+        elif session.pending.__name__ == "_move":
+            text = ("north", "east", "south", "west")[roll % 4]
+        else:
+            text = ("torch", "rope", "n", "none", "lantern oil")[roll % 5]
+        session.step(text)
+    return (time.perf_counter() - start) / len(inputs)
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    world = generate_world(args.seed, 200, 200)
+    inputs = [rng.randrange(60) for _ in range(args.turns)]
+
+    off, on = [], []
+    for _ in range(args.rounds):
+        metrics.enable(False)
+        off.append(play(world, inputs))
+        metrics.enable()
+        on.append(play(world, inputs))
+    metrics.instrument()
+    instrumented = min(play(world, inputs) for _ in range(args.rounds))
+    best_off, best_on = min(off), min(on)
+
+    print(f"metrics off:   {best_off * 1e6:.2f} us/step")
+    print(f"metrics on:    {best_on * 1e6:.2f} us/step ({(best_on / best_off - 1) * 100:+.1f}%)")
+    print(
+        f"instrumented:  {instrumented * 1e6:.2f} us/step "
+        f"({(instrumented / best_off - 1) * 100:+.1f}%)"
+    )
+    print()
+    recorded = metrics.snapshot()
+    for name, by_label in recorded["histograms"].items():
+        print(f"{name}:")
+        for label, summary in sorted(by_label.items()):
+            print(
+                f"  {label:<20} n={summary['count']:>8,}  p50 {summary['p50'] * 1e6:6.2f} us"
+                f"  p99 {summary['p99'] * 1e6:6.2f} us  max {summary['max'] * 1e6:8.1f} us"
+            )
+    for name, by_label in recorded["counters"].items():
+        print(f"{name}: {by_label}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Benchmark: many players in one shared world, on several threads.
+
+First checks that players racing for the same thing cannot both get it: in
+each round, players on their own threads pick up the torch at the same
+moment, then fight the grotto's enemy with it at the same moment, and the
+torch and the enemy's drop must each end up with exactly one of them.
+
+Then many players wander a generated world, each taking a turn per tick,
+and it reports commands per second by number of threads, against the same
+players each in a game of their own. It also reports how many messages were
+broadcast and how many batches delivered them, with messages delivered once
+per tick as the server delivers them once per pass of its event loop.
+
+Run from the repository root:
+    python -m benchmarks.multiplayer [--players 2000] [--ticks 20] [--threads 1 2 4]
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from generator import generate_world
+from multiplayer import MultiplayerSession, SharedWorld
+from session import GameSession
+from world import build_world
+
+COMMANDS = ("move", "move", "talk", "pickup")
+
+
+def race(world, players: int, rounds: int):
+    """
+    Race players on threads for the torch, then for the grotto enemy's drop.
+
+    Raises:
+        AssertionError: If anything ends up with more than one player, or none.
+    """
+    torch = world.start.get_item()
+    drop = world.start.get_linked_cave("south").get_character().drop
+    # Switch threads as often as possible, so that races happen if they can.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(rounds):
+            shared = SharedWorld(world)
+            sessions = [MultiplayerSession(shared, f"player{n}") for n in range(players)]
+            for session in sessions:
+                session.start(show_tutorial=False)
+            run_together(sessions, ["pickup"])
+            holders = [s for s in sessions if torch.get_name() in s.inventory]
+            assert len(holders) == 1, f"{len(holders)} players picked up the torch"
+
+            for session in sessions:
+                session.inventory.add(torch)
+                session.step("move")
+            run_together(sessions, ["fight", torch.get_name()])
+            holders = [s for s in sessions if drop.get_name() in s.inventory]
+            assert len(holders) == 1, f"{len(holders)} players got the {drop.get_name()}"
+    finally:
+        sys.setswitchinterval(interval)
+    print(f"race: {rounds} rounds of {players} threads, torch and drop each taken once")
+
+
+def run_together(sessions, lines):
+    """Step every session through some lines, each on its own thread, starting together."""
+    barrier = threading.Barrier(len(sessions))
+
+    def play(session):
+        barrier.wait()
+        for line in lines:
+            session.step(line)
+
+    threads = [threading.Thread(target=play, args=(session,)) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class Ticks:
+    """Delivers broadcast messages once per tick, and counts them."""
+
+    def __init__(self):
+        """Initialize with nothing waiting."""
+        self.waiting = []
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.batches = 0
+
+    def schedule(self, flush):
+        """Deliver a Room's messages at the end of the tick."""
+        with self.lock:
+            self.waiting.append(flush)
+
+    def tick(self):
+        """Deliver the messages waiting."""
+        with self.lock:
+            flushes, self.waiting = self.waiting, []
+        for flush in flushes:
+            flush()
+
+    def notified(self, session):
+        """Count a session's messages as it receives them, instead of keeping them."""
+
+        def listener():
+            self.batches += 1
+            self.messages += sum(sender is not session for sender, _, _ in session.inbox)
+            session.inbox.clear()
+
+        return listener
+
+
+def wander(sessions, threads: int, ticks: int, seed: int, between=None):
+    """
+    Have every session take a turn per tick, the sessions split between threads.
+
+    Returns:
+        float: Commands per second.
+    """
+    rng = random.Random(seed)
+    turns = [[(rng.choice(COMMANDS), rng.random()) for _ in sessions] for _ in range(ticks)]
+    barrier = threading.Barrier(threads, action=between)
+
+    def play(part: int):
+        for tick in range(ticks):
+            for number in range(part, len(sessions), threads):
+                session = sessions[number]
+                line, way = turns[tick][number]
+                session.step(line)
+                if not session.at_turn_start:
+                    # move asked which way.
+                    exits = session.current_cave.get_exits()
+                    session.step(exits[int(way * len(exits))][0])
+            barrier.wait()
+
+    workers = [threading.Thread(target=play, args=(part,)) for part in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(sessions) * ticks / (time.perf_counter() - start)
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--size", type=int, default=40, help="width of the generated world")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    race(build_world(), players=8, rounds=200)
+
+    world = generate_world(args.seed, args.size, args.size)
+    for threads in args.threads:
+        sessions = [GameSession(world) for _ in range(args.players)]
+        for session in sessions:
+            session.start(show_tutorial=False)
+        alone = wander(sessions, threads, args.ticks, args.seed)
+
+        ticks = Ticks()
+        shared = SharedWorld(world, ticks.schedule)
+        sessions = [MultiplayerSession(shared, f"player{n}") for n in range(args.players)]
+        for session in sessions:
+            session.listener = ticks.notified(session)
+            session.start(show_tutorial=False)
+        ticks.tick()
+        ticks.messages = ticks.batches = 0
+        together = wander(sessions, threads, args.ticks, args.seed, between=ticks.tick)
+        print(
+            f"{threads} thread(s): {together:9,.0f} commands/s shared, "
+            f"{alone:9,.0f} alone; {ticks.messages:,} messages in {ticks.batches:,} batches, "
+            f"{len(shared.rooms):,} rooms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark: route queries on large cave grids.
+
+Builds a grid of caves with a share of its links removed (so routes have to
+wind around walls), then reports the time to build the Router and the latency
+of route queries, cold and cached, plus the cost of adding and removing links.
+
+With --generated, times routes in a generated world of that width instead,
+from random caves to caves at most --span caves east or west and north or
+south of them, and to a few popular caves from that close to them.
+
+Run from the repository root:
+    python -m benchmarks.routing [--caves 100000] [--queries 1000]
+    python -m benchmarks.routing --generated 1000 [--span 20] [--queries 1000]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.cave_memory import build_grid
+from generator import generate_world
+from routing import Router
+
+
+def percentiles(samples: list):
+    """Return p50, p99 and max of a list of seconds, in milliseconds."""
+    samples = sorted(samples)
+    return [samples[int(len(samples) * share)] * 1000 for share in (0.5, 0.99)] + [
+        samples[-1] * 1000
+    ]
+
+
+def time_queries(router, label: str, queries: list):
+    """Time routing each (origin, destination) pair and print the percentiles."""
+    timings = []
+    unanswered = 0
+    for origin, destination in queries:
+        start = time.perf_counter()
+        unanswered += router.route(origin, destination) is None
+        timings.append(time.perf_counter() - start)
+    p50, p99, worst = percentiles(timings)
+    missing = f"  no route {unanswered}" if unanswered else ""
+    print(f"{label + ' query':<17} p50 {p50:.3f} ms  p99 {p99:.3f} ms  max {worst:.3f} ms{missing}")
+
+
+def generated(width: int, span: int, count: int):
+    """Print route query latencies in a generated world."""
+    world = generate_world(1, width, width)
+    generator = world.caves.generator
+    rng = random.Random(0)
+
+    def nearby(position):
+        return tuple(
+            min(width - 1, max(0, axis + rng.randint(-span, span))) for axis in position
+        )
+
+    positions = [(rng.randrange(width), rng.randrange(width)) for _ in range(count)]
+    pairs = [
+        (generator.name_at(position), generator.name_at(nearby(position))) for position in positions
+    ]
+    popular = [(rng.randrange(width), rng.randrange(width)) for _ in range(10)]
+    popular_pairs = []
+    for _ in range(count):
+        destination = rng.choice(popular)
+        origin = nearby(destination)
+        popular_pairs.append((generator.name_at(origin), generator.name_at(destination)))
+    print(f"caves:            {width * width:,}")
+    for label, queries in (("cold", pairs), ("cached", pairs), ("popular", popular_pairs)):
+        time_queries(world.router, label, queries)
+    print(f"caves built:      {generator.generated:,}")
+
+
+def main():
+    """Parse the command line and print query latencies."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--caves", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--walls", type=float, default=0.2, help="share of links removed")
+    parser.add_argument("--generated", type=int, help="width of a generated world to route in")
+    parser.add_argument("--span", type=int, default=20, help="with --generated, how far routes go")
+    args = parser.parse_args()
+    if args.generated:
+        generated(args.generated, args.span, args.queries)
+        return
+
+    rng = random.Random(0)
+    caves = build_grid(args.caves, compact=True)
+    for cave in caves:
+        for direction in list(cave.linked_caves):
+            if rng.random() < args.walls:
+                cave.unlink_cave(direction)
+    by_name = {cave.get_name(): cave for cave in caves}
+
+    start = time.perf_counter()
+    router = Router(by_name)
+    print(f"caves:            {len(caves):,}")
+    print(f"router build:     {time.perf_counter() - start:.2f} s")
+
+    names = list(by_name)
+    pairs = [(rng.choice(names), rng.choice(names)) for _ in range(args.queries)]
+    # Players heading for a handful of well-known caves from anywhere.
+    popular = rng.sample(names, 10)
+    popular_pairs = [(rng.choice(names), rng.choice(popular)) for _ in range(args.queries)]
+    for label, queries in (("cold", pairs), ("cached", pairs), ("popular", popular_pairs)):
+        time_queries(router, label, queries)
+
+    # Doors closing and opening again: remove an existing link, then restore it.
+    timings = []
+    for origin, _ in pairs[:100]:
+        linked = by_name[origin].linked_caves
+        if not linked:
+            continue
+        direction, destination = next(iter(linked.items()))
+        start = time.perf_counter()
+        router.unlink(origin, direction)
+        router.link(origin, direction, destination.get_name())
+        timings.append(time.perf_counter() - start)
+    p50, p99, worst = percentiles(timings)
+    print(f"unlink + relink   p50 {p50:.3f} ms  p99 {p99:.3f} ms  max {worst:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark: cost of saving every turn, and of loading a long-running game.
+
+First checks that snapshots of the default world round-trip: restored at
+points where characters have been changed, talked to and defeated, a game
+gives the same snapshot and answers talk the same way.
+
+Then plays a long random game in a generated world, saving every line of
+input, then loads the save back and checks it matches the live session.
+
+Run from the repository root:
+    python -m benchmarks.saves [--turns 100000]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+from generator import generate_world
+from output import PlainSink
+from saves import SaveFile, restore, snapshot
+from session import GameSession
+from world import shared_world
+
+COMMANDS = ("move", "get", "talk", "fight", "give", "inventory")
+# Openings in the default world, each saved and restored after every line.
+ROUND_TRIPS = (
+    # The enemy keeps its own conversation, which is not one of its messages.
+    ("pickup", "move", "give", "torch", "talk"),
+    # An enemy given something, then defeated.
+    ("pickup", "move", "give", "torch", "fight", "torch", "talk"),
+    # A person given the wrong thing, then what they want.
+    ("pickup", "move", "fight", "torch", "pickup", "move", "give", "torch", "give",
+     "slime remains", "talk"),
+)
+
+
+def round_trips():
+    """
+    Check that snapshots taken at the start of each turn restore the same game.
+
+    Raises:
+        AssertionError: If a restored game differs from the one saved.
+    """
+    world = shared_world()
+    sink = PlainSink()
+    checked = 0
+    for lines in ROUND_TRIPS:
+        session = GameSession(world)
+        session.start(show_tutorial=False)
+        for line in lines:
+            session.step(line)
+            if not session.at_turn_start:
+                continue
+            data = snapshot(session)
+            restored, _ = restore(world, data)
+            assert snapshot(restored) == data, f"snapshot changed after {line!r} in {lines}"
+            talked = sink.render(session.fork().step("talk"))
+            assert sink.render(restored.step("talk")) == talked, f"talk differs in {lines}"
+            checked += 1
+    print(f"round trips:      {checked} snapshots restored the same")
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sync", action="store_true", help="fsync every save")
+    args = parser.parse_args()
+
+    round_trips()
+    rng = random.Random(args.seed)
+    world = generate_world(args.seed, 200, 200)
+    with tempfile.TemporaryDirectory() as directory:
+        save = SaveFile(directory, sync=args.sync)
+        session = GameSession(world)
+        session.start(show_tutorial=False)
+        save.checkpoint(session)
+
+        stepping = saving = 0.0
+        turns = 0
+        while turns < args.turns:
+            if session.at_turn_start:
+                text = rng.choice(COMMANDS)
+            elif session.pending.__name__ == "_move":
+                text = rng.choice(("north", "east", "south", "west"))
+            else:
+                text = rng.choice(("torch", "rope", "n", "none", "lantern oil"))
+            start = time.perf_counter()
+            session.step(text)
+            stepping += time.perf_counter() - start
+            start = time.perf_counter()
+            save.record(session, text)
+            saving += time.perf_counter() - start
+            turns += 1
+            if session.over:
+                # Keep playing in a fresh game, saved in the same directory.
+                session = GameSession(world)
+                session.start(show_tutorial=False)
+                save.checkpoint(session)
+        save.close()
+
+        start = time.perf_counter()
+        loaded, _ = SaveFile(directory).load(world)
+        loading = time.perf_counter() - start
+        same = (
+            loaded.current_cave.get_name() == session.current_cave.get_name()
+            and loaded.inventory.names() == session.inventory.names()
+            and loaded.health == session.health
+            and loaded.changed_caves.keys() == session.changed_caves.keys()
+        )
+
+    print(f"turns played:     {args.turns:,}")
+    print(f"step:             {stepping / turns * 1e6:.1f} us/turn")
+    print(f"save:             {saving / turns * 1e6:.1f} us/turn")
+    print(f"load:             {loading * 1000:.2f} ms")
+    print(f"loaded same game: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark: memory used per GameSession.
+
+Measures the bytes each session adds, both for fresh sessions and for sessions
+that have changed the world (picked up an item and completed a quest), with the
+shared world template against a private world per session.
+
+Run from the repository root:
+    python -m benchmarks.session_memory [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from session import GameSession
+from world import build_world, shared_world
+
+# Picks up the torch, kills Sledge and trades its drop with Harry.
+PLAYED = ["get", "", "move", "fight", "torch", "", "move", "north", "", "give", "slime remains", ""]
+
+# Building a private world per session is linear and slow, so stop measuring it here.
+MAX_PRIVATE = 10_000
+
+
+def bytes_per_session(count: int, private: bool, played: bool):
+    """
+    Create count sessions and return the average bytes retained by each.
+
+    Args:
+        count (int): Number of sessions to create.
+        private (bool): Give each session its own world instead of the shared one.
+        played (bool): Play a few state-changing commands in each session.
+    """
+    shared_world()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = []
+    for _ in range(count):
+        session = GameSession(build_world() if private else None)
+        session.start(show_tutorial=False)
+        if played:
+            for command in PLAYED:
+                session.step(command)
+        sessions.append(session)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / count
+
+
+def main():
+    """Parse the command line and print a table of bytes per session."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'sessions':>9} {'state':>7} {'shared':>10} {'private':>10}")
+    for count in args.sizes:
+        for played in (False, True):
+            shared = bytes_per_session(count, private=False, played=played)
+            if count <= MAX_PRIVATE:
+                private = f"{bytes_per_session(count, private=True, played=played):,.0f}"
+            else:
+                private = "-"
+            state = "played" if played else "fresh"
+            print(f"{count:>9,} {state:>7} {shared:>10,.0f} {private:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark: searching worlds for their shortest win.
+
+Runs the full state search on generated worlds of a few sizes, replays each
+win found in a GameSession to check it, and times the quick winnability
+check on larger worlds.
+
+Run from the repository root:
+    python -m benchmarks.solver [--workers 1]
+"""
+
+import argparse
+import time
+
+from generator import generate_world
+from session import GameSession
+from solver import Model, solve
+
+
+def replay_wins(world, commands: list):
+    """Return True if typing the commands into a new game wins it."""
+    session = GameSession(world)
+    session.start(show_tutorial=False)
+    for line in commands:
+        session.step(line)
+    return session.outcome == "win"
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    print("full search:")
+    for size in (10, 20, 30):
+        world = generate_world(args.seed, size, size)
+        solution = solve(world, workers=args.workers)
+        checked = replay_wins(world, solution.commands) if solution.winnable else "-"
+        print(
+            f"  {size}x{size}: {solution.states:>8,} states in {solution.seconds:5.2f} s "
+            f"({solution.states / solution.seconds:,.0f}/s), "
+            f"win in {solution.length} commands, replay wins: {checked}"
+        )
+    print("quick check:")
+    for size in (100, 200):
+        world = generate_world(args.seed, size, size)
+        start = time.perf_counter()
+        winnable = Model(world).winnable()
+        print(f"  {size}x{size}: winnable {winnable} in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""Benchmark suite: startup, world building, turns, rendering and inventories.
+
+Runs each case in a fresh Python process, so peak RSS and cold start are
+measured on their own:
+
+    startup     importing main, running python -m main to its first prompt,
+                and importing the game and starting a session with the tutorial
+    build       building the world (the default world, or generated worlds)
+    turns       scripted sessions of move, talk, fight, give, pickup and
+                inventory commands, with per-command latency percentiles
+    render      Cave.get_details
+    inventory   Inventory.names and lookups, by inventory size
+    boss        Boss.fight, including its sort of the items
+
+Worlds are "default" or the width of a generated square world. Each case
+is run --repeat times, and each result is the median of the runs, with its
+spread: how far apart the fastest and slowest runs were, relative to the
+median. Results can be saved as a baseline, and compared with one: the run
+fails if any median is worse than the baseline's by more than the tolerance
+plus the larger of the two spreads, so noisy results need a larger change to
+fail. Timings are not portable between machines, so record the baseline on
+the machine that checks it, and record it again in any change that makes a
+hot path intentionally slower or faster. Cold, one-shot timings (UNCHECKED)
+are reported but not compared; cold start has a fixed budget in
+milliseconds instead (STARTUP_BUDGET_MS), which every run checks.
+
+Run from the repository root:
+    python -m benchmarks.suite [--worlds default 50 200] [--inventories 2 100 1000]
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json [--tolerance 0.3]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+COMMANDS = ("move", "talk", "fight", "give", "pickup", "inventory")
+DIRECTIONS = ("north", "east", "south", "west")
+ANSWERS = ("torch", "rope", "n", "none", "lantern oil", "silver key", "y")
+STARTUP = (
+    "import resource\n"
+    "from session import GameSession\n"
+    "GameSession().start()\n"
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+# The command line started cold, up to its first prompt, then quit.
+CLI = ("-m", "main", "--output", "plain", "--skip-tutorial")
+# Cold start budgets in ms. Short-lived tools and workers pay these on every
+# run, so they fail the suite however the baseline was recorded.
+STARTUP_BUDGET_MS = {"startup.import_ms": 80, "startup.cli_start_ms": 150}
+# Reported but not compared with the baseline. A command's cheap and
+# expensive paths make its latency percentiles bimodal, so even the median
+# jumps between runs; its mean is checked instead. Timings taken once in a
+# fresh process depend on the disk cache and the operating system more than
+# on the game, and vary by half between runs.
+UNCHECKED = ("_p50_us", "_p99_us", "first_ms", "import_ms", "cli_start_ms", "cold_start_ms")
+
+
+def peak_rss_mib():
+    """Return the peak resident memory of this process in MiB, or None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def per_call(function, calls: int, rounds: int = 5):
+    """Return the fastest time per call, in microseconds, of rounds of calls to function."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e6
+
+
+def make_world(world: str, seed: int):
+    """Return the default world, or a generated world of the given width."""
+    if world == "default":
+        from world import shared_world
+        return shared_world()
+    from generator import generate_world
+    return generate_world(seed, int(world), int(world))
+
+
+def sample_caves(world, count: int):
+    """Return up to count caves near the start of a world, found breadth first."""
+    caves = [world.start]
+    seen = {world.start.get_name()}
+    for cave in caves:
+        if len(caves) >= count:
+            break
+        for direction, name in cave.get_exits():
+            if name not in seen:
+                seen.add(name)
+                caves.append(cave.get_linked_cave(direction))
+    return caves[:count]
+
+
+def filler_items(count: int):
+    """Return count distinct items to pad an inventory with."""
+    from item import Item
+    return [Item(f"pebble {index}", "A smooth pebble.") for index in range(count)]
+
+
+def run_build(args):
+    """Time building the world, first in a fresh process and then again."""
+    start = time.perf_counter()
+    make_world(args.world, args.seed)
+    first = (time.perf_counter() - start) * 1000
+    if args.world == "default":
+        from world import build_world
+        again = per_call(build_world, 100) / 1000
+    else:
+        again = per_call(lambda: make_world(args.world, args.seed), 1, rounds=3) / 1000
+    return {"first_ms": first, "again_ms": again}
+
+
+def run_turns(args):
+    """Play scripted random sessions, starting a new game whenever one ends."""
+    import metrics
+    from session import GameSession
+
+    world = make_world(args.world, args.seed)
+    padding = filler_items(args.inventory)
+    rng = random.Random(args.seed)
+    inputs = [rng.randrange(420) for _ in range(args.turns)]
+
+    def new_session():
+        session = GameSession(world)
+        session.start(show_tutorial=False)
+        for item in padding:
+            session._add_item(item)
+        return session
+
+    metrics.reset()
+    metrics.enable()
+    session = new_session()
+    start = time.perf_counter()
+    for roll in inputs:
+        if session.over:
+            session = new_session()
+        if session.at_turn_start:
+            text = COMMANDS[roll % len(COMMANDS)]
+        elif session.pending.__name__ in ("_move", "_goto"):
+            text = DIRECTIONS[roll % len(DIRECTIONS)]
+        else:
+            text = ANSWERS[roll % len(ANSWERS)]
+        session.step(text)
+    elapsed = time.perf_counter() - start
+    metrics.enable(False)
+
+    results = {"turns_per_s": args.turns / elapsed}
+    for name, summary in sorted(metrics.snapshot()["histograms"]["command_seconds"].items()):
+        if name in ("blank", "unknown") or summary["count"] < 100:
+            continue
+        results[f"{name}_mean_us"] = summary["sum"] / summary["count"] * 1e6
+        results[f"{name}_p50_us"] = summary["p50"] * 1e6
+        results[f"{name}_p99_us"] = summary["p99"] * 1e6
+    return results
+
+
+def run_render(args):
+    """Time describing caves, as every turn does."""
+    from output import capture
+
+    caves = sample_caves(make_world(args.world, args.seed), 500)
+
+    def render():
+        with capture():
+            for cave in caves:
+                cave.get_details()
+
+    return {"get_details_us": per_call(render, 20) / len(caves)}
+
+
+def run_inventory(args):
+    """Time listing an inventory and looking items up in it."""
+    from inventory import Inventory
+
+    inventory = Inventory(filler_items(args.inventory))
+    name = f"pebble {args.inventory // 2}"
+    return {
+        "names_us": per_call(inventory.names, max(1, 100_000 // args.inventory)),
+        "contains_us": per_call(lambda: name in inventory, 100_000),
+        "get_us": per_call(lambda: inventory.get(name), 100_000),
+    }
+
+
+def run_boss(args):
+    """Time fighting the boss, with the right items and the wrong ones."""
+    from character import Boss
+    from output import capture
+
+    messages = {"description": "A dragon.", "attack_success": "Won.", "attack_failure": "Lost."}
+    boss = Boss("Ifir", ["silver key", "lantern oil"], messages)
+
+    def fights():
+        with capture():
+            boss.fight(["lantern oil", "silver key"])
+            boss.fight(["torch", "rope"])
+
+    return {"fight_us": per_call(fights, 20_000) / 2}
+
+
+CASES = {
+    "build": run_build,
+    "turns": run_turns,
+    "render": run_render,
+    "inventory": run_inventory,
+    "boss": run_boss,
+}
+
+
+def run_case(case: str, world: str = "default", inventory: int = 0, turns: int = 0, seed: int = 1):
+    """
+    Run one case in a fresh Python process.
+
+    Returns:
+        dict: The case's results, plus its peak RSS in MiB.
+    """
+    command = [
+        sys.executable, "-m", "benchmarks.suite", "--case", case,
+        "--world", str(world), "--inventory", str(inventory),
+        "--turns", str(turns), "--seed", str(seed),
+    ]
+    finished = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(finished.stdout)
+
+
+def cold_start_ms(arguments, stdin=None, runs: int = 5):
+    """Return the fastest of several runs of a fresh Python process, in ms."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *arguments],
+            cwd=ROOT,
+            input=stdin,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_startup(runs: int = 5):
+    """Return cold start times in ms, and the peak RSS of starting a session in MiB."""
+    finished = subprocess.run(
+        [sys.executable, "-c", STARTUP], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return {
+        "import_ms": cold_start_ms(["-c", "import main"], runs=runs),
+        "cli_start_ms": cold_start_ms(CLI, "quit\n", runs),
+        "cold_start_ms": cold_start_ms(["-c", STARTUP], runs=runs),
+        "peak_rss_mib": int(finished.stdout.split()[-1]) / 1024,
+    }
+
+
+def run_suite(args):
+    """
+    Run every case.
+
+    Returns:
+        dict: {"value": median, "spread": spread} for each result, keyed by
+            "case[parameters].result".
+    """
+    runs = [("startup", {})]
+    runs += [("build", {"world": world}) for world in args.worlds]
+    runs += [("turns", {"world": world, "inventory": 2}) for world in args.worlds]
+    runs += [
+        ("turns", {"world": "default", "inventory": size})
+        for size in args.inventories
+        if size != 2
+    ]
+    runs += [("render", {"world": world}) for world in args.worlds]
+    runs += [("inventory", {"inventory": size}) for size in args.inventories]
+    runs += [("boss", {})]
+
+    measured = {}
+    for case, parameters in runs:
+        label = " ".join(f"{key}={value}" for key, value in parameters.items())
+        name = f"{case}[{label}]" if label else case
+        print(f"running {name}...", file=sys.stderr)
+        for _ in range(args.repeat):
+            if case == "startup":
+                values = run_startup()
+            else:
+                values = run_case(case, turns=args.turns, seed=args.seed, **parameters)
+            for key, value in values.items():
+                if value is not None:
+                    measured.setdefault(f"{name}.{key}", []).append(value)
+
+    results = {}
+    for key, values in measured.items():
+        median = statistics.median(values)
+        spread = (max(values) - min(values)) / median if median else 0.0
+        results[key] = {"value": median, "spread": spread}
+    return results
+
+
+def higher_is_better(key: str):
+    """Return True for throughputs, False for times and memory."""
+    return key.endswith("_per_s")
+
+
+def over_budget(results: dict):
+    """Return the keys of the results over their STARTUP_BUDGET_MS budget."""
+    return [
+        key
+        for key, budget in STARTUP_BUDGET_MS.items()
+        if key in results and results[key]["value"] > budget
+    ]
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """
+    Print each result against the baseline.
+
+    Args:
+        results (dict): The results of run_suite.
+        baseline (dict): The results of an earlier run_suite.
+        tolerance (float): How much worse a result may be, as a fraction, on
+            top of the larger of its spreads now and in the baseline.
+    Returns:
+        list: Keys of the results worse than the baseline by more than allowed.
+    """
+    print(f"  {'result':<50} {'now':>12}  {'baseline':>12}  change  allowed")
+    regressions = []
+    for key, result in results.items():
+        value = result["value"]
+        if key not in baseline:
+            print(f"  {key:<50} {value:>12.2f}  (new)")
+            continue
+        old = baseline[key]["value"]
+        change = (value - old) / old if old else 0.0
+        worse = -change if higher_is_better(key) else change
+        allowed = tolerance + max(result["spread"], baseline[key].get("spread", 0.0))
+        flag = ""
+        if worse > allowed:
+            if key.endswith(UNCHECKED):
+                flag = "  (worse, not checked)"
+            else:
+                flag = "  REGRESSION"
+                regressions.append(key)
+        print(
+            f"  {key:<50} {value:>12.2f}  {old:>12.2f}  "
+            f"{change * 100:+6.1f}%  {allowed * 100:5.0f}%{flag}"
+        )
+    return regressions
+
+
+def main():
+    """Parse the command line, run the suite and compare it with the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--worlds", nargs="+", default=["default", "50", "200"])
+    parser.add_argument("--inventories", nargs="+", type=int, default=[2, 100, 1000])
+    parser.add_argument("--turns", type=int, default=50_000, help="turns per session case")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="take the median of this many runs")
+    parser.add_argument("--baseline", type=Path, help="fail if worse than this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown, e.g. 0.3")
+    parser.add_argument("--save-baseline", type=Path, help="write the results here")
+    # Runs a single case in this process; used by run_case.
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument("--world", default="default", help=argparse.SUPPRESS)
+    parser.add_argument("--inventory", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        results = CASES[args.case](args)
+        results["peak_rss_mib"] = peak_rss_mib()
+        print(json.dumps(results))
+        return
+
+    results = run_suite(args)
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+    failed = False
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond what was allowed:")
+            for key in regressions:
+                print(f"  {key}")
+            failed = True
+        else:
+            print("no regressions")
+    else:
+        for key, result in results.items():
+            print(f"  {key:<50} {result['value']:>12.2f}")
+    for key in over_budget(results):
+        print(f"{key} is {results[key]['value']:.1f} ms, over its {STARTUP_BUDGET_MS[key]} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark: playing transcripts as a regression suite.
+
+Writes --transcripts transcripts to a temporary directory, each a winning
+playthrough of the default world with random detours, records their golden
+files, then checks them again. It reports milliseconds per playthrough for
+the check, played in one process and with --jobs processes.
+
+Run from the repository root:
+    python -m benchmarks.transcripts [--transcripts 500] [--jobs 4]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import transcripts
+from solver import solve
+from world import shared_world
+
+DETOURS = ("talk", "inventory\nn", "pickup", "none")
+
+
+def write_transcripts(directory: Path, count: int, seed: int):
+    """Write count winning transcripts with random detours, returning their paths."""
+    winning = solve(shared_world()).commands
+    rng = random.Random(seed)
+    paths = []
+    for number in range(count):
+        lines = []
+        for command in winning:
+            if rng.random() < 0.3:
+                lines.append(rng.choice(DETOURS))
+            lines.append(command)
+        path = directory / f"game{number}.txt"
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def timed_run(paths, golden: Path, check: bool, jobs: int):
+    """Return the status of transcripts.run and its time per transcript in ms."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        status = transcripts.run(paths, golden, check, jobs)
+    return status, (time.perf_counter() - start) / len(paths) * 1e3
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transcripts", type=int, default=500)
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_transcripts(Path(directory), args.transcripts, args.seed)
+        golden = Path(directory) / "golden"
+        _, per_transcript = timed_run(paths, golden, False, 1)
+        print(f"recording:          {per_transcript:6.2f} ms/transcript")
+        for jobs in (1, args.jobs):
+            status, per_transcript = timed_run(paths, golden, True, jobs)
+            assert status == 0, "a transcript no longer matches its golden file"
+            print(f"checking, {jobs} job(s): {per_transcript:6.2f} ms/transcript")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Benchmark: what the full-screen interface writes to the terminal.
+
+Plays the shortest win of a world through tui.FullScreen, drawing into memory,
+and reports the bytes written per frame and the time to draw one, first as
+diffs against the previous frame and then repainting every frame in full.
+For comparison it also reports what the line-by-line ANSI output writes for
+the same game.
+
+If pyte is installed (it is optional: pip install pyte), the game is also
+played into pyte's emulated terminal at a few sizes, checking after every
+frame that the terminal shows what the canvas holds.
+
+Run from the repository root:
+    python -m benchmarks.tui [--size 100x30]
+"""
+
+import argparse
+import importlib.util
+import io
+import time
+
+import tui
+from output import SINKS
+from session import GameSession
+from solver import solve
+from world import build_world
+
+# Sizes the emulated terminal is checked at, as (columns, rows).
+CHECK_SIZES = ((100, 30), (60, 12), (30, 8))
+
+
+class Repainting(tui.FullScreen):
+    """A FullScreen that repaints every frame in full."""
+
+    def draw(self):
+        """Forget the previous frame, then draw."""
+        self.previous = None
+        super().draw()
+
+
+class Terminal:
+    """A pyte screen standing in for the terminal the game draws to."""
+
+    def __init__(self, size):
+        """Start a blank emulated terminal of (columns, rows)."""
+        import pyte
+
+        self.screen = pyte.Screen(*size)
+        self.feed = pyte.Stream(self.screen).feed
+
+    def write(self, text):
+        """Interpret what the game writes."""
+        self.feed(text)
+
+    def flush(self):
+        """Nothing is buffered."""
+
+    def isatty(self):
+        """Report not being a terminal, so no resize handler is installed."""
+        return False
+
+
+class Checked(tui.FullScreen):
+    """A FullScreen drawing to a Terminal, checking it after every frame."""
+
+    def draw(self):
+        """Draw, then fail if the terminal does not show the canvas."""
+        super().draw()
+        expected = ["".join(char for char, _ in row) for row in self.previous.rows]
+        for number, (shown, wanted) in enumerate(zip(self.stream.screen.display, expected)):
+            if shown != wanted:
+                raise AssertionError(
+                    f"frame {self.frames}, row {number}: screen {shown!r}, canvas {wanted!r}"
+                )
+
+
+def play(screen_class, world, commands, size, stream=None):
+    """Play the commands through a screen; return (frames, bytes, seconds drawing)."""
+    stream = stream or io.StringIO()
+    screen = screen_class(stream, size=size)
+    screen.answers = Answers(screen, commands, echo=isinstance(stream, Terminal))
+    session = GameSession(world)
+    drawing = 0.0
+    draw = screen.draw
+
+    def timed_draw():
+        nonlocal drawing
+        start = time.perf_counter()
+        draw()
+        drawing += time.perf_counter() - start
+
+    screen.draw = timed_draw
+    with screen:
+        answer = screen.show(session.start(), session)
+        while not session.over:
+            answer = screen.show(session.step(answer), session)
+    return screen.frames, screen.bytes_written, drawing
+
+
+class Answers:
+    """Answers a FullScreen's questions from a list of commands."""
+
+    def __init__(self, screen, commands, echo: bool = False):
+        """
+        Answer for a screen: enter at its pauses, the next command otherwise.
+
+        Args:
+            screen (FullScreen): The screen asking.
+            commands (list): The commands to answer with.
+            echo (bool): Write each answer to the screen's stream, as a
+                terminal echoes what is typed.
+        """
+        self.screen = screen
+        self.commands = iter(commands)
+        self.echo = echo
+
+    def readline(self):
+        """Return the next answer, or "" (the end of input) once the commands run out."""
+        if self.screen.pausing:
+            line = "\n"
+        else:
+            command = next(self.commands, None)
+            line = "" if command is None else f"{command}\n"
+        if self.echo:
+            self.screen.stream.write(line.replace("\n", "\r\n"))
+        return line
+
+
+def check_screens(world, commands):
+    """
+    Play the game into pyte's emulated terminal at each of CHECK_SIZES.
+
+    Returns:
+        int: The frames checked, or None if pyte is not installed.
+    Raises:
+        AssertionError: If the terminal ever shows something other than the canvas.
+    """
+    if importlib.util.find_spec("pyte") is None:
+        return None
+    checked = 0
+    for size in CHECK_SIZES:
+        frames, _, _ = play(Checked, world, commands, size, Terminal(size))
+        checked += frames
+    return checked
+
+
+def line_mode_bytes(world, commands, width):
+    """Return the bytes the ANSI sink writes for the same game."""
+    sink = SINKS["ansi"](width)
+    session = GameSession(world)
+    written = len(sink.render(session.start()).encode())
+    for command in commands:
+        if session.over:
+            break
+        written += len(sink.render(session.step(command)).encode())
+    return written
+
+
+def main():
+    """Parse the command line and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="100x30", help="columns x rows")
+    args = parser.parse_args()
+    size = tuple(int(part) for part in args.size.split("x"))
+
+    world = build_world()
+    commands = solve(world).commands
+    # Look around a little on the way, as a player would.
+    commands = ["inventory", "y", "torch", "none", *commands]
+
+    for name, screen_class in (("diffs", tui.FullScreen), ("full repaints", Repainting)):
+        frames, written, seconds = play(screen_class, world, commands, size)
+        print(
+            f"{name:<14} {frames} frames, {written:7,} bytes, "
+            f"{written / frames:6,.0f} bytes/frame, {seconds / frames * 1e3:.2f} ms/frame"
+        )
+    print(f"{'line by line':<14} {line_mode_bytes(world, commands, size[0]):7,} bytes (ansi)")
+    info = tui.wrap.cache_info()
+    print(f"wrap cache: {info.hits} hits, {info.misses} misses")
+
+    sizes = ", ".join(f"{columns}x{rows}" for columns, rows in CHECK_SIZES)
+    checked = check_screens(world, commands)
+    if checked is None:
+        print("pyte screen: not checked, pyte is not installed")
+    else:
+        print(f"pyte screen: matched the canvas in all {checked} frames at {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Module for translating the game's own text into the player's language.
+
+Each locale is a JSON file in the locales directory mapping message keys to
+str.format templates, which are compiled when it is loaded. A locale is
+loaded the first time a session uses it, then shared, read-only, by every
+session in the process. Keys a locale does
+not translate fall back to English.
+
+The locale in use is held in a ContextVar, like output capture, so the code
+that says things does not need to know which session it is saying them for.
+GameSession sets it for the duration of each step. The text of a world
+(descriptions and characters' messages) comes from the world file, and is
+not translated here.
+"""
+
+import json
+import keyword
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from string import Formatter
+
+LOCALE_DIR = Path(__file__).with_name("locales")
+DEFAULT_LOCALE = "en"
+
+
+class CatalogError(ValueError):
+    """Raised when a locale is missing or its catalog is invalid."""
+
+
+class Catalog:
+    """Class holding one locale's compiled message templates."""
+
+    __slots__ = ("locale", "name", "templates", "fields")
+
+    def __init__(self, locale: str, name: str, templates: dict, fields: dict):
+        """
+        Initialize a Catalog object.
+
+        Args:
+            locale (str): The locale code, e.g. "en".
+            name (str): The language's name in that language, e.g. "English".
+            templates (dict): Message key to compiled template (see compile_template).
+            fields (dict): Message key to the set of placeholders its template uses.
+        """
+        self.locale = locale
+        self.name = name
+        self.templates = templates
+        self.fields = fields
+
+    def text(self, key: str, **fields):
+        """
+        Fill in one message.
+
+        Args:
+            key (str): The message key, e.g. "cave.moved".
+            **fields: Values for the template's placeholders.
+        Returns:
+            str: The message.
+        """
+        template = self.templates[key]
+        return template(fields) if fields else template
+
+
+# What a placeholder's format spec may contain: alignment, sign, width and so on.
+_FORMAT_SPEC = re.compile(r"[\w<>=^+\- .,#%]*")
+
+
+def template_fields(template: str):
+    """
+    Return the placeholders a template uses.
+
+    Raises:
+        ValueError: If the template is malformed, or a placeholder is anything
+            but a name with an optional conversion and plain format spec.
+    """
+    fields = set()
+    for _, field, spec, conversion in Formatter().parse(template):
+        if field is None:
+            continue
+        if not field.isidentifier() or keyword.iskeyword(field) or field.startswith("_"):
+            raise ValueError(f"{{{field}}} is not a plain name")
+        if conversion not in (None, "r", "s", "a") or not _FORMAT_SPEC.fullmatch(spec or ""):
+            raise ValueError(f"{{{field}}} has an unsupported conversion or format spec")
+        fields.add(field)
+    return fields
+
+
+def compile_template(template: str, fields: set):
+    """
+    Compile a template into what Catalog.text uses to fill it in.
+
+    str.format parses its template on every call. Here a template with
+    placeholders is parsed once, into a function evaluating the equivalent
+    f-string, and one without is formatted once, into the finished string.
+
+    Args:
+        template (str): A str.format template, checked by template_fields.
+        fields (set): The placeholders it uses.
+    Returns:
+        str or function: The message, or a function taking a dict of the
+            fields and returning the message.
+    """
+    if not fields:
+        return template.format()
+    # With plain names and specs, str.format and f-string syntax are the same.
+    lines = ["def template(__fields):"]
+    lines += [f"    {field} = __fields[{field!r}]" for field in sorted(fields)]
+    lines.append(f"    return f{template!r}")
+    namespace = {"__builtins__": {}}
+    exec("\n".join(lines), namespace)
+    return namespace["template"]
+
+
+def compile_catalog(locale: str, messages: dict, fallback: Catalog | None = None):
+    """
+    Check a locale's messages and compile them into a Catalog.
+
+    Every key the fallback has and the locale does not is taken from it.
+
+    Args:
+        locale (str): The locale code.
+        messages (dict): Message key to str.format template, plus "language.name".
+        fallback (Catalog): The catalog to take missing keys from, or None.
+    Returns:
+        Catalog: The compiled catalog.
+    Raises:
+        CatalogError: If a template is malformed, or uses a placeholder the
+            fallback's template for the same key does not.
+    """
+    templates = dict(fallback.templates) if fallback else {}
+    all_fields = dict(fallback.fields) if fallback else {}
+    for key, template in messages.items():
+        if not isinstance(template, str):
+            raise CatalogError(f"{locale}: {key} must be a string")
+        try:
+            fields = template_fields(template)
+        except ValueError as error:
+            raise CatalogError(f"{locale}: {key} is not a valid template: {error}") from None
+        if fallback and key in fallback.fields and fields - fallback.fields[key]:
+            unknown = sorted(fields - fallback.fields[key])
+            raise CatalogError(f"{locale}: {key} uses unknown fields {unknown}")
+        # Translations may leave fields out, but are still called with all of them.
+        fields = fallback.fields.get(key, fields) if fallback else fields
+        templates[key] = compile_template(template, fields)
+        all_fields[key] = fields
+    return Catalog(locale, messages.get("language.name", locale), templates, all_fields)
+
+
+_catalogs = {}
+_lock = threading.Lock()
+
+
+def load(locale: str = DEFAULT_LOCALE):
+    """
+    Return a locale's catalog, loading it the first time it is asked for.
+
+    Args:
+        locale (str): The locale code, e.g. "es".
+    Returns:
+        Catalog: The catalog, shared by every caller.
+    Raises:
+        CatalogError: If there is no such locale, or its file is invalid.
+    """
+    catalog = _catalogs.get(locale)
+    if catalog is not None:
+        return catalog
+    fallback = load(DEFAULT_LOCALE) if locale != DEFAULT_LOCALE else None
+    with _lock:
+        if locale not in _catalogs:
+            path = LOCALE_DIR / f"{locale}.json"
+            if not locale.isidentifier() or not path.is_file():
+                raise CatalogError(f"there is no {locale!r} locale")
+            try:
+                messages = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as error:
+                raise CatalogError(f"{locale}: {error}") from None
+            _catalogs[locale] = compile_catalog(locale, messages, fallback)
+        return _catalogs[locale]
+
+
+def available():
+    """Return the codes of every locale there is a catalog for, sorted."""
+    return sorted(path.stem for path in LOCALE_DIR.glob("*.json"))
+
+
+_current = ContextVar("catalog", default=None)
+
+
+@contextmanager
+def using(locale: str):
+    """
+    Show text in a locale within a with block.
+
+    Args:
+        locale (str): The locale code.
+    """
+    token = _current.set(load(locale))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def set_current(locale: str):
+    """
+    Show text in a locale from now on, until the enclosing using block ends.
+
+    Args:
+        locale (str): The locale code.
+    """
+    _current.set(load(locale))
+
+
+def tr(key: str, **fields):
+    """
+    Fill in a message in the current locale.
+
+    Args:
+        key (str): The message key, e.g. "cave.moved".
+        **fields: Values for the template's placeholders.
+    Returns:
+        str: The message.
+    """
+    catalog = _current.get()
+    if catalog is None:
+        catalog = load()
+    template = catalog.templates[key]
+    return template(fields) if fields else template
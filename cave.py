@@ -1,8 +1,21 @@
-"""Module containing Cave class."""
+"""Module containing the Cave class and its compact, array-backed variant."""
+
+from array import array
+
+from catalog import tr
+from output import say
+
+DIRECTIONS = ("north", "east", "south", "west")
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+EXIT_MESSAGES = {direction: f"cave.exit.{direction}" for direction in DIRECTIONS}
+NO_CAVE = -1
+
 
 class Cave:
     """Class representing a cave in the adventure game."""
 
+    __slots__ = ("name", "description", "linked_caves", "character", "item")
+
     def __init__(self, name):
         """
         Initialize a Cave object.
@@ -41,7 +54,7 @@ class Cave:
         Returns:
             str: The cave's description.
         """
-        return self.description
+        return None if self.description is None else str(self.description)
 
     def set_description(self, description):
         """
@@ -110,22 +123,56 @@ class Cave:
         """
         self.linked_caves[direction] = cave
 
+    def unlink_cave(self, direction):
+        """
+        Remove the link in a given direction, if there is one.
+
+        Args:
+            direction (str): The direction of the link to remove.
+        """
+        self.linked_caves.pop(direction, None)
+
+    def get_linked_cave(self, direction):
+        """
+        Get the cave linked in a given direction.
+
+        Args:
+            direction (str): The direction to look in.
+
+        Returns:
+            Cave: The linked cave, or None if there is no path that way.
+        """
+        return self.linked_caves.get(direction)
+
+    def get_exits(self):
+        """
+        Get the directions out of the cave and where they lead.
+
+        Returns:
+            list: (direction, linked cave name) pairs.
+        """
+        return [(direction, cave.get_name()) for direction, cave in self.linked_caves.items()]
+
     def get_details(self):
         """
         Print details of the cave, including description, linked caves,
         and any character or item present.
         """
-        print(f"The {self.name}.")
-        print(self.description)
-        for direction, cave in self.linked_caves.items():
-            print(f"The {cave.get_name()} is {direction}.")
-        print()
+        say(tr("cave.name", name=self.name))
+        say(self.get_description())
+        for direction, name in self.get_exits():
+            key = EXIT_MESSAGES.get(direction)
+            if key is not None:
+                say(tr(key, name=name))
+            else:
+                say(tr("cave.exit", name=name, direction=direction))
+        say()
         if self.character:
             self.character.describe()
-            print()
+            say()
         if self.item:
             self.item.describe()
-            print()
+            say()
 
     def move(self, direction):
         """
@@ -138,12 +185,157 @@ class Cave:
             Cave: The cave object in the specified direction,
                   or the current cave if movement is not possible.
         """
-        if direction in self.linked_caves:
-            print(
-                f"You wander through a tunnel and reach the "
-                f"{self.linked_caves[direction].get_name()}."
-            )
-            return self.linked_caves[direction]
-        print("There is no path in that direction.")
-        print(f"You are still in the {self.get_name()}.")
+        destination = self.get_linked_cave(direction)
+        if destination is not None:
+            say(tr("cave.moved", name=destination.get_name()))
+            return destination
+        say(tr("cave.no_path"))
+        say(tr("cave.still_here", name=self.get_name()))
         return self
+
+
+class CaveGraph:
+    """
+    Class holding the caves of a large world and the links between them.
+
+    Links are stored in one flat array of cave indexes, four entries
+    (north, east, south, west) per cave, instead of a dict on every cave.
+    """
+
+    __slots__ = ("caves", "links")
+
+    def __init__(self):
+        """Initialize an empty CaveGraph."""
+        self.caves = []
+        self.links = array("i")
+
+    def add_cave(self, name):
+        """
+        Create a cave in the graph.
+
+        Args:
+            name (str): The name of the cave.
+
+        Returns:
+            CompactCave: The new cave.
+        """
+        cave = CompactCave(name, self, len(self.caves))
+        self.caves.append(cave)
+        self.links.extend((NO_CAVE,) * len(DIRECTIONS))
+        return cave
+
+    def link(self, origin: int, direction: str, destination: int):
+        """
+        Link one cave to another in a given direction.
+
+        Args:
+            origin (int): Index of the cave the link starts from.
+            direction (str): One of DIRECTIONS.
+            destination (int): Index of the cave the link leads to.
+        """
+        if direction not in DIRECTION_CODES:
+            raise ValueError(f"direction must be one of {DIRECTIONS}, not {direction!r}")
+        self.links[origin * len(DIRECTIONS) + DIRECTION_CODES[direction]] = destination
+
+    def neighbour(self, index: int, code: int):
+        """
+        Get the index of the cave linked in a direction.
+
+        Args:
+            index (int): Index of the cave to look from.
+            code (int): Index of the direction in DIRECTIONS.
+
+        Returns:
+            int: The linked cave's index, or NO_CAVE.
+        """
+        return self.links[index * len(DIRECTIONS) + code]
+
+
+class CompactCave(Cave):
+    """
+    A cave whose links are stored in a shared CaveGraph.
+
+    Behaves like a Cave, except that directions are limited to DIRECTIONS and
+    linked caves must belong to the same graph. Create these with
+    CaveGraph.add_cave.
+    """
+
+    # The inherited linked_caves slot is unused; the property below replaces it.
+    __slots__ = ("graph", "index")
+
+    def __init__(self, name, graph: CaveGraph, index: int):
+        """
+        Initialize a CompactCave object.
+
+        Args:
+            name (str): The name of the cave.
+            graph (CaveGraph): The graph holding the cave's links.
+            index (int): The cave's index in the graph.
+        """
+        self.name = name
+        self.description = None
+        self.character = None
+        self.item = None
+        self.graph = graph
+        self.index = index
+
+    def __copy__(self):
+        """Return a copy of the cave that shares its graph and index."""
+        cave = CompactCave(self.name, self.graph, self.index)
+        cave.description = self.description
+        cave.character = self.character
+        cave.item = self.item
+        return cave
+
+    @property
+    def linked_caves(self):
+        """Return a dict of direction to linked cave, built from the graph."""
+        caves = self.graph.caves
+        linked = {}
+        for code, direction in enumerate(DIRECTIONS):
+            destination = self.graph.neighbour(self.index, code)
+            if destination != NO_CAVE:
+                linked[direction] = caves[destination]
+        return linked
+
+    def link_cave(self, cave, direction):
+        """
+        Link another cave in the same graph to this cave in a given direction.
+
+        Args:
+            cave (CompactCave): The cave object to link.
+            direction (str): One of DIRECTIONS.
+        """
+        if cave.graph is not self.graph:
+            raise ValueError("linked caves must belong to the same CaveGraph")
+        self.graph.link(self.index, direction, cave.index)
+
+    def unlink_cave(self, direction):
+        """
+        Remove the link in a given direction, if there is one.
+
+        Args:
+            direction (str): One of DIRECTIONS.
+        """
+        if direction in DIRECTION_CODES:
+            self.graph.links[self.index * 4 + DIRECTION_CODES[direction]] = NO_CAVE
+
+    def get_linked_cave(self, direction):
+        """
+        Get the cave linked in a given direction.
+
+        Args:
+            direction (str): The direction to look in.
+
+        Returns:
+            CompactCave: The linked cave, or None if there is no path that way.
+        """
+        code = DIRECTION_CODES.get(direction)
+        if code is None:
+            return None
+        graph = self.graph
+        # Inlined CaveGraph.neighbour: this is the hot path when walking the map.
+        destination = graph.links[self.index * 4 + code]
+        if destination == NO_CAVE:
+            return None
+        return graph.caves[destination]
@@ -1,12 +1,16 @@
 """Module containing the Character, Person, and Enemy classes."""
 
+from catalog import tr
+from output import say
+from registry import characters, items
 from utilities import death_screen
-import health
 
 
 class Character:
     """Base class for all characters in the game."""
 
+    __slots__ = ("name", "messages", "conversation", "id")
+
     def __init__(self, name: str, messages: dict):
         """
         Initialize a Character object.
@@ -18,6 +22,18 @@ class Character:
         self.name = name
         self.messages = messages
         self.conversation = None
+        self.id = characters.intern(name)
+
+    def message(self, key: str):
+        """
+        Get one of the character's messages.
+
+        Args:
+            key (str): The message's key, e.g. "description".
+        Returns:
+            str: The message text.
+        """
+        return str(self.messages[key])
 
     def set_conversation(self, conversation: str):
         """
@@ -30,16 +46,16 @@ class Character:
 
     def describe(self):
         """Print the character's presence and description."""
-        print(f"{self.name} is here.")
-        print(self.messages["description"])
+        say(tr("character.here", name=self.name))
+        say(self.message("description"))
 
     def talk(self):
         """Print the character's conversation or a default message."""
-        print()
+        say()
         if self.conversation is not None:
-            print(f"{self.name}: {self.conversation}")
+            say(tr("character.says", name=self.name, conversation=self.conversation))
         else:
-            print(f"{self.name} does not want to talk to you.")
+            say(tr("character.silent", name=self.name))
 
     def get_name(self):
         """Return the character's name."""
@@ -49,6 +65,8 @@ class Character:
 class Person(Character):
     """Class for non-enemy people in the game."""
 
+    __slots__ = ("gift_item", "reward_item", "affinity")
+
     def __init__(self, name: str, messages: dict, quest_items: list):
         """
         Initialize a Person object.
@@ -65,6 +83,17 @@ class Person(Character):
         self.reward_item = quest_items[1]
         self.affinity = 0
 
+    def wants(self, item_name: str):
+        """
+        Check whether an item is the one the person is asking for.
+
+        Args:
+            item_name (str): Name of the item offered.
+        Returns:
+            bool: True if giving it completes the person's quest.
+        """
+        return items[item_name] == self.gift_item.id
+
     def give(self, item_name: str):
         """
         Give an item to the person and update conversation/affinity.
@@ -74,7 +103,7 @@ class Person(Character):
         Returns:
             reward item or None
         """
-        if item_name == self.gift_item.get_name():
+        if self.wants(item_name):
             self.set_conversation(self.messages["grateful"])
             self.talk()
             self.affinity += 1
@@ -95,13 +124,15 @@ class Person(Character):
         Returns:
             bool: True always (for game logic).
         """
-        print(f"\nOuch! Don't fight me! Put that {combat_item} away!")
+        say(tr("person.fight", item=combat_item))
         return True
 
 
 class Enemy(Character):
     """Class for enemy characters in the game."""
 
+    __slots__ = ("weakness", "weakness_id", "is_enemy", "drop")
+
     def __init__(self, name: str, messages: dict, weakness, drop):
         """
         Initialize an Enemy object.
@@ -114,7 +145,7 @@ class Enemy(Character):
             drop (Item): Item dropped by the enemy when defeated.
         """
         super().__init__(name, messages)
-        self.weakness = weakness
+        self.set_weakness(weakness)
         self.is_enemy = True
         self.messages = messages
         self.drop = drop
@@ -123,6 +154,27 @@ class Enemy(Character):
         """Return the enemy's weakness item name."""
         return self.weakness
 
+    def set_weakness(self, weakness: str):
+        """
+        Set the item that defeats the enemy.
+
+        Args:
+            weakness (str): Name of the item.
+        """
+        self.weakness = weakness
+        self.weakness_id = items.intern(weakness)
+
+    def defeated_by(self, combat_item: str):
+        """
+        Check whether fighting with an item defeats the enemy.
+
+        Args:
+            combat_item (str): Name of item used to fight.
+        Returns:
+            bool: True if the item is the enemy's weakness.
+        """
+        return items[combat_item] == self.weakness_id
+
     def fight(self, combat_item: str):
         """
         Fight the enemy using a combat item.
@@ -130,16 +182,16 @@ class Enemy(Character):
         Args:
             combat_item (str): Name of item used to fight.
         Returns:
-            Item or bool: Item if defeated, False if player dies.
+            Item or bool: Item if defeated, False if the attack failed.
+                The caller is responsible for the resulting damage.
         """
-        if combat_item.lower() == self.weakness:
-            print()
-            print(self.messages["attack_success"])
+        if self.defeated_by(combat_item):
+            say()
+            say(self.message("attack_success"))
             if self.drop:
-                print(f"You have obtained {self.drop.get_name()}!")
+                say(tr("enemy.drop", item=self.drop.get_name()))
             return self.drop
-        print(f"\n{self.messages['attack_failure']}")
-        health.health = health.update(-2)
+        say(f"\n{self.message('attack_failure')}")
         return False
 
     def give(self, give_item_name: str):
@@ -149,21 +201,19 @@ class Enemy(Character):
         Args:
             give_item (str): Item to give.
         Returns:
-            bool: False (player dies).
+            bool: False (the caller is responsible for the resulting damage).
         """
         give_item_name = give_item_name.lower()
-        print(
-            f"{self.name} reacts aggressively and attacks you. "
-            "Unprepared, you cannot fight back."
-        )
-        print(self.messages["attack_failure"])
-        health.health = health.update(-2)
+        say(tr("enemy.give", name=self.name))
+        say(self.message("attack_failure"))
         return False
 
 
 class Boss(Enemy):
     """Class for the boss enemy (dragon)."""
 
+    __slots__ = ("is_boss", "weakness_mask")
+
     def __init__(self, name: str, weakness: list[str], messages: dict, drop=None):
         """
         Initialize a Boss object.
@@ -174,9 +224,38 @@ class Boss(Enemy):
             weaknesses (list of strings): Item names that defeat the boss.
         """
         super().__init__(name=name, messages=messages, weakness=weakness, drop=drop)
-        self.weakness.sort()
         self.is_boss = True
 
+    def set_weakness(self, weakness: list[str]):
+        """
+        Set the items that defeat the boss together.
+
+        Args:
+            weakness (list of strings): Names of the items, all different.
+        """
+        self.weakness = sorted(weakness)
+        self.weakness_id = None
+        self.weakness_mask = items.intern_mask(weakness)
+
+    def defeated_by(self, combat_items: list[str]):
+        """
+        Check whether fighting with a set of items defeats the boss.
+
+        Args:
+            combat_items (list): Names of items used to fight.
+        Returns:
+            bool: True if the items are exactly the boss's weaknesses.
+        """
+        if len(combat_items) != len(self.weakness):
+            return False
+        mask = 0
+        for name in combat_items:
+            number = items[name]
+            if number is None:
+                return False
+            mask |= 1 << number
+        return mask == self.weakness_mask
+
     def fight(self, combat_item: list[str]):
         """
         Fight the boss using a combat item.
@@ -186,14 +265,13 @@ class Boss(Enemy):
         Returns:
             bool: True if defeated, False if player dies.
         """
-        combat_item.sort()
-        print()
-        if combat_item == self.weakness:
-            print(self.messages["attack_success"])
-            print()
-            print("YOU WIN!")
+        say()
+        if self.defeated_by(combat_item):
+            say(self.message("attack_success"))
+            say()
+            say(tr("boss.win"))
             return True
-        print(self.messages["attack_failure"])
-        print()
+        say(self.message("attack_failure"))
+        say()
         death_screen()
         return False
@@ -0,0 +1,248 @@
+"""Module containing the command registry.
+
+Commands are looked up in a trie of their aliases, so dispatch takes time
+proportional to the length of what was typed, and any unambiguous prefix of at
+least MIN_PREFIX letters works. Typos are matched against a BK-tree of the
+aliases to suggest what the player probably meant.
+
+New verbs can be added from any module with the command decorator:
+
+    @command("dance", "boogie")
+    def dance(session):
+        say("You dance a little jig.")
+        session.end_turn()
+
+A handler receives the GameSession and must end by calling session.end_turn(),
+session.ask(...) or session.finish(...). Commands registered with
+argument=True also accept the rest of the line, as in "goto lair", and get it
+as a second parameter ("" if nothing followed the command).
+"""
+
+MIN_PREFIX = 3
+
+
+def edit_distance(first: str, second: str):
+    """
+    Return the edit distance between two strings.
+
+    Insertions, deletions, substitutions and swaps of two neighbouring letters
+    each count as one edit (optimal string alignment distance).
+
+    Args:
+        first (str): The first string.
+        second (str): The second string.
+    """
+    before_previous = None
+    previous = list(range(len(second) + 1))
+    for row in range(1, len(first) + 1):
+        current = [row]
+        for column in range(1, len(second) + 1):
+            cost = first[row - 1] != second[column - 1]
+            distance = min(
+                previous[column] + 1,
+                current[column - 1] + 1,
+                previous[column - 1] + cost,
+            )
+            if (
+                row > 1
+                and column > 1
+                and first[row - 1] == second[column - 2]
+                and first[row - 2] == second[column - 1]
+            ):
+                distance = min(distance, before_previous[column - 2] + 1)
+            current.append(distance)
+        before_previous, previous = previous, current
+    return previous[-1]
+
+
+def max_typos(word: str):
+    """Return how many typos to allow when correcting a word of this length."""
+    return 1 if len(word) <= 4 else 2
+
+
+class BKTree:
+    """
+    Class indexing words by edit distance.
+
+    Finding every word within a small distance of a query only visits a
+    fraction of the tree, however many words it holds.
+    """
+
+    __slots__ = ("root",)
+
+    def __init__(self, words=()):
+        """
+        Initialize a BKTree object.
+
+        Args:
+            words (iterable): Words to add.
+        """
+        # Each node is (word, {distance: child node}).
+        self.root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        """Add a word to the tree."""
+        if self.root is None:
+            self.root = (word, {})
+            return
+        node = self.root
+        while True:
+            distance = edit_distance(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                return
+            node = child
+
+    def search(self, word: str, max_distance: int):
+        """
+        Find the words within a given edit distance.
+
+        Args:
+            word (str): The word to look for.
+            max_distance (int): The largest distance to accept.
+        Returns:
+            list: (distance, word) pairs, closest first.
+        """
+        found = []
+        nodes = [self.root] if self.root else []
+        while nodes:
+            node_word, children = nodes.pop()
+            distance = edit_distance(word, node_word)
+            if distance <= max_distance:
+                found.append((distance, node_word))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    nodes.append(child)
+        return sorted(found)
+
+    def closest(self, word: str):
+        """Return the closest word within max_typos of word, or None."""
+        matches = self.search(word, max_typos(word))
+        return matches[0][1] if matches else None
+
+
+class _TrieNode:
+    """A node in the alias trie."""
+
+    __slots__ = ("children", "handler", "below")
+
+    def __init__(self):
+        self.children = {}
+        # The handler for the alias ending here, if any.
+        self.handler = None
+        # The handler every alias below this node shares, or AMBIGUOUS.
+        self.below = None
+
+
+AMBIGUOUS = object()
+
+
+class CommandRegistry:
+    """Class mapping typed commands to their handlers."""
+
+    def __init__(self):
+        """Initialize an empty CommandRegistry."""
+        self.root = _TrieNode()
+        self.aliases = {}
+        self.takes_argument = set()
+        self.spelling = BKTree()
+
+    def register(self, handler, *aliases: str, argument: bool = False):
+        """
+        Register a handler under one or more aliases.
+
+        Registering an alias again replaces its handler.
+
+        Args:
+            handler (callable): Called with the GameSession when the command is typed.
+            aliases (str): The words that run the command, in lower case.
+            argument (bool): Whether the handler takes the rest of the line as an argument.
+        """
+        for alias in aliases:
+            self.aliases[alias] = handler
+            self.spelling.add(alias)
+        if argument:
+            self.takes_argument.add(handler)
+        self._rebuild()
+
+    def _rebuild(self):
+        """Rebuild the trie from the alias table."""
+        self.root = _TrieNode()
+        for alias, handler in self.aliases.items():
+            node = self.root
+            for char in alias:
+                node.below = handler if node.below in (None, handler) else AMBIGUOUS
+                node = node.children.setdefault(char, _TrieNode())
+            node.below = handler if node.below in (None, handler) else AMBIGUOUS
+            node.handler = handler
+
+    def resolve(self, text: str):
+        """
+        Find the handler for a typed command.
+
+        Args:
+            text (str): The command, stripped and in lower case.
+        Returns:
+            callable or None: The handler for an alias or unambiguous prefix of one.
+        """
+        node = self.root
+        for char in text:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        if node.handler is not None:
+            return node.handler
+        if len(text) >= MIN_PREFIX and node.below is not AMBIGUOUS:
+            return node.below
+        return None
+
+    def resolve_with_argument(self, text: str):
+        """
+        Find the handler for a command typed with an argument after it.
+
+        The longest alias followed by a space wins, so "go to lair" finds
+        "go to" rather than "go".
+
+        Args:
+            text (str): The command line, stripped and in lower case.
+        Returns:
+            tuple or None: (handler, argument) if the line starts with a command
+                that takes an argument, otherwise None.
+        """
+        found = None
+        node = self.root
+        for position, char in enumerate(text):
+            if char == " " and node.handler in self.takes_argument:
+                found = node.handler, text[position:].strip()
+            node = node.children.get(char)
+            if node is None:
+                break
+        return found
+
+    def suggest(self, text: str):
+        """Return the alias the player most likely meant, or None."""
+        return self.spelling.closest(text)
+
+
+registry = CommandRegistry()
+
+
+def command(*aliases: str, argument: bool = False):
+    """
+    Decorator that registers a function as a command in the default registry.
+
+    Args:
+        aliases (str): The words that run the command, in lower case.
+        argument (bool): Whether the handler takes the rest of the line as an argument.
+    """
+
+    def decorator(handler):
+        registry.register(handler, *aliases, argument=argument)
+        return handler
+
+    return decorator
@@ -0,0 +1,226 @@
+"""Module for keeping a world's narrative text in a compressed, memory-mapped pack.
+
+A content pack holds every description and line of dialogue of a world,
+zlib-compressed in blocks. Game objects hold small Text handles instead of the
+strings, and text is decompressed only when it is shown. The pack is
+memory-mapped, so every process serving the same world shares one copy of it
+through the page cache. Each process only keeps a few recently used blocks
+decompressed.
+
+Pack layout (little endian):
+    header: magic, version, sha256 of the texts, block count, text count
+    block offsets: the file offset of each block, then the end of the last block
+    text entries: (block, start, end) for each text, in bytes within its block
+    blocks: zlib-compressed UTF-8 text
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+PACK_MAGIC = b"CAVETEXT"
+PACK_VERSION = 1
+BLOCK_SIZE = 4 * 1024
+BLOCK_CACHE_SIZE = 64
+
+_HEADER = struct.Struct("<8sB32sII")
+_OFFSET = struct.Struct("<Q")
+_ENTRY = struct.Struct("<III")
+
+
+class ContentError(ValueError):
+    """Raised when a content pack is not a pack, or is of an unsupported version."""
+
+
+def texts_digest(texts: list):
+    """Return the sha256 digest identifying a list of texts."""
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode())
+        digest.update(b"\0")
+    return digest.digest()
+
+
+def write_pack(path: Path, texts: list):
+    """
+    Write a content pack holding texts, in order.
+
+    The pack is written to a temporary file and renamed into place, so
+    processes that already have the old pack mapped keep reading it safely.
+
+    Args:
+        path (Path): Where to write the pack.
+        texts (list): The strings to store. A text's id is its index here.
+    """
+    blocks = []
+    entries = []
+    block = bytearray()
+    for text in texts:
+        encoded = text.encode()
+        if block and len(block) + len(encoded) > BLOCK_SIZE:
+            blocks.append(zlib.compress(bytes(block), 9))
+            block = bytearray()
+        entries.append((len(blocks), len(block), len(block) + len(encoded)))
+        block += encoded
+    if block:
+        blocks.append(zlib.compress(bytes(block), 9))
+
+    header = _HEADER.pack(PACK_MAGIC, PACK_VERSION, texts_digest(texts), len(blocks), len(texts))
+    offset = len(header) + _OFFSET.size * (len(blocks) + 1) + _ENTRY.size * len(entries)
+    offsets = [offset]
+    for compressed in blocks:
+        offset += len(compressed)
+        offsets.append(offset)
+
+    path = Path(path)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as file:
+        file.write(header)
+        file.writelines(_OFFSET.pack(offset) for offset in offsets)
+        file.writelines(_ENTRY.pack(*entry) for entry in entries)
+        file.writelines(blocks)
+    temporary.replace(path)
+
+
+class ContentStore:
+    """Class giving read access to the texts in a content pack."""
+
+    def __init__(self, path: Path, cache_size: int = BLOCK_CACHE_SIZE):
+        """
+        Open a content pack.
+
+        Args:
+            path (Path): The pack file.
+            cache_size (int): How many decompressed blocks to keep.
+        Raises:
+            ContentError: If the file is not a content pack this version can read.
+        """
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < _HEADER.size:
+                raise ContentError(f"{path}: not a content pack")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.digest, self.block_count, self.text_count = _HEADER.unpack_from(
+            self._map
+        )
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self._map.close()
+            raise ContentError(f"{path}: not a version {PACK_VERSION} content pack")
+        self.path = Path(path)
+        self.cache_size = cache_size
+        self._entries = _HEADER.size + _OFFSET.size * (self.block_count + 1)
+        self._block = lru_cache(maxsize=cache_size)(self._read_block)
+
+    def __len__(self):
+        """Return the number of texts in the pack."""
+        return self.text_count
+
+    def __deepcopy__(self, memo):
+        """Return the store itself: it is read-only."""
+        return self
+
+    def __reduce__(self):
+        """Pickle the store as its path, reopening the pack when unpickled."""
+        return ContentStore, (self.path, self.cache_size)
+
+    def _read_block(self, block: int):
+        """Decompress one block of the pack."""
+        position = _HEADER.size + _OFFSET.size * block
+        start = _OFFSET.unpack_from(self._map, position)[0]
+        end = _OFFSET.unpack_from(self._map, position + _OFFSET.size)[0]
+        return zlib.decompress(self._map[start:end])
+
+    def get(self, index: int):
+        """
+        Get a text by id.
+
+        Args:
+            index (int): The text's id.
+        Returns:
+            str: The text.
+        """
+        if not 0 <= index < self.text_count:
+            raise IndexError(f"no text {index} in {self.path}")
+        block, start, end = _ENTRY.unpack_from(self._map, self._entries + _ENTRY.size * index)
+        return self._block(block)[start:end].decode()
+
+    def text(self, index: int):
+        """Return a Text handle for a text id."""
+        return Text(self, index)
+
+    def close(self):
+        """Release the pack's memory map."""
+        self._block.cache_clear()
+        self._map.close()
+
+
+class Text:
+    """
+    A handle to one text in a ContentStore.
+
+    Converting it to a string (str(), an f-string) reads the text from the store.
+    Descriptions, messages and conversations in a world may be Text handles
+    rather than strings, so code reading them converts them with str(). Files
+    that cannot be written beside the world file, in a read-only directory,
+    are simply done without: the text stays in memory as strings, and the
+    world bundle is compiled again on every start.
+    """
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: ContentStore, index: int):
+        """
+        Initialize a Text handle.
+
+        Args:
+            store (ContentStore): The store holding the text.
+            index (int): The text's id in the store.
+        """
+        self.store = store
+        self.index = index
+
+    def __str__(self):
+        """Return the text."""
+        return self.store.get(self.index)
+
+    def __repr__(self):
+        """Return a short description of the handle."""
+        return f"Text({self.index})"
+
+    def __copy__(self):
+        """Return the handle itself: it is immutable."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Return the handle itself: it is immutable."""
+        return self
+
+
+def open_pack(path: Path, texts: list, cache_size: int = BLOCK_CACHE_SIZE):
+    """
+    Open the content pack for a list of texts, writing it first if it is missing or stale.
+
+    Args:
+        path (Path): The pack file.
+        texts (list): The strings the pack must hold, in id order.
+        cache_size (int): How many decompressed blocks to keep.
+    Returns:
+        ContentStore or None: The open store, or None if the pack could not be written.
+    """
+    digest = texts_digest(texts)
+    try:
+        store = ContentStore(path, cache_size)
+        if store.digest == digest:
+            return store
+        store.close()
+    except (OSError, ContentError):
+        pass
+    try:
+        write_pack(path, texts)
+        return ContentStore(path, cache_size)
+    except OSError:
+        return None
@@ -0,0 +1,538 @@
+"""Module for fuzzing the game: playing random input and looking for crashes.
+
+Each run plays a sequence of lines through a GameSession in this process, so
+there is no subprocess or terminal to wait for, and checks after every step
+that the game is still in a sound state (see check). Lines are made up to
+suit what the game is waiting for: commands at the start of a turn, items
+held and not held when it asks for one, directions when it asks which way,
+and well- and badly-formed item lists when the boss asks for two items.
+
+Line and branch coverage steer the search. A run is kept in the corpus,
+along with the session it ended in, if it reaches something no run has
+before: a new arc (a step from one line of the game's code to another), a
+cave with a new set of items in hand, or an ending. Where the player is and
+what they hold count too, as winning takes many moves through code that has
+already run. Most runs fork a kept session and carry on from where it
+stopped, so only the new lines are played; the rest mutate a kept sequence
+(dropping, replacing or repeating lines, or splicing two together) and play
+it from the start.
+
+A failure is shrunk to the fewest lines that still fail the same way, and
+reported once per place it happens. Failing sequences can be written out as
+transcripts, to play again with:
+
+    python -m main --skip-tutorial --transcript crashes/crash1.txt
+
+Fuzz the default world for a minute, or a generated one:
+    python fuzzer.py [world file] [--seed N --size N] [--seconds 60] [--crashes DIR]
+"""
+
+import os
+import random
+import sys
+import time
+import traceback
+from itertools import islice
+
+import catalog
+from commands import registry
+from output import Event
+from session import GameSession
+
+# The event kinds a session may produce.
+KINDS = {"text", "rule", "prompt", "pause", "end"}
+OUTCOMES = {"win", "dead", "quit"}
+# Lines a player might type anywhere, that the game should shrug off.
+JUNK = ("", " ", "  y", "N", "none", "\t", "é", "🐉", "x" * 40, ", ", ",", "?!")
+# Items and places no world has.
+BOGUS = ("spoon", "the torch", "torch torch", "sword,", "")
+DIRECTIONS = ("north", "south", "east", "west", "up", "down", "n", "")
+# How many lines a run adds to a forked session.
+MAX_EXTEND = 4
+# How often a run forks a kept session rather than mutating a kept sequence.
+EXTEND_CHANCE = 0.9
+# Calls in a row without a new arc before code stops being traced.
+COOL_AFTER = 2000
+# Runs in a row without anything new before all code is traced again.
+REHEAT_AFTER = 20_000
+# How many inputs to keep without coverage to steer by.
+MAX_UNGUIDED = 1000
+REPORT_EVERY = 5.0
+
+
+class FuzzFailure(Exception):
+    """Raised by check when a session is left in an unsound state."""
+
+
+class Coverage:
+    """
+    Class recording the arcs of the game's code that run, with sys.settrace.
+
+    Only code in the game's own modules is traced, not this one or the
+    standard library's, so other calls cost one lookup each. Tracing every
+    line is what makes a run slow, so code that has been called cool_after
+    times in a row without running a new arc stops being traced, until
+    reheat() traces everything again.
+    """
+
+    def __init__(
+        self, root: str = os.path.dirname(os.path.abspath(__file__)), cool_after: int = COOL_AFTER
+    ):
+        """
+        Initialize a Coverage object.
+
+        Args:
+            root (str): The directory holding the modules to trace.
+            cool_after (int): Calls without a new arc before code stops being traced.
+        """
+        self.root = root + os.sep
+        self.cool_after = cool_after
+        self.arcs = set()
+        # Code object to whether it is traced.
+        self._traced = {}
+        # Code object to calls since it last ran a new arc.
+        self._quiet = {}
+
+    def __len__(self):
+        """Return how many arcs have run."""
+        return len(self.arcs)
+
+    def __enter__(self):
+        """Start recording."""
+        sys.settrace(self._call)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop recording."""
+        sys.settrace(None)
+
+    def reheat(self):
+        """Trace all of the game's code again."""
+        for code, traced in self._traced.items():
+            if code in self._quiet:
+                self._traced[code] = True
+                self._quiet[code] = 0
+
+    def _call(self, frame, event, arg):
+        """Return the tracer for a new frame, or None if its code is not traced."""
+        code = frame.f_code
+        traced = self._traced.get(code)
+        if traced is None:
+            filename = code.co_filename
+            traced = filename.startswith(self.root) and filename != __file__
+            self._traced[code] = traced
+            if traced:
+                self._quiet[code] = 0
+        if not traced:
+            return None
+        arcs = self.arcs
+        previous = 0
+        found = False
+
+        def line(frame, event, arg):
+            nonlocal previous, found
+            # Returns and exceptions are arcs to 0 and -1.
+            to = frame.f_lineno if event == "line" else (0 if event == "return" else -1)
+            arc = (code, previous, to)
+            if arc not in arcs:
+                arcs.add(arc)
+                found = True
+            previous = to or previous
+            if event == "return":
+                self._cool(code, found)
+            return line
+
+        return line
+
+    def _cool(self, code, found: bool):
+        """Count a finished call, and stop tracing its code if it is running nothing new."""
+        if found:
+            self._quiet[code] = 0
+            return
+        quiet = self._quiet[code] + 1
+        self._quiet[code] = quiet
+        if quiet >= self.cool_after:
+            self._traced[code] = False
+
+
+def vocabulary(world):
+    """
+    Return the words lines are made from, for a world.
+
+    Returns:
+        dict: "commands" to the aliases of each command, and "items" and
+            "caves" to lists of lower-case names.
+    """
+    items = {name.lower() for name in world.items}
+    items.update(item.get_name().lower() for item in world.inventory)
+    # Generated worlds are built as they are played, so only the start is known.
+    caves = [name.lower() for name in islice(world.caves, 50)]
+    # Commands are chosen before aliases, so that quit's four do not end most games.
+    aliases = {}
+    for alias, handler in sorted(registry.aliases.items()):
+        aliases.setdefault(handler, []).append(alias)
+    return {
+        "commands": list(aliases.values()),
+        "items": sorted(items) + list(BOGUS),
+        "caves": caves + ["nowhere", ""],
+    }
+
+
+def make_line(session, words: dict, rng: random.Random):
+    """
+    Return a line of input suited to what a session is waiting for.
+
+    Args:
+        session (GameSession): The session that will be given the line.
+        words (dict): The vocabulary (see vocabulary).
+        rng (Random): The source of randomness.
+    Returns:
+        str: The line.
+    """
+    if rng.random() < 0.05:
+        return rng.choice(JUNK)
+    held = session.inventory.names()
+    match getattr(session.pending, "__name__", None):
+        case "_move":
+            exits = [direction for direction, _ in session.current_cave.get_exits()]
+            return rng.choice(exits + list(DIRECTIONS))
+        case "_fight" | "_give" | "_describe_item":
+            return item_name(held, words, rng)
+        case "_fight_boss":
+            return boss_items(held, words, rng)
+        case "_inventory_choice":
+            return rng.choice(("y", "n", "yes", ""))
+        case "_goto":
+            return rng.choice(words["caves"])
+        case "_language":
+            return rng.choice(catalog.available() + ["xx"])
+    command = rng.choice(rng.choice(words["commands"]))
+    if command in ("goto", "go to", "travel") and rng.random() < 0.5:
+        return f"{command} {rng.choice(words['caves'])}"
+    if command in ("give", "fight", "move") and rng.random() < 0.2:
+        # Not commands that take an argument, but players type them anyway.
+        return f"{command} {item_name(held, words, rng)}"
+    return command
+
+
+def item_name(held: list, words: dict, rng: random.Random):
+    """Return the name of an item, more often one held than not, in any case."""
+    name = rng.choice(held) if held and rng.random() < 0.7 else rng.choice(words["items"])
+    if rng.random() < 0.1:
+        name = rng.choice((name.upper(), f" {name} ", name[:-1], name + name[-1:]))
+    return name
+
+
+def boss_items(held: list, words: dict, rng: random.Random):
+    """Return an answer to the boss's request for two items: half well formed, half not."""
+    if len(held) >= 2 and rng.random() < 0.5:
+        return ", ".join(rng.sample(held, 2))
+    names = [item_name(held, words, rng) for _ in range(rng.choice((1, 2, 2, 3)))]
+    separator = rng.choice((", ", ",", " , ", ",  ", " and "))
+    text = separator.join(names)
+    return rng.choice((text, text + ", ", ", " + text, text.upper()))
+
+
+def check(session, events: list):
+    """
+    Check that a session is in a sound state after a step.
+
+    Args:
+        session (GameSession): The session.
+        events (list): The events the step produced.
+    Raises:
+        FuzzFailure: If anything is wrong.
+    """
+    for event in events:
+        if not isinstance(event, Event) or event.kind not in KINDS:
+            raise FuzzFailure(f"unknown event {event!r}")
+    if type(session.health) is not int:
+        raise FuzzFailure(f"health is {session.health!r}, not an int")
+    if session.over:
+        if session.outcome not in OUTCOMES or session.pending is not None:
+            raise FuzzFailure(f"ended with {session.outcome!r}, still waiting")
+        if not events or events[-1].kind != "end":
+            raise FuzzFailure("ended without an end event")
+    else:
+        if session.health <= 0:
+            raise FuzzFailure(f"still playing with health {session.health}")
+        if session.pending is None or not events or events[-1].kind != "prompt":
+            raise FuzzFailure("waiting for input without a prompt")
+
+
+def play(session, lines):
+    """
+    Feed lines to a session, checking it after each, until they run out or the game ends.
+
+    Returns:
+        int: How many lines were played.
+    Raises:
+        Exception: Whatever the game raised, or FuzzFailure.
+    """
+    played = 0
+    for line in lines:
+        if session.over:
+            break
+        check(session, session.step(line))
+        played += 1
+    return played
+
+
+def signature(error: BaseException):
+    """
+    Return what identifies a failure: its type and where in the game it was raised.
+
+    Two failures with the same signature are taken to be the same bug.
+    """
+    if isinstance(error, FuzzFailure):
+        return str(error)
+    place = "?"
+    for frame in traceback.extract_tb(error.__traceback__):
+        if frame.filename != __file__:
+            place = f"{os.path.basename(frame.filename)}:{frame.lineno}"
+    return f"{type(error).__name__} at {place}"
+
+
+class Fuzzer:
+    """Class running the search: the corpus, the coverage and the failures found."""
+
+    def __init__(self, world, seed: int = 0, coverage: bool = True):
+        """
+        Initialize a Fuzzer object.
+
+        Args:
+            world (World): The world to play in.
+            seed (int): Seed for the random choices, so that a search can be repeated.
+            coverage (bool): Whether to steer by coverage. Without it, runs are
+                faster, and a random sample of them is kept to carry on from.
+        """
+        self.world = world
+        self.rng = random.Random(seed)
+        self.words = vocabulary(world)
+        self.commands = tuple(alias for aliases in self.words["commands"] for alias in aliases)
+        self.coverage = Coverage() if coverage else None
+        # (lines, the session they ended in, or None if the game is over).
+        self.corpus = []
+        # Signature to the shortest failing lines and the error.
+        self.failures = {}
+        self.runs = 0
+        # The caves with the items held there, and endings, that runs have reached.
+        self.reached = set()
+        # Runs since one last reached anything new.
+        self.since_new = 0
+        # The lines of the input being played.
+        self._lines = []
+
+    def fresh(self):
+        """Return a new session, started without the tutorial."""
+        session = GameSession(self.world)
+        check(session, session.start(show_tutorial=False))
+        return session
+
+    def run(self, seconds: float | None = 60.0, runs: int | None = None, report=print):
+        """
+        Fuzz until a time or run limit.
+
+        Args:
+            seconds (float): How long to fuzz for, or None for no limit.
+            runs (int): How many runs to make, or None for no limit.
+            report (callable): Called with a line of progress now and then.
+        Returns:
+            dict: The failures found, by signature (see failures).
+        """
+        started = last_report = time.perf_counter()
+        deadline = None if seconds is None else started + seconds
+        if not self.corpus:
+            self._run_one(lambda: ((), self.fresh()))
+        while runs is None or self.runs < runs:
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                break
+            if now - last_report >= REPORT_EVERY:
+                report(self.status(now - started))
+                last_report = now
+            self._run_one(self._next_input)
+        report(self.status(time.perf_counter() - started))
+        return self.failures
+
+    def status(self, elapsed: float):
+        """Return a line of progress."""
+        arcs = f"{len(self.coverage):,} arcs, " if self.coverage is not None else ""
+        return (
+            f"{self.runs:,} runs ({self.runs / max(elapsed, 1e-9):,.0f}/s), "
+            f"{arcs}corpus {len(self.corpus):,}, {len(self.failures)} failure(s)"
+        )
+
+    def _run_one(self, make):
+        """Make and play one input, keeping it if it reached anything new."""
+        self.runs += 1
+        known = len(self.coverage) if self.coverage is not None else 0
+        try:
+            if self.coverage is not None:
+                with self.coverage:
+                    lines, session = make()
+            else:
+                lines, session = make()
+        except Exception as error:
+            self._failed(self._lines, error)
+            return
+        entry = (lines, None if session.over else session)
+        if self.coverage is None:
+            # Without coverage, keep a random sample of where runs got to.
+            if len(self.corpus) < MAX_UNGUIDED:
+                self.corpus.append(entry)
+            elif not session.over:
+                self.corpus[self.rng.randrange(MAX_UNGUIDED)] = entry
+            return
+        progressed = self._progressed(session)
+        if progressed or len(self.coverage) > known or not self.corpus:
+            self.corpus.append(entry)
+            self.since_new = 0
+        else:
+            self.since_new += 1
+            if self.since_new >= REHEAT_AFTER:
+                self.coverage.reheat()
+                self.since_new = 0
+
+    def _progressed(self, session):
+        """Return True if a session is in a cave with items, or an ending, no run has reached."""
+        if session.over:
+            state = session.outcome
+        else:
+            state = (session.current_cave.get_name(), frozenset(session.inventory.stacks))
+        if state in self.reached:
+            return False
+        self.reached.add(state)
+        return True
+
+    def _next_input(self):
+        """Play the next input: a kept session carried on, or a kept sequence mutated."""
+        lines, session = self.rng.choice(self.corpus)
+        if session is not None and self.rng.random() < EXTEND_CHANCE:
+            session = session.fork()
+            self._lines = list(lines)
+            for _ in range(self.rng.randint(1, MAX_EXTEND)):
+                if session.over:
+                    break
+                self._lines.append(make_line(session, self.words, self.rng))
+                check(session, session.step(self._lines[-1]))
+            return tuple(self._lines), session
+        self._lines = self.mutate(list(lines))
+        session = self.fresh()
+        played = play(session, self._lines)
+        return tuple(self._lines[:played]), session
+
+    def mutate(self, lines: list):
+        """Return a changed copy of a sequence of lines."""
+        rng = self.rng
+        for _ in range(rng.randint(1, 3)):
+            position = rng.randint(0, len(lines))
+            match rng.randrange(5):
+                case 0 if lines:
+                    del lines[min(position, len(lines) - 1)]
+                case 1 if lines:
+                    lines[min(position, len(lines) - 1)] = rng.choice(
+                        (rng.choice(self.commands), rng.choice(self.words["items"]))
+                    )
+                case 2 if lines:
+                    start = rng.randrange(len(lines))
+                    lines[position:position] = lines[start : start + rng.randint(1, 4)]
+                case 3:
+                    other, _ = rng.choice(self.corpus)
+                    lines = lines[:position] + list(other[rng.randint(0, len(other)) :])
+                case _:
+                    lines.insert(position, rng.choice(JUNK + self.commands))
+        return lines
+
+    def _failed(self, lines: list, error: Exception):
+        """Record a failure, shrinking it if it is the first of its kind."""
+        key = signature(error)
+        if key not in self.failures:
+            shortest = self.shrink(lines, key)
+            self.failures[key] = (shortest, error)
+
+    def fails(self, lines, key: str):
+        """Return True if playing lines from the start fails with the given signature."""
+        try:
+            play(self.fresh(), lines)
+        except Exception as error:
+            return signature(error) == key
+        return False
+
+    def shrink(self, lines: list, key: str):
+        """
+        Return the fewest lines that still fail the same way (delta debugging).
+
+        Args:
+            lines (list): Lines that fail.
+            key (str): The failure's signature.
+        Returns:
+            list: A subsequence of lines that fails with the same signature.
+        """
+        if not self.fails(lines, key):
+            # Failures that depend on a fork's history are kept as found.
+            return lines
+        chunk = len(lines) // 2
+        while chunk >= 1:
+            start = 0
+            while start < len(lines):
+                candidate = lines[:start] + lines[start + chunk :]
+                if self.fails(candidate, key):
+                    lines = candidate
+                else:
+                    start += chunk
+            chunk //= 2
+        return lines
+
+
+def write_crashes(failures: dict, directory: str):
+    """
+    Write each failure's lines as a transcript (see transcripts.py).
+
+    Returns:
+        list: The paths written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for number, (lines, _) in enumerate(failures.values(), 1):
+        path = os.path.join(directory, f"crash{number}.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("".join(f"{line}\n" for line in lines))
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from generator import generate_world
+    from world import DEFAULT_WORLD, build_world
+
+    parser = argparse.ArgumentParser(description="Fuzz the game with random input.")
+    parser.add_argument("world", nargs="?", default=DEFAULT_WORLD, help="world file to play in")
+    parser.add_argument("--seed", type=int, help="fuzz a generated world with this seed instead")
+    parser.add_argument(
+        "--size", type=int, default=50, help="width and height of a generated world"
+    )
+    parser.add_argument("--seconds", type=float, default=60.0, help="how long to fuzz for")
+    parser.add_argument("--runs", type=int, help="stop after this many runs")
+    parser.add_argument("--fuzz-seed", type=int, default=0, help="seed for the random input")
+    parser.add_argument(
+        "--no-coverage", action="store_true", help="play random input without steering by coverage"
+    )
+    parser.add_argument("--crashes", help="directory to write failing input to, as transcripts")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        world = generate_world(args.seed, args.size, args.size)
+    else:
+        world = build_world(args.world)
+    fuzzer = Fuzzer(world, args.fuzz_seed, coverage=not args.no_coverage)
+    failures = fuzzer.run(args.seconds, args.runs)
+    paths = write_crashes(failures, args.crashes) if args.crashes else [None] * len(failures)
+    for (key, (lines, error)), path in zip(failures.items(), paths):
+        print(f"\n{key}: {error!r}")
+        print(f"  {len(lines)} line(s): {' / '.join(lines) or '(start)'}")
+        if path:
+            print(f"  written to {path}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,587 @@
+"""Module for generating very large cave systems from a seed.
+
+Caves sit on a width x height grid, joined into a maze that always connects
+every cave, with a few extra tunnels to make loops. Nothing is built up front:
+a cave is created the first time something asks for it (usually Cave.move),
+from a random number generator seeded with the world seed and the cave's
+position. The same seed always gives the same caves, so caves that have not
+been visited for a while are dropped and come back identical when needed.
+
+Routes are found by GeneratedRouter, over the generator's layout, so finding
+one does not build the caves on the way.
+"""
+
+import heapq
+import random
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
+
+from cave import Cave
+from character import Person, Enemy, Boss
+from item import Item
+from routing import ROUTE_CACHE_SIZE
+from world import World
+
+# Share of caves with an extra tunnel east and south, on top of the maze.
+LOOP_CHANCE = 0.15
+ITEM_CHANCE = 0.2
+CHARACTER_CHANCE = 0.25
+ENEMY_SHARE = 0.6
+MAX_RESIDENT = 100_000
+# Layouts are rolled for neighbours too, so recently rolled ones are cached.
+LAYOUT_CACHE_SIZE = 65_536
+
+ADJECTIVES = ["damp", "mossy", "echoing", "narrow", "glittering", "dusty", "flooded", "chilly"]
+KINDS = ["cavern", "grotto", "tunnel", "hollow", "chamber", "gallery", "pit", "den"]
+DESCRIPTIONS = [
+    "Water drips steadily from the ceiling.",
+    "Strange markings cover the walls.",
+    "The floor is littered with old bones.",
+    "A faint breeze carries the smell of smoke.",
+    "Glowing fungi light the cave a soft blue.",
+    "The ground is slick with mud.",
+]
+
+ITEMS = {
+    "torch": "Effective against water type enemies.",
+    "water bomb": "An excellent combat item against fire type enemies.",
+    "rope": "A long coil of sturdy rope.",
+    "pickaxe": "A miner's pickaxe, chipped but sharp.",
+    "salt": "A pouch of coarse salt. Slugs hate it.",
+    "mushroom": "A plump cave mushroom. Probably edible.",
+    "lantern oil": "A flask of oil. Highly flammable.",
+    "silver key": "A small key that glints in the dark.",
+}
+
+ENEMIES = [
+    {
+        "name": "Slime",
+        "weakness": "torch",
+        "drop": "mushroom",
+        "messages": {
+            "description": "A wet blue slime sliding around the floor.",
+            "attack_success": "You jab the torch into the slime. It dissolves into goo.",
+            "attack_failure": "The slime oozes around you, its acidic touch burning your skin.",
+        },
+    },
+    {
+        "name": "Giant Slug",
+        "weakness": "salt",
+        "drop": "silver key",
+        "messages": {
+            "description": "A slug the size of a cart, leaving a glistening trail.",
+            "attack_success": "You throw the salt. The slug shrivels away with a hiss.",
+            "attack_failure": "The slug rolls over you, leaving you bruised and sticky.",
+        },
+    },
+    {
+        "name": "Fire Imp",
+        "weakness": "water bomb",
+        "drop": "lantern oil",
+        "messages": {
+            "description": "A small, cackling imp wreathed in flame.",
+            "attack_success": "The water bomb bursts over the imp, and it fizzles out.",
+            "attack_failure": "The imp scorches your arm and skips out of reach.",
+        },
+    },
+]
+
+PEOPLE = [
+    {
+        "name": "Miner",
+        "quest_items": ["pickaxe", "torch"],
+        "messages": {
+            "description": "A tired miner leaning on the wall.",
+            "pre_gift": "I dropped my pickaxe somewhere down here. Bring it back?",
+            "grateful": "My pickaxe! Here, take my spare torch.",
+            "ungrateful": "That's no use to me.",
+            "post_gift": "Back to digging. Thanks again.",
+        },
+    },
+    {
+        "name": "Hermit",
+        "quest_items": ["mushroom", "rope"],
+        "messages": {
+            "description": "A hermit wrapped in a patched blanket.",
+            "pre_gift": "So hungry... if only I had a mushroom.",
+            "grateful": "Delicious! Take this rope, I won't be climbing anywhere.",
+            "ungrateful": "I can't eat that.",
+            "post_gift": "Full at last. Safe travels.",
+        },
+    },
+]
+
+BOSS = {
+    "name": "Ifir",
+    "weakness": ["lantern oil", "silver key"],
+    "messages": {
+        "description": "A massive red dragon guarding a locked hoard.",
+        "attack_success": "You unlock the hoard and set the dragon's oil-soaked nest alight.\n"
+        "Ifir flees the caves forever!",
+        "attack_failure": "Ifir's fire engulfs you. The caves fall silent.",
+    },
+}
+
+NAME_PATTERN = re.compile(r"\((\d+), (\d+)\)$")
+STEPS = {"north": (0, -1), "east": (1, 0), "south": (0, 1), "west": (-1, 0)}
+OPPOSITES = {"north": "south", "east": "west", "south": "north", "west": "east"}
+# A route search gives up after settling this many caves, so that one goto
+# across a huge world cannot hold up everyone else. Up to ROUTE_CACHE_SIZE
+# search trees are kept for reuse, holding at most ROUTE_TREE_CAVES caves.
+ROUTE_SEARCH_LIMIT = 20_000
+ROUTE_TREE_CAVES = 200_000
+
+
+class CaveGenerator:
+    """Class that creates the caves of a seeded world on demand."""
+
+    def __init__(self, seed: int, width: int, height: int, max_resident: int = MAX_RESIDENT):
+        """
+        Initialize a CaveGenerator object.
+
+        Args:
+            seed (int): The world seed.
+            width (int): Number of caves from west to east.
+            height (int): Number of caves from north to south.
+            max_resident (int): How many caves to keep before dropping the least
+                recently used ones.
+        """
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.max_resident = max_resident
+        self.resident = OrderedDict()
+        # Held while using resident, as a server's workers share the world.
+        self._lock = threading.Lock()
+        self.generated = 0
+        self.caves = CaveMap(self)
+        self._layout = lru_cache(maxsize=LAYOUT_CACHE_SIZE)(self._roll_layout)
+
+    def _roll_layout(self, position: tuple):
+        """
+        Roll the layout and name of one cave, without building it.
+
+        Returns:
+            tuple: (maze direction, extra tunnel east, extra tunnel south, name).
+        """
+        x, y = position
+        rng = random.Random(f"{self.seed}/{x}/{y}")
+        # The maze: every cave opens north or west, which joins all caves together.
+        if x == 0 and y == 0:
+            maze = None
+        elif x == 0:
+            maze = "north"
+        elif y == 0:
+            maze = "west"
+        else:
+            maze = rng.choice(("north", "west"))
+        loop_east = rng.random() < LOOP_CHANCE
+        loop_south = rng.random() < LOOP_CHANCE
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(KINDS)} ({x}, {y})"
+        return maze, loop_east, loop_south, name
+
+    def name_at(self, position: tuple):
+        """Return the name of the cave at a position, without building it."""
+        return self._layout(position)[3]
+
+    def position_in(self, name: str):
+        """Return the position a cave name ends with if it is on the grid, or None."""
+        match = NAME_PATTERN.search(name)
+        if match is None:
+            return None
+        position = (int(match.group(1)), int(match.group(2)))
+        if position[0] >= self.width or position[1] >= self.height:
+            return None
+        return position
+
+    def exits_at(self, position: tuple):
+        """Return the directions out of the cave at a position, in cave.DIRECTIONS order."""
+        x, y = position
+        layout = self._layout
+        maze, loop_east, loop_south, _ = layout(position)
+        exits = []
+        if y > 0 and (maze == "north" or layout((x, y - 1))[2]):
+            exits.append("north")
+        if x < self.width - 1 and (loop_east or layout((x + 1, y))[0] == "west"):
+            exits.append("east")
+        if y < self.height - 1 and (loop_south or layout((x, y + 1))[0] == "north"):
+            exits.append("south")
+        if x > 0 and (maze == "west" or layout((x - 1, y))[1]):
+            exits.append("west")
+        return tuple(exits)
+
+    def cave_at(self, position: tuple):
+        """
+        Return the cave at a position, creating it if it is not resident.
+
+        Args:
+            position (tuple): (x, y) grid position.
+        Returns:
+            GeneratedCave: The cave.
+        """
+        with self._lock:
+            cave = self.resident.get(position)
+            if cave is not None:
+                self.resident.move_to_end(position)
+                return cave
+            cave = self._generate(position)
+            self.resident[position] = cave
+            self.generated += 1
+            if len(self.resident) > self.max_resident:
+                self.resident.popitem(last=False)
+            return cave
+
+    def drop_cold(self, keep: int = 0):
+        """
+        Drop the least recently used caves.
+
+        Args:
+            keep (int): How many of the most recently used caves to keep.
+        """
+        with self._lock:
+            while len(self.resident) > keep:
+                self.resident.popitem(last=False)
+
+    def _generate(self, position: tuple):
+        """Build the cave at a position, with its item and character."""
+        name = self.name_at(position)
+        x, y = position
+        rng = random.Random(f"{self.seed}/{x}/{y}/contents")
+        cave = GeneratedCave(name, self, position)
+        cave.set_description(
+            f"A {name.split(' ')[0]} {name.split(' ')[1]}. {rng.choice(DESCRIPTIONS)}"
+        )
+        if position == (self.width - 1, self.height - 1):
+            cave.set_character(
+                Boss(name=BOSS["name"], weakness=list(BOSS["weakness"]), messages=BOSS["messages"])
+            )
+            return cave
+        if rng.random() < ITEM_CHANCE:
+            item_name = rng.choice(list(ITEMS))
+            cave.set_item(Item(item_name, ITEMS[item_name]))
+        # The starting cave is always safe.
+        if position != (0, 0) and rng.random() < CHARACTER_CHANCE:
+            if rng.random() < ENEMY_SHARE:
+                kind = rng.choice(ENEMIES)
+                cave.set_character(
+                    Enemy(
+                        name=kind["name"],
+                        weakness=kind["weakness"],
+                        messages=kind["messages"],
+                        drop=Item(kind["drop"], ITEMS[kind["drop"]]),
+                    )
+                )
+            else:
+                kind = rng.choice(PEOPLE)
+                cave.set_character(
+                    Person(
+                        name=kind["name"],
+                        messages=kind["messages"],
+                        quest_items=[Item(name, ITEMS[name]) for name in kind["quest_items"]],
+                    )
+                )
+        return cave
+
+
+class CaveMap(Mapping):
+    """
+    Read-only mapping of cave name to cave for every cave a generator can make.
+
+    Looking a cave up creates it if needed. Iterating visits every cave in the
+    world, so avoid it on large worlds.
+    """
+
+    def __init__(self, generator: CaveGenerator):
+        """
+        Initialize a CaveMap object.
+
+        Args:
+            generator (CaveGenerator): The generator to look caves up in.
+        """
+        self.generator = generator
+
+    def _position(self, name: str):
+        """Return the position a cave name refers to, or None."""
+        position = self.generator.position_in(name)
+        if position is None or self.generator.name_at(position) != name:
+            return None
+        return position
+
+    def __getitem__(self, name: str):
+        position = self._position(name)
+        if position is None:
+            raise KeyError(name)
+        return self.generator.cave_at(position)
+
+    def __contains__(self, name):
+        return isinstance(name, str) and self._position(name) is not None
+
+    def __iter__(self):
+        for y in range(self.generator.height):
+            for x in range(self.generator.width):
+                yield self.generator.name_at((x, y))
+
+    def __len__(self):
+        return self.generator.width * self.generator.height
+
+
+class GeneratedCave(Cave):
+    """
+    A cave made by a CaveGenerator.
+
+    Its links come from the generator, and neighbouring caves are only created
+    when the player moves into them.
+    """
+
+    # linked_caves is a property over exits, so the slot Cave declares for it stays empty.
+    __slots__ = ("generator", "position", "exits")
+
+    def __init__(self, name, generator: CaveGenerator, position: tuple):
+        """
+        Initialize a GeneratedCave object.
+
+        Args:
+            name (str): The name of the cave.
+            generator (CaveGenerator): The generator that made the cave.
+            position (tuple): The cave's (x, y) grid position.
+        """
+        self.name = name
+        self.description = None
+        self.character = None
+        self.item = None
+        self.generator = generator
+        self.position = position
+        self.exits = generator.exits_at(position)
+
+    def __copy__(self):
+        """Return a copy of the cave that shares its generator and position."""
+        cave = GeneratedCave.__new__(GeneratedCave)
+        cave.name = self.name
+        cave.description = self.description
+        cave.character = self.character
+        cave.item = self.item
+        cave.generator = self.generator
+        cave.position = self.position
+        cave.exits = self.exits
+        return cave
+
+    def _neighbour(self, direction: str):
+        """Return the position one step away in a direction."""
+        step_x, step_y = STEPS[direction]
+        return (self.position[0] + step_x, self.position[1] + step_y)
+
+    @property
+    def linked_caves(self):
+        """Return a dict of direction to linked cave. This creates every neighbour."""
+        return {direction: self.get_linked_cave(direction) for direction in self.exits}
+
+    def link_cave(self, cave, direction):
+        """Generated caves are laid out by their generator and cannot be relinked."""
+        raise TypeError("generated caves cannot be relinked")
+
+    def unlink_cave(self, direction):
+        """Generated caves are laid out by their generator and cannot be relinked."""
+        raise TypeError("generated caves cannot be relinked")
+
+    def get_exits(self):
+        """
+        Get the directions out of the cave and where they lead, without creating
+        the neighbouring caves.
+
+        Returns:
+            list: (direction, linked cave name) pairs.
+        """
+        return [
+            (direction, self.generator.name_at(self._neighbour(direction)))
+            for direction in self.exits
+        ]
+
+    def get_linked_cave(self, direction):
+        """
+        Get the cave linked in a given direction, creating it if needed.
+
+        Args:
+            direction (str): The direction to look in.
+
+        Returns:
+            GeneratedCave: The linked cave, or None if there is no path that way.
+        """
+        if direction not in self.exits:
+            return None
+        return self.generator.cave_at(self._neighbour(direction))
+
+
+class _RouteTree:
+    """The state of one destination's route search, kept to be carried on."""
+
+    __slots__ = ("steps", "hops", "settled", "open")
+
+    def __init__(self, target: tuple):
+        """Start a search from the target position."""
+        # Moves to the target, and the direction to take towards it, for every
+        # cave reached; settled caves' are final.
+        self.steps = {target: 0}
+        self.hops = {target: None}
+        self.settled = set()
+        self.open = {target}
+
+
+class GeneratedRouter:
+    """
+    Class answering shortest-route queries in a generated world, without building caves.
+
+    Routes are found by A* search out from the destination over exits_at,
+    estimating with the grid distance. Every link works both ways, so one
+    search serves every origin: its tree is kept, and for an origin it has not
+    reached it is carried on from where it stopped, estimating towards the new
+    origin. The grid distance never overestimates, so every cave the search has
+    settled already has its shortest route, whichever origin it was heading for.
+    """
+
+    def __init__(self, generator: CaveGenerator):
+        """
+        Initialize a GeneratedRouter object.
+
+        Args:
+            generator (CaveGenerator): The generator whose caves to route between.
+        """
+        self.generator = generator
+        # Destination position -> _RouteTree, least recently used first.
+        self.trees = OrderedDict()
+        self.tree_caves = 0
+        # Held while searching, as a server's workers share the world.
+        self._lock = threading.Lock()
+
+    def find(self, name: str):
+        """Return the exact name of the cave called name in any case, or None."""
+        position = self.generator.position_in(name.strip())
+        if position is None:
+            return None
+        exact = self.generator.name_at(position)
+        return exact if exact.lower() == name.strip().lower() else None
+
+    def _grow(self, tree: _RouteTree, origin: tuple):
+        """
+        Carry a tree's search on until it settles the origin.
+
+        Returns:
+            bool: Whether the origin was reached within ROUTE_SEARCH_LIMIT caves.
+        """
+        origin_x, origin_y = origin
+        steps, hops, settled, unsettled = tree.steps, tree.hops, tree.settled, tree.open
+        frontier = [
+            (steps[cave] + abs(cave[0] - origin_x) + abs(cave[1] - origin_y), -steps[cave], cave)
+            for cave in unsettled
+        ]
+        heapq.heapify(frontier)
+        exits_at = self.generator.exits_at
+        budget = ROUTE_SEARCH_LIMIT
+        # Ties on f are broken towards the larger step count, which heads straight for the origin.
+        while frontier and budget:
+            _, negative_steps, cave = heapq.heappop(frontier)
+            if cave in settled or -negative_steps > steps[cave]:
+                continue
+            settled.add(cave)
+            unsettled.discard(cave)
+            budget -= 1
+            step = 1 - negative_steps
+            x, y = cave
+            for direction in exits_at(cave):
+                step_x, step_y = STEPS[direction]
+                neighbour = (x + step_x, y + step_y)
+                if neighbour not in settled and step < steps.get(neighbour, step + 1):
+                    steps[neighbour] = step
+                    hops[neighbour] = OPPOSITES[direction]
+                    unsettled.add(neighbour)
+                    estimate = abs(neighbour[0] - origin_x) + abs(neighbour[1] - origin_y)
+                    heapq.heappush(frontier, (step + estimate, -step, neighbour))
+            # Settled caves' neighbours are always open, for the next search to carry on from.
+            if cave == origin:
+                return True
+        return False
+
+    def route(self, origin: str, destination: str):
+        """
+        Find a shortest route between two caves.
+
+        Args:
+            origin (str): Name of the cave to start from.
+            destination (str): Name of the cave to reach.
+        Returns:
+            list or None: The directions to take, in order, or None if the
+                search gave up (see ROUTE_SEARCH_LIMIT).
+        Raises:
+            KeyError: If either cave is unknown.
+        """
+        positions = self.generator.caves._position
+        start, target = positions(origin), positions(destination)
+        if start is None or target is None:
+            raise KeyError(origin if start is None else destination)
+        with self._lock:
+            tree = self.trees.get(target)
+            if tree is None:
+                tree = self.trees[target] = _RouteTree(target)
+            self.trees.move_to_end(target)
+            if start not in tree.settled:
+                before = len(tree.steps)
+                found = self._grow(tree, start)
+                self.tree_caves += len(tree.steps) - before
+                if not found:
+                    self._trim()
+                    return None
+            route = []
+            cave = start
+            while cave != target:
+                direction = tree.hops[cave]
+                route.append(direction)
+                step_x, step_y = STEPS[direction]
+                cave = (cave[0] + step_x, cave[1] + step_y)
+            self._trim()
+            return route
+
+    def _trim(self):
+        """Drop the least recently used trees while there are too many or they are too big."""
+        while self.trees and (
+            len(self.trees) > ROUTE_CACHE_SIZE or self.tree_caves > ROUTE_TREE_CAVES
+        ):
+            _, tree = self.trees.popitem(last=False)
+            self.tree_caves -= len(tree.steps)
+
+    def distance(self, origin: str, destination: str):
+        """Return the number of moves between two caves, or None if there is no route."""
+        route = self.route(origin, destination)
+        return None if route is None else len(route)
+
+    def link(self, origin: str, direction: str, destination: str):
+        """Generated caves are laid out by their generator and cannot be relinked."""
+        raise TypeError("generated caves cannot be relinked")
+
+    def unlink(self, origin: str, direction: str):
+        """Generated caves are laid out by their generator and cannot be relinked."""
+        raise TypeError("generated caves cannot be relinked")
+
+
+def generate_world(seed: int, width: int, height: int, max_resident: int = MAX_RESIDENT):
+    """
+    Create a seeded world. Only the starting cave is built straight away.
+
+    Args:
+        seed (int): The world seed.
+        width (int): Number of caves from west to east.
+        height (int): Number of caves from north to south.
+        max_resident (int): How many caves to keep in memory at once.
+    Returns:
+        World: The world, starting in the north-west corner with the dragon in
+            the south-east corner.
+    """
+    generator = CaveGenerator(seed, width, height, max_resident)
+    return World(
+        caves=generator.caves,
+        start=generator.cave_at((0, 0)),
+        inventory=[],
+        items={name: Item(name, description) for name, description in ITEMS.items()},
+        router=GeneratedRouter(generator),
+    )
@@ -1,10 +1,12 @@
 """Module to manage player health."""
 
-from termcolor import cprint
-
+from catalog import tr
+from output import say
 from utilities import death_screen
 
-health = 5
+STARTING_HEALTH = 5
+
+health = STARTING_HEALTH
 
 
 def get():
@@ -12,7 +14,7 @@ def get():
     return health
 
 
-def update(amount: int):
+def update(amount: int, current: int | None = None):
     """
     Update health by a specified amount.
     Positive values increase health, negative values decrease health.
@@ -20,16 +22,17 @@ def update(amount: int):
 
     Args:
         amount (int): The amount to update health by. Default is 1.
+        current (int): The health to update. Defaults to the module's health.
+    Returns:
+        int or bool: The new health, or False if the player died.
     """
-    if -1 * health >= amount:
-        print(
-            "\nAfter a series of misadventures, you have succumbed to your injuries.\n"
-        )
+    if current is None:
+        current = health
+    if -1 * current >= amount:
+        say(tr("health.died"))
         death_screen()
         return False
-    cprint(
-        f"\nYou have {'gained' if amount > 0 else 'lost'} {abs(amount)} health.",
-        "red" if amount < 0 else "green",
-    )
-    print("♡" * (health + amount))
-    return health + amount
+    key = "health.gained" if amount > 0 else "health.lost"
+    say(tr(key, amount=abs(amount)), "red" if amount < 0 else "green")
+    say("♡" * (current + amount))
+    return current + amount
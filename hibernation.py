@@ -0,0 +1,285 @@
+"""Module for moving idle sessions out of memory, into a local SQLite database.
+
+A server hosting many games holds every session in memory, though most
+players are idle at any moment. A SessionManager holds the sessions
+instead, in least recently used order. Sessions nobody has played for a
+while, or the least recently used ones beyond a limit on how many are
+kept, are hibernated: encoded with saves.snapshot and put in a
+SessionStore. The next command for a hibernated session restores it first,
+so callers only ever see step() and its events. Memory then grows with the
+number of active players, not all players.
+
+The store writes behind: hibernated sessions are queued and written in
+batches, one transaction each, on one connection kept open. A session
+restored before its write is looked up in the queue instead. The database
+only stands in for memory, so it is not synced, and it is emptied when
+opened; it does not keep games across restarts (see saves.py for that).
+
+Sessions are hibernated between steps, at the start of a turn or waiting
+on a prompt. The prompt's handler is stored by name, so it must be one of
+the session's own methods, as all the game's are. Sessions waiting on
+anything else stay in memory until they move on. Multiplayer sessions
+share their state with other players (see multiplayer.py), so they cannot
+be hibernated.
+"""
+
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+
+import metrics
+from saves import SaveError, restore, snapshot
+
+logger = logging.getLogger(__name__)
+
+HIBERNATE_AFTER = 300.0
+WRITE_BATCH = 256
+
+
+class SessionStore:
+    """Class holding hibernated sessions in an SQLite database, written in batches."""
+
+    def __init__(self, path=":memory:", batch: int = WRITE_BATCH):
+        """
+        Open the database, emptying it.
+
+        Args:
+            path (Path): The database file. Defaults to an in-memory database,
+                which saves no memory; give a file to move sessions out of memory.
+            batch (int): How many sessions to queue before writing them.
+        """
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "key TEXT PRIMARY KEY, locale TEXT NOT NULL, pending TEXT NOT NULL, "
+            "snapshot BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self.connection.execute("DELETE FROM sessions")
+        self.batch = batch
+        # Key to (locale, pending, snapshot) to write, or None to delete.
+        self.queue = {}
+        self.writes = 0
+
+    def put(self, key: str, locale: str, pending: str, data: bytes):
+        """
+        Store a hibernated session, replacing any stored under its key.
+
+        Args:
+            key (str): The session's key.
+            locale (str): The session's language.
+            pending (str): The name of the method waiting for input, or "".
+            data (bytes): The session's snapshot.
+        """
+        self.queue[key] = (locale, pending, data)
+        if len(self.queue) >= self.batch:
+            self.flush()
+
+    def get(self, key: str):
+        """
+        Return what was stored under a key.
+
+        Returns:
+            tuple: (locale, pending, snapshot), or None if nothing is stored.
+        """
+        if key in self.queue:
+            return self.queue[key]
+        return self.connection.execute(
+            "SELECT locale, pending, snapshot FROM sessions WHERE key = ?", (key,)
+        ).fetchone()
+
+    def delete(self, key: str):
+        """Forget what is stored under a key."""
+        self.queue[key] = None
+        if len(self.queue) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Write everything queued, in one transaction."""
+        if not self.queue:
+            return
+        queue, self.queue = self.queue, {}
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "DELETE FROM sessions WHERE key = ?",
+                [(key,) for key, row in queue.items() if row is None],
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                [(key, *row) for key, row in queue.items() if row is not None],
+            )
+        self.writes += 1
+
+    def close(self):
+        """Write everything queued and close the database."""
+        self.flush()
+        self.connection.close()
+
+
+class SessionManager:
+    """
+    Class holding sessions by key, hibernating idle ones to a SessionStore.
+
+    Hibernation happens in sweep(), which a server calls now and then, and
+    whenever more than max_resident sessions are in memory.
+    """
+
+    def __init__(
+        self,
+        world,
+        store: SessionStore | None = None,
+        hibernate_after: float = HIBERNATE_AFTER,
+        max_resident: int | None = None,
+        clock=time.monotonic,
+    ):
+        """
+        Initialize a SessionManager object.
+
+        Args:
+            world (World): The world the sessions are played in.
+            store (SessionStore): Where to hibernate sessions. Defaults to an
+                in-memory database.
+            hibernate_after (float): Seconds without a step before a session
+                is hibernated by sweep().
+            max_resident (int): The most sessions to keep in memory (at least
+                one), or None for no limit.
+            clock (callable): Returns the time in seconds.
+        """
+        self.world = world
+        self.store = store or SessionStore()
+        self.hibernate_after = hibernate_after
+        self.max_resident = max_resident
+        self.clock = clock
+        # Key to [session, last used], least recently used first.
+        self.resident = OrderedDict()
+        self.hibernated = 0
+        self.restored = 0
+
+    def __len__(self):
+        """Return how many sessions are in memory."""
+        return len(self.resident)
+
+    def add(self, key: str, session):
+        """
+        Start holding a session.
+
+        Args:
+            key (str): The key to find it by, e.g. the player's connection.
+            session (GameSession): The session.
+        """
+        self.resident[key] = [session, self.clock()]
+        self._limit()
+
+    def get(self, key: str):
+        """
+        Return a session, restoring it if it was hibernated.
+
+        Args:
+            key (str): The session's key.
+        Returns:
+            GameSession: The session.
+        Raises:
+            KeyError: If there is no session with that key.
+            SaveError: If the session was hibernated but cannot be restored.
+                It is logged, counted and forgotten.
+        """
+        entry = self.resident.get(key)
+        if entry is not None:
+            self.resident.move_to_end(key)
+            entry[1] = self.clock()
+            return entry[0]
+        stored = self.store.get(key)
+        if stored is None:
+            raise KeyError(key)
+        locale, pending, data = stored
+        try:
+            session, _ = restore(self.world, data, locale)
+        except SaveError:
+            logger.exception("could not restore hibernated session %s", key)
+            metrics.count("sessions_lost")
+            self.store.delete(key)
+            raise
+        if pending:
+            session.pending = getattr(session, pending)
+        self.restored += 1
+        metrics.count("sessions_restored")
+        self.resident[key] = [session, self.clock()]
+        self._limit()
+        return session
+
+    def step(self, key: str, text: str):
+        """
+        Feed one line of input to a session, restoring it first if need be.
+
+        Args:
+            key (str): The session's key.
+            text (str): The line of input.
+        Returns:
+            list: The events produced in response.
+        """
+        return self.get(key).step(text)
+
+    def remove(self, key: str):
+        """Stop holding a session, e.g. once its player has left."""
+        self.resident.pop(key, None)
+        # A session restored from the store is still in it.
+        self.store.delete(key)
+
+    def sweep(self):
+        """Hibernate the sessions left idle too long, then write what is queued."""
+        cutoff = self.clock() - self.hibernate_after
+        idle = []
+        for key, (session, last_used) in self.resident.items():
+            if last_used > cutoff:
+                break
+            idle.append((key, session))
+        for key, session in idle:
+            self._hibernate(key, session, "idle")
+        self.store.flush()
+
+    def _limit(self):
+        """Hibernate the least recently used sessions beyond max_resident."""
+        if self.max_resident is None:
+            return
+        excess = len(self.resident) - max(1, self.max_resident)
+        if excess <= 0:
+            return
+        # Never the most recently used, which is about to be played.
+        newest = next(reversed(self.resident))
+        chosen = []
+        for key, (session, _) in self.resident.items():
+            if len(chosen) == excess or key == newest:
+                break
+            if _pending_name(session) is not None:
+                chosen.append((key, session))
+        for key, session in chosen:
+            self._hibernate(key, session, "memory")
+
+    def _hibernate(self, key: str, session, reason: str):
+        """Move a session from memory to the store, unless it is waiting on a method not its own."""
+        name = _pending_name(session)
+        if name is None:
+            return
+        self.store.put(key, session.locale, name, snapshot(session, at_prompt=True))
+        del self.resident[key]
+        self.hibernated += 1
+        metrics.count("sessions_hibernated", reason)
+
+
+def _pending_name(session):
+    """
+    Return the name of the method a session is waiting on.
+
+    Returns:
+        str: The name, "" if the session is over, or None if it is waiting on
+            something other than one of its own methods.
+    """
+    pending = session.pending
+    if pending is None:
+        return ""
+    if getattr(pending, "__self__", None) is not session:
+        return None
+    return pending.__name__
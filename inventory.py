@@ -0,0 +1,102 @@
+"""Module containing the Inventory class."""
+
+from catalog import tr
+
+
+class Inventory:
+    """
+    Class holding the player's items, indexed by case-insensitive name.
+
+    Items with the same name stack, so membership, lookup, adding and removing
+    all take the same time however many items are held.
+    """
+
+    __slots__ = ("stacks",)
+
+    def __init__(self, items=()):
+        """
+        Initialize an Inventory object.
+
+        Args:
+            items (iterable): Items to start with.
+        """
+        # Lowercase item name to [item, count], in the order first added.
+        self.stacks = {}
+        for item in items:
+            self.add(item)
+
+    def copy(self):
+        """Return an Inventory holding the same items, that can be changed separately."""
+        twin = Inventory()
+        twin.stacks = {key: [item, count] for key, (item, count) in self.stacks.items()}
+        return twin
+
+    def __contains__(self, name: str):
+        """Return True if an item with this name (in any case) is held."""
+        return name.lower() in self.stacks
+
+    def __len__(self):
+        """Return the number of different items held."""
+        return len(self.stacks)
+
+    def __iter__(self):
+        """Iterate over the different items held, in the order first added."""
+        return (stack[0] for stack in self.stacks.values())
+
+    def add(self, item, count: int = 1):
+        """
+        Add an item, stacking it with any item of the same name.
+
+        Args:
+            item (Item): The item to add.
+            count (int): How many to add.
+        """
+        key = item.get_name().lower()
+        stack = self.stacks.get(key)
+        if stack is None:
+            self.stacks[key] = [item, count]
+        else:
+            stack[1] += count
+
+    def remove(self, name: str, count: int = 1):
+        """
+        Remove items by name.
+
+        Args:
+            name (str): The item's name, in any case.
+            count (int): How many to remove.
+        Returns:
+            Item or None: The item removed, or None if not enough are held.
+        """
+        key = name.lower()
+        stack = self.stacks.get(key)
+        if stack is None or stack[1] < count:
+            return None
+        stack[1] -= count
+        if stack[1] == 0:
+            del self.stacks[key]
+        return stack[0]
+
+    def get(self, name: str):
+        """
+        Look up an item by name.
+
+        Args:
+            name (str): The item's name, in any case.
+        Returns:
+            Item or None: The item, or None if it is not held.
+        """
+        stack = self.stacks.get(name.lower())
+        return stack[0] if stack else None
+
+    def count(self, name: str):
+        """Return how many of the named item are held."""
+        stack = self.stacks.get(name.lower())
+        return stack[1] if stack else 0
+
+    def names(self):
+        """Return the display name of each stack, with a count if more than one is held."""
+        return [
+            item.get_name() if count == 1 else tr("inventory.count", item=item.get_name(), count=count)
+            for item, count in self.stacks.values()
+        ]
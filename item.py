@@ -1,9 +1,15 @@
 """Module containing Item class"""
 
+from catalog import tr
+from output import say
+from registry import items
+
 
 class Item:
     """Class representing an item in the game."""
 
+    __slots__ = ("name", "description", "id")
+
     def __init__(self, name, description):
         """
         Initialize an Item object.
@@ -14,6 +20,8 @@ class Item:
         """
         self.name = name
         self.description = description
+        # Items of the same name, in any world, share an id (see registry).
+        self.id = items.intern(name)
 
     def get_name(self):
         """Return the item's name."""
@@ -22,10 +30,11 @@ class Item:
     def set_name(self, name):
         """Set the item's name."""
         self.name = name
+        self.id = items.intern(name)
 
     def get_description(self):
         """Return the item's description."""
-        return self.description
+        return str(self.description)
 
     def set_description(self, description):
         """Set the item's description."""
@@ -33,12 +42,12 @@ class Item:
 
     def describe(self):
         """Print a sentence declaring the item's name and description."""
-        print(f"This is a {self.name}. {self.description}")
+        say(tr("item.describe", name=self.name, description=self.get_description()))
 
     def pickup(self):
         """Print a sentence declaring the item has been picked up."""
-        print(f"You have picked up the {self.get_name()}. {self.description}")
+        say(tr("item.pickup", name=self.get_name(), description=self.get_description()))
 
     def obtain(self):
         """Print a sentence declaring the item has been obtained."""
-        print(f"You have obtained the {self.get_name()}. {self.description}")
+        say(tr("item.obtain", name=self.get_name(), description=self.get_description()))
@@ -0,0 +1,101 @@
+"""Load generator for the game server.
+
+Opens a number of idle connections and a number of active players, drives the
+active players through a looping script of commands, and reports throughput and
+command latency percentiles.
+
+Example:
+    python main.py --serve --port 4000
+    python loadgen.py --port 4000 --idle 10000 --players 200 --turns 100
+
+Holding thousands of connections needs a matching open file limit (ulimit -n)
+on both the server and the load generator.
+"""
+
+import argparse
+import asyncio
+import math
+import time
+
+from server import GO_AHEAD
+
+# Never ends the game: talk, look at the inventory, then walk to the grotto and back.
+SCRIPT = ["talk", "inv", "n", "move", "move", "north"]
+
+
+def percentile(samples: list, percent: float):
+    """
+    Return the nearest-rank percentile of a list of samples.
+
+    Args:
+        samples (list): The samples, sorted ascending.
+        percent (float): The percentile, from 0 to 100.
+    """
+    rank = max(math.ceil(percent / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+async def idle_player(host: str, port: int, done: asyncio.Event):
+    """Connect, read the opening prompt, then sit idle until done is set."""
+    reader, writer = await asyncio.open_connection(host, port)
+    await reader.readuntil(GO_AHEAD)
+    await done.wait()
+    writer.close()
+
+
+async def active_player(host: str, port: int, turns: int, latencies: list):
+    """Connect and play turns commands, recording the latency of each."""
+    reader, writer = await asyncio.open_connection(host, port)
+    await reader.readuntil(GO_AHEAD)
+    for turn in range(turns):
+        command = SCRIPT[turn % len(SCRIPT)]
+        start = time.perf_counter()
+        writer.write(f"{command}\n".encode())
+        await writer.drain()
+        await reader.readuntil(GO_AHEAD)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def run(host: str, port: int, idle: int, players: int, turns: int):
+    """Run the load test and print a report."""
+    done = asyncio.Event()
+    idlers = []
+    for _ in range(idle):
+        idlers.append(asyncio.create_task(idle_player(host, port, done)))
+        # Yield now and then so the server's accept queue does not overflow.
+        if len(idlers) % 500 == 0:
+            await asyncio.sleep(0)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(active_player(host, port, turns, latencies) for _ in range(players))
+    )
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*idlers)
+
+    latencies.sort()
+    print(f"idle connections: {idle}")
+    print(f"active players:   {players}")
+    print(f"commands:         {len(latencies)}")
+    print(f"commands/sec:     {len(latencies) / elapsed:.0f}")
+    for percent in (50, 90, 99):
+        print(f"p{percent} latency:      {percentile(latencies, percent) * 1000:.2f} ms")
+    print(f"max latency:      {latencies[-1] * 1000:.2f} ms")
+
+
+def main():
+    """Parse the command line and run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--idle", type=int, default=1000, help="idle connections to hold")
+    parser.add_argument("--players", type=int, default=100, help="active players")
+    parser.add_argument("--turns", type=int, default=100, help="commands per active player")
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.idle, args.players, args.turns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Module for counting game events and timing commands.
+
+Counters and latency histograms are kept in module-level dicts, keyed by
+(metric name, label value). Nothing is recorded until enable() is called, so
+the calls left in the game cost one attribute check when metrics are off.
+Recording takes a lock, as the server plays sessions on several threads.
+GameSession times every step by command and counts moves, fights, quests and
+deaths. instrument() also times the hot game operations, by wrapping them.
+
+Metrics can be read in-process with snapshot(), or scraped in Prometheus text
+format from start_http_server().
+"""
+
+import threading
+
+PREFIX = "cave"
+
+# Name: (help text, label name or None).
+COUNTERS = {
+    "games_started": ("Games started.", None),
+    "games_finished": ("Games ended, by outcome.", "outcome"),
+    "moves": ("Moves from one cave to another.", None),
+    "fights": ("Fights with enemies, by result.", "result"),
+    "boss_fights": ("Fights with the boss, by result.", "result"),
+    "quests_completed": ("Gifts that completed a quest.", None),
+    "damage": ("Health lost.", None),
+    "sessions_hibernated": ("Idle sessions moved out of memory, by reason.", "reason"),
+    "sessions_restored": ("Hibernated sessions brought back into memory.", None),
+    "sessions_lost": ("Hibernated sessions that could not be restored.", None),
+}
+HISTOGRAMS = {
+    "command_seconds": ("Time taken by each step of a command.", "command"),
+    "operation_seconds": ("Time taken by instrumented game operations.", "operation"),
+}
+QUANTILES = {0.5: "p50", 0.9: "p90", 0.99: "p99", 0.999: "p999"}
+
+# Histogram buckets: exact below 2**SUB_BITS ns, then 2**(SUB_BITS - 1) buckets
+# per power of two, so every value is recorded to within about 6%.
+SUB_BITS = 5
+MAX_BUCKET = (48 << (SUB_BITS - 1)) + (1 << SUB_BITS) - 1
+
+enabled = False
+counters = {}
+histograms = {}
+# Held while recording, so updates from worker threads are not lost.
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Class holding a log-linear histogram of durations in nanoseconds."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        """Initialize an empty Histogram."""
+        self.counts = [0] * (MAX_BUCKET + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int):
+        """
+        Record one duration.
+
+        Args:
+            value (int): The duration in nanoseconds.
+        """
+        if value < 1 << SUB_BITS:
+            index = max(value, 0)
+        else:
+            shift = value.bit_length() - SUB_BITS
+            index = min((shift << (SUB_BITS - 1)) + (value >> shift), MAX_BUCKET)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @staticmethod
+    def bucket_limit(index: int):
+        """Return the largest value recorded in a bucket."""
+        if index < 1 << SUB_BITS:
+            return index
+        shift = (index >> (SUB_BITS - 1)) - 1
+        top = index - (shift << (SUB_BITS - 1))
+        return ((top + 1) << shift) - 1
+
+    def percentile(self, fraction: float):
+        """
+        Get the value a fraction of the recorded durations are at or below.
+
+        Args:
+            fraction (float): Between 0 and 1, e.g. 0.99.
+        Returns:
+            int: The duration in nanoseconds, or 0 if nothing is recorded.
+        """
+        if not self.count:
+            return 0
+        rank = max(1, round(fraction * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_limit(index), self.max)
+        return self.max
+
+
+def enable(on: bool = True):
+    """Start (or stop) recording metrics."""
+    global enabled
+    enabled = on
+
+
+def reset():
+    """Forget everything recorded so far."""
+    with _lock:
+        counters.clear()
+        histograms.clear()
+
+
+def count(name: str, label: str | None = None, amount: int = 1):
+    """
+    Add to a counter.
+
+    Args:
+        name (str): A key of COUNTERS.
+        label (str): The value of the counter's label, if it has one.
+        amount (int): How much to add.
+    """
+    if enabled:
+        key = (name, label)
+        with _lock:
+            counters[key] = counters.get(key, 0) + amount
+
+
+def observe(name: str, label: str, nanoseconds: int):
+    """
+    Record a duration in a histogram.
+
+    Args:
+        name (str): A key of HISTOGRAMS.
+        label (str): The value of the histogram's label.
+        nanoseconds (int): The duration.
+    """
+    if enabled:
+        with _lock:
+            histogram = histograms.get((name, label))
+            if histogram is None:
+                histogram = histograms[(name, label)] = Histogram()
+            histogram.record(nanoseconds)
+
+
+def snapshot():
+    """
+    Return everything recorded so far.
+
+    Returns:
+        dict: "counters" maps name to {label: value}. "histograms" maps name
+            to {label: {"count", "sum", "max", "p50", "p90", "p99", "p999"}},
+            with durations in seconds.
+    """
+    result = {"counters": {}, "histograms": {}}
+    # dict() copies are atomic, so this is safe to call from another thread.
+    for (name, label), value in dict(counters).items():
+        result["counters"].setdefault(name, {})[label] = value
+    for (name, label), histogram in dict(histograms).items():
+        summary = {
+            "count": histogram.count,
+            "sum": histogram.total / 1e9,
+            "max": histogram.max / 1e9,
+        }
+        for quantile, key in QUANTILES.items():
+            summary[key] = histogram.percentile(quantile) / 1e9
+        result["histograms"].setdefault(name, {})[label] = summary
+    return result
+
+
+def _labels(label_name: str | None, label: str | None, **extra):
+    """Format a Prometheus label set."""
+    pairs = {label_name: label} if label_name and label is not None else {}
+    pairs.update(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in pairs.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(pairs, escaped)) + "}"
+
+
+def prometheus_text():
+    """
+    Return every metric in the Prometheus text exposition format.
+
+    Histograms are exposed as summaries with quantiles, since their buckets
+    depend on what has been recorded.
+
+    Returns:
+        str: The metrics.
+    """
+    values = dict(counters)
+    lines = []
+    for name, (help_text, label_name) in COUNTERS.items():
+        metric = f"{PREFIX}_{name}_total"
+        lines += (f"# HELP {metric} {help_text}", f"# TYPE {metric} counter")
+        for (key, label), value in sorted(values.items(), key=lambda item: str(item[0])):
+            if key == name:
+                lines.append(f"{metric}{_labels(label_name, label)} {value}")
+    recorded = dict(histograms)
+    for name, (help_text, label_name) in HISTOGRAMS.items():
+        metric = f"{PREFIX}_{name}"
+        lines += (f"# HELP {metric} {help_text}", f"# TYPE {metric} summary")
+        for (key, label), histogram in sorted(recorded.items(), key=lambda item: str(item[0])):
+            if key != name:
+                continue
+            for quantile in QUANTILES:
+                labels = _labels(label_name, label, quantile=quantile)
+                lines.append(f"{metric}{labels} {histogram.percentile(quantile) / 1e9:.9f}")
+            lines.append(f"{metric}_sum{_labels(label_name, label)} {histogram.total / 1e9:.9f}")
+            lines.append(f"{metric}_count{_labels(label_name, label)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def _serve_metrics(request):
+    """Answer a scrape of /metrics, given the server's request handler."""
+    if request.path.split("?")[0] != "/metrics":
+        request.send_error(404)
+        return
+    body = prometheus_text().encode()
+    request.send_response(200)
+    request.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    request.send_header("Content-Length", str(len(body)))
+    request.end_headers()
+    request.wfile.write(body)
+
+
+def start_http_server(port: int, host: str = "127.0.0.1"):
+    """
+    Enable metrics and serve them at http://host:port/metrics from a background thread.
+
+    http.server is imported here rather than with this module, as it is slow
+    to import and most games never serve metrics.
+
+    Args:
+        port (int): The port to listen on.
+        host (str): The address to listen on.
+    Returns:
+        ThreadingHTTPServer: The server, already running.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Serves /metrics."""
+
+        do_GET = _serve_metrics
+
+        def log_message(self, *args):
+            """Keep scrapes out of the game's output."""
+
+    enable()
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(operation: str, function):
+    """Wrap a function so each call is recorded under operation_seconds."""
+    from time import perf_counter_ns
+
+    def wrapper(*args, **kwargs):
+        started = perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            observe("operation_seconds", operation, perf_counter_ns() - started)
+
+    wrapper.__wrapped__ = function
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+
+def instrument():
+    """
+    Time the hot game operations as well as commands.
+
+    Wraps Cave.move, Enemy.fight, Boss.fight, Person.give, health.update and
+    inventory lookups. This adds a little to every call, so it is left off
+    unless asked for. Calling it again does nothing.
+    """
+    import health
+    from cave import Cave
+    from character import Boss, Enemy, Person
+    from inventory import Inventory
+
+    targets = [
+        (Cave, "move", "cave_move"),
+        (Enemy, "fight", "enemy_fight"),
+        (Boss, "fight", "boss_fight"),
+        (Person, "give", "person_give"),
+        (health, "update", "health_update"),
+        (Inventory, "__contains__", "inventory_contains"),
+        (Inventory, "get", "inventory_get"),
+    ]
+    for owner, attribute, operation in targets:
+        function = getattr(owner, attribute)
+        if not hasattr(function, "__wrapped__"):
+            setattr(owner, attribute, timed(operation, function))
@@ -0,0 +1,300 @@
+"""Module for games where many players share one world and see each other.
+
+A SharedWorld holds the live state of a world that every player changes
+together. Its state is sharded by cave: each cave anyone has entered has a
+Room, which holds the cave and its character as they are now, the players
+in it, and its own lock. A player changes a cave only while holding its
+Room's lock, so taking an item, fighting its enemy or giving its person
+something is atomic. Two players grabbing the torch cannot both get it,
+and a player answering "fight with what?" after someone else has killed
+the enemy is told nobody is there. Players in different caves never wait
+for each other, and no one ever holds two Rooms' locks at once.
+
+What players do is broadcast to the others in the same cave. Messages are
+queued on the Room and delivered in one batch per player, once per pass of
+the event loop (see SharedWorld's schedule), so a busy cave sends each
+player one write rather than one per message. Each message is put into the
+words of the player reading it, in their own language.
+
+The world the SharedWorld is built from is never modified: a Room copies
+its cave and character the first time anyone enters it, as GameSession
+does for one player.
+"""
+
+import copy
+import threading
+from collections import deque
+from itertools import islice
+
+import catalog
+from catalog import tr
+from character import Person
+from output import capture, emit, say
+from session import GameSession
+
+# What the other players in the cave are told when a player's game ends.
+FAREWELLS = {"win": "multiplayer.won", "dead": "multiplayer.died"}
+# The most other players named when describing a cave, longest there first;
+# the rest are counted.
+MAX_NAMED = 5
+
+
+class Room:
+    """Class holding the shared state of one cave: the cave itself and who is in it."""
+
+    __slots__ = ("cave", "lock", "players", "outbox", "schedule")
+
+    def __init__(self, cave, schedule=None):
+        """
+        Initialize a Room with a copy of a world cave.
+
+        Args:
+            cave (Cave): The cave in the world.
+            schedule (callable): Called with flush when messages are waiting,
+                to deliver them later. Without one they are delivered at once.
+        """
+        self.cave = copy.copy(cave)
+        character = cave.get_character()
+        if character is not None:
+            self.cave.set_character(copy.copy(character))
+        # Reentrant, as a command holding it ends by describing the cave again.
+        self.lock = threading.RLock()
+        # The players in the cave, in the order they arrived (the values are unused).
+        self.players = {}
+        # Messages waiting to be delivered, as (sender, key, fields).
+        self.outbox = []
+        self.schedule = schedule
+
+    def broadcast(self, sender, key: str, **fields):
+        """
+        Tell every player in the cave but the sender about something.
+
+        Args:
+            sender (MultiplayerSession): The player it is about.
+            key (str): The message's key in the catalog.
+            **fields: The message's fields.
+        """
+        fields.setdefault("name", sender.name)
+        with self.lock:
+            self.outbox.append((sender, key, fields))
+            if len(self.outbox) > 1:
+                return
+        if self.schedule is None:
+            self.flush()
+        else:
+            self.schedule(self.flush)
+
+    def flush(self):
+        """Deliver the waiting messages, each player's in one batch."""
+        with self.lock:
+            messages, self.outbox = self.outbox, []
+            players = list(self.players)
+        # Everyone gets the same batch, and skips their own messages in it.
+        for player in players:
+            player.notify(messages)
+
+
+class SharedWorld:
+    """Class holding the live state of a world shared by many players, a Room per cave."""
+
+    def __init__(self, world, schedule=None):
+        """
+        Initialize a SharedWorld object.
+
+        Args:
+            world (World): The world to play in. It is not modified.
+            schedule (callable): Called with a Room's flush when it has messages
+                waiting, e.g. an event loop's call_soon. Defaults to delivering
+                them at once.
+        """
+        self.world = world
+        self.schedule = schedule
+        self.rooms = {}
+        # Only held while creating a Room.
+        self._lock = threading.Lock()
+
+    def room(self, cave):
+        """
+        Return the Room of a cave, creating it the first time anyone enters.
+
+        Args:
+            cave (Cave): The cave in the world.
+        Returns:
+            Room: The cave's Room.
+        """
+        name = cave.get_name()
+        room = self.rooms.get(name)
+        if room is None:
+            with self._lock:
+                room = self.rooms.get(name)
+                if room is None:
+                    room = self.rooms[name] = Room(cave, self.schedule)
+        return room
+
+
+class MultiplayerSession(GameSession):
+    """
+    One player's game in a SharedWorld.
+
+    Plays as a GameSession, except that caves and characters are shared with
+    the other players instead of copied, and what other players in the same
+    cave do is shown as it happens. Messages from other players are kept in
+    an inbox until messages() or the next step takes them. listener, if set,
+    is called whenever messages arrive, e.g. to wake the task that sends them
+    to the player; it may be called from another thread.
+    """
+
+    def __init__(self, shared: SharedWorld, name: str, locale: str = catalog.DEFAULT_LOCALE):
+        """
+        Initialize a MultiplayerSession object.
+
+        Args:
+            shared (SharedWorld): The world the players share.
+            name (str): The name other players know this one by.
+            locale (str): The language to show the game's own text in.
+        """
+        super().__init__(shared.world, locale)
+        self.shared_world = shared
+        self.name = name
+        self.room = None
+        self.inbox = deque()
+        self.listener = None
+
+    def fork(self):
+        """Multiplayer games cannot be forked: the world is not the player's own."""
+        raise TypeError("a multiplayer game cannot be forked")
+
+    def notify(self, messages: list):
+        """
+        Receive messages about the players in the cave.
+
+        Args:
+            messages (list): (sender, key, fields) tuples, to be filled in from
+                the catalog. Messages the player sent are ignored.
+        """
+        self.inbox.extend(messages)
+        if self.listener is not None:
+            self.listener()
+
+    def messages(self):
+        """
+        Take the messages that have arrived, as events in the player's language.
+
+        Returns:
+            list: A text event per message.
+        """
+        with capture() as events, catalog.using(self.locale):
+            while True:
+                try:
+                    sender, key, fields = self.inbox.popleft()
+                except IndexError:
+                    break
+                if sender is not self:
+                    say(tr(key, **fields), "blue")
+        return events
+
+    def step(self, text: str):
+        """Feed one line of input into the game, after any messages that have arrived."""
+        events = self.messages() if self.inbox else []
+        return events + super().step(text)
+
+    def _enter(self, cave):
+        """Leave the current Room, if any, and join the Room of a cave."""
+        self.leave()
+        room = self.shared_world.room(cave)
+        with room.lock:
+            room.players[self] = None
+        room.broadcast(self, "multiplayer.arrives")
+        self.room = room
+        self.current_cave = room.cave
+
+    def leave(self, outcome: str | None = None):
+        """
+        Leave the current Room, telling the players there.
+
+        Args:
+            outcome (str): How the player's game ended, if it has.
+        """
+        room, self.room = self.room, None
+        if room is not None:
+            with room.lock:
+                room.players.pop(self, None)
+            room.broadcast(self, FAREWELLS.get(outcome, "multiplayer.leaves"))
+
+    def finish(self, outcome: str):
+        """End the game, and leave the cave."""
+        super().finish(outcome)
+        self.leave(outcome)
+
+    def begin_turn(self):
+        """Describe the current cave and who else is in it, and ask for a command."""
+        if self.room is None or self.current_cave is not self.room.cave:
+            self._enter(self.current_cave)
+        emit("rule")
+        say()
+        say(tr("turn.location"))
+        room = self.room
+        with room.lock:
+            self.current_cave.get_details()
+            others = len(room.players) - 1
+            first = islice(room.players, MAX_NAMED + 1)
+            named = [player.name for player in first if player is not self]
+        if others:
+            names = ", ".join(named[:MAX_NAMED])
+            if others > MAX_NAMED:
+                say(tr("multiplayer.others_more", names=names, count=others - MAX_NAMED))
+            else:
+                say(tr("multiplayer.others", names=names))
+            say()
+        self.ask(tr("turn.prompt"), self._command, "cyan")
+
+    def _edit_cave(self):
+        """Return the current cave, shared with the other players. Hold its Room's lock."""
+        return self.current_cave
+
+    def _edit_inhabitant(self):
+        """Return the current cave's character, shared with the other players."""
+        return self.current_cave.get_character()
+
+    def talk(self):
+        """Talk to the cave's inhabitant."""
+        with self.room.lock:
+            super().talk()
+
+    def pickup(self):
+        """Pick up the cave's item, unless an enemy is guarding it or someone else got it first."""
+        room = self.room
+        with room.lock:
+            item = self.current_cave.get_item()
+            super().pickup()
+            if item is not None and self.current_cave.get_item() is None:
+                room.broadcast(self, "multiplayer.picks_up", item=item.get_name())
+
+    def _fight(self, text: str):
+        """Fight the cave's inhabitant, unless another player has defeated it since."""
+        room = self.room
+        with room.lock:
+            inhabitant = self.current_cave.get_character()
+            if inhabitant is None:
+                say(tr("fight.nobody"))
+                self.end_turn()
+                return
+            super()._fight(text)
+            if self.current_cave.get_character() is None:
+                room.broadcast(self, "multiplayer.defeats", enemy=inhabitant.get_name())
+
+    def _give(self, text: str):
+        """Give the cave's inhabitant an item, unless another player has defeated it since."""
+        room = self.room
+        with room.lock:
+            inhabitant = self.current_cave.get_character()
+            if inhabitant is None:
+                say(tr("give.nobody"))
+                self.end_turn()
+                return
+            item = self.inventory.get(text.strip().lower())
+            super()._give(text)
+            if item is not None and isinstance(inhabitant, Person):
+                room.broadcast(
+                    self, "multiplayer.gives", item=item.get_name(), person=inhabitant.get_name()
+                )
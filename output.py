@@ -0,0 +1,171 @@
+"""Module for routing game output to the player.
+
+Game code reports output with say/emit. Inside a capture() block the events are
+collected for a GameSession; a sink then turns a batch of events into text and
+writes it with a single call.
+"""
+
+import json
+import os
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import NamedTuple
+
+
+class Event(NamedTuple):
+    """
+    A single piece of structured game output.
+
+    kind is one of:
+        "text": a line of text, optionally coloured.
+        "rule": a horizontal separator line.
+        "prompt": a question the player must answer before the game continues.
+        "pause": a "press enter to continue" break.
+        "input": a line the player typed, echoed in transcripts.
+        "end": the game is over (text is "win", "dead" or "quit").
+    """
+
+    kind: str
+    text: str = ""
+    color: str | None = None
+
+
+_captured = ContextVar("captured", default=None)
+
+
+def emit(kind: str, text: str = "", color: str | None = None):
+    """
+    Send an event to the active capture, or print it if nothing is capturing.
+
+    Args:
+        kind (str): The event kind.
+        text (str): The event text.
+        color (str): termcolor colour name, or None for the default colour.
+    """
+    events = _captured.get()
+    if events is not None:
+        events.append(Event(kind, text, color))
+    elif kind == "text":
+        print(_colored(text, color) if color else text)
+
+
+def say(text: str = "", color: str | None = None):
+    """
+    Emit a line of text.
+
+    Args:
+        text (str): The text to show. An empty string gives a blank line.
+        color (str): termcolor colour name, or None for the default colour.
+    """
+    emit("text", text, color)
+
+
+@contextmanager
+def capture():
+    """
+    Collect every event emitted inside the with block instead of printing it.
+
+    Yields:
+        list: The events, in the order they were emitted.
+    """
+    events = []
+    token = _captured.set(events)
+    try:
+        yield events
+    finally:
+        _captured.reset(token)
+
+
+def terminal_width(default: int = 25):
+    """Return the width of the terminal, or default if there is no terminal."""
+    try:
+        return os.get_terminal_size().columns
+    except OSError:
+        return default
+
+
+@lru_cache(maxsize=512)
+def _colored(text: str, color: str):
+    """
+    Return text wrapped in ANSI colour codes. Cached, as most coloured text repeats.
+
+    termcolor is imported on first use, so plain and JSON output never load it.
+    """
+    from termcolor import colored
+
+    return colored(text, color)
+
+
+class PlainSink:
+    """Class that turns events into plain text, ignoring colour."""
+
+    def __init__(self, width: int = 25):
+        """
+        Initialize a PlainSink object.
+
+        Args:
+            width (int): The width of separator lines.
+        """
+        self.rule = "-" * width
+
+    def format(self, event: Event):
+        """Return the text for one event."""
+        match event.kind:
+            case "text":
+                return f"{event.text}\n"
+            case "rule":
+                return f"{self.rule}\n"
+            case "prompt" | "pause":
+                return event.text
+            case "input":
+                return f"{event.text}\n"
+        return ""
+
+    def render(self, events):
+        """Return the text for a list of events."""
+        return "".join([self.format(event) for event in events])
+
+    def write(self, events, stream=None):
+        """
+        Write a list of events with one write call, then flush.
+
+        Args:
+            events (list): The events to write.
+            stream (file): Where to write. Defaults to standard output.
+        """
+        stream = stream or sys.stdout
+        stream.write(self.render(events))
+        stream.flush()
+
+
+class AnsiSink(PlainSink):
+    """Class that turns events into text coloured for a terminal."""
+
+    def __init__(self, width: int = 25):
+        """
+        Initialize an AnsiSink object.
+
+        Args:
+            width (int): The width of separator lines.
+        """
+        super().__init__(width)
+        self.rule = _colored(self.rule, "green")
+
+    def format(self, event: Event):
+        """Return the text for one event, coloured if it has a colour."""
+        if event.color and event.kind in ("text", "prompt"):
+            event = event._replace(text=_colored(event.text, event.color))
+        return super().format(event)
+
+
+class JsonSink(PlainSink):
+    """Class that turns events into JSON, one object per line."""
+
+    def format(self, event: Event):
+        """Return one event as a line of JSON."""
+        return json.dumps(event._asdict()) + "\n"
+
+
+SINKS = {"ansi": AnsiSink, "plain": PlainSink, "json": JsonSink}
@@ -0,0 +1,86 @@
+"""Module for giving items and characters canonical integer ids.
+
+Names are interned once, when an Item or Character is created. The name as
+written and its normalized form (see normalize) both map to the same id, so
+"Belinda", "belinda" and " BELINDA " are one item. Rules then compare ids,
+and sets of items are int bitsets with bit 1 << id, as in solver.Model.
+
+The registries are process-wide, like shared worlds, and ids are never
+reused: the same name gets the same id in every world. Only building a
+world adds to them. Looking up what a player typed never does, so a name
+nobody has defined simply has no id.
+"""
+
+import threading
+
+
+def normalize(name: str):
+    """Return the form of a name that lookups match: stripped and lower case."""
+    return name.strip().lower()
+
+
+class Registry(dict):
+    """
+    Class mapping the names of one kind of thing, and their aliases, to ids.
+
+    registry[name] is the id of a name as written anywhere, e.g. typed by the
+    player, or None if nothing of that name exists. Known spellings cost one
+    dict lookup. Only other spellings are normalized, and looking them up
+    never adds to the registry.
+    """
+
+    __slots__ = ("kind", "names", "lock")
+
+    def __init__(self, kind: str):
+        """
+        Initialize an empty Registry.
+
+        Args:
+            kind (str): What the names are of, e.g. "item".
+        """
+        super().__init__()
+        self.kind = kind
+        # Id to the name as first written.
+        self.names = []
+        self.lock = threading.Lock()
+
+    def __missing__(self, name: str):
+        """Look up a spelling that is not an alias yet, by its normalized form."""
+        return self.get(normalize(name))
+
+    def intern(self, name: str):
+        """
+        Return a name's id, giving it one if it has none yet.
+
+        Args:
+            name (str): The name.
+        Returns:
+            int: The id.
+        """
+        number = self.get(name)
+        if number is not None:
+            return number
+        with self.lock:
+            key = normalize(name)
+            number = self.get(key)
+            if number is None:
+                number = len(self.names)
+                self.names.append(name)
+                self[key] = number
+            self[name] = number
+            return number
+
+    def name(self, number: int):
+        """Return the name an id was first given to."""
+        return self.names[number]
+
+    def intern_mask(self, names):
+        """Return the bitset of the ids of several names, giving them ids as needed."""
+        mask = 0
+        for name in names:
+            mask |= 1 << self.intern(name)
+        return mask
+
+
+items = Registry("item")
+characters = Registry("character")
@@ -0,0 +1,360 @@
+"""Module containing the Router class, which finds routes between caves.
+
+Small worlds get a next-hop table for every pair of caves up front. Large
+worlds use A* search guided by distances to a few landmark caves (ALT), with
+recent routes cached, and popular destinations get a next-hop table of their
+own. Links added or removed through the router are applied
+incrementally: distance tables are repaired rather than rebuilt.
+
+The Router indexes every cave up front, so generated worlds, whose caves are
+only built when needed, are routed by generator.GeneratedRouter instead.
+On a 100,000 cave grid (benchmarks/routing.py) a repeated route takes
+microseconds and a popular one about 0.1 ms once its table is built, but a
+route to a new destination takes tens of milliseconds, up to most of a
+second for the longest, and building the router takes seconds.
+"""
+
+import heapq
+from array import array
+from collections import OrderedDict, deque
+
+# Worlds up to this many caves get a full all-pairs next-hop table.
+ALL_PAIRS_LIMIT = 1000
+LANDMARKS = 8
+ROUTE_CACHE_SIZE = 4096
+# In large worlds, a target searched for this many times gets its own next-hop tree,
+# and at most TREE_CACHE_SIZE of those trees are kept.
+TREE_AFTER = 3
+TREE_CACHE_SIZE = 64
+UNREACHABLE = -1
+
+
+class Router:
+    """Class answering shortest-route queries over a world's caves."""
+
+    def __init__(self, caves: dict):
+        """
+        Initialize a Router object.
+
+        Args:
+            caves (dict): Cave name to Cave object for every cave to route between.
+        """
+        self.names = list(caves)
+        self.ids = {name: index for index, name in enumerate(self.names)}
+        self.lowercase_names = {name.lower(): name for name in self.names}
+        self.caves = caves
+        # Outgoing links as {direction: cave id}, and incoming links as {(cave id, direction)}.
+        self.links_out = [{} for _ in self.names]
+        self.links_in = [set() for _ in self.names]
+        for name, cave in caves.items():
+            origin = self.ids[name]
+            for direction, destination in cave.linked_caves.items():
+                self._add_edge(origin, direction, self.ids[destination.get_name()])
+
+        # Next-hop trees: target id -> (distances to target, direction to take from each cave).
+        self.trees = OrderedDict()
+        self.searches = {}
+        # Landmark tables: (distances from landmark, distances to landmark).
+        self.landmarks = []
+        self.route_cache = OrderedDict()
+        if len(self.names) <= ALL_PAIRS_LIMIT:
+            for target in range(len(self.names)):
+                self.trees[target] = self._tree(target)
+        else:
+            self._pick_landmarks()
+
+    def _add_edge(self, origin: int, direction: str, destination: int):
+        """Record a link in the adjacency lists."""
+        self.links_out[origin][direction] = destination
+        self.links_in[destination].add((origin, direction))
+
+    def _bfs(self, source: int, forward: bool):
+        """
+        Return the link distances from (forward) or to (not forward) a cave.
+
+        Args:
+            source (int): The cave id to measure from or to.
+            forward (bool): Follow links forwards from the source, or backwards into it.
+        Returns:
+            array: Distance per cave id, UNREACHABLE where there is no route.
+        """
+        distances = array("i", [UNREACHABLE]) * len(self.names)
+        distances[source] = 0
+        queue = deque([source])
+        while queue:
+            cave = queue.popleft()
+            step = distances[cave] + 1
+            if forward:
+                neighbours = self.links_out[cave].values()
+            else:
+                neighbours = [origin for origin, _ in self.links_in[cave]]
+            for neighbour in neighbours:
+                if distances[neighbour] == UNREACHABLE:
+                    distances[neighbour] = step
+                    queue.append(neighbour)
+        return distances
+
+    def _tree(self, target: int):
+        """Build the next-hop tree leading to a target cave."""
+        distances = self._bfs(target, forward=False)
+        hops = [None] * len(self.names)
+        for cave, distance in enumerate(distances):
+            if distance > 0:
+                for direction, neighbour in self.links_out[cave].items():
+                    if distances[neighbour] == distance - 1:
+                        hops[cave] = direction
+                        break
+        return distances, hops
+
+    def _pick_landmarks(self):
+        """Choose landmark caves far apart from each other and measure distances to them."""
+        self.landmarks = []
+        landmark = 0
+        # Distance from the nearest landmark so far; unreachable caves stay furthest.
+        spread = array("i", [2**31 - 1]) * len(self.names)
+        for _ in range(min(LANDMARKS, len(self.names))):
+            from_landmark = self._bfs(landmark, forward=True)
+            to_landmark = self._bfs(landmark, forward=False)
+            self.landmarks.append((from_landmark, to_landmark))
+            for cave, distance in enumerate(from_landmark):
+                if distance != UNREACHABLE and distance < spread[cave]:
+                    spread[cave] = distance
+            landmark = max(range(len(spread)), key=spread.__getitem__)
+
+    def _search(self, origin: int, target: int):
+        """Find a shortest route with A* search. Returns directions, or None."""
+        # Lower bounds from the triangle inequality over each landmark, with the
+        # target's side of each bound worked out once per search.
+        bounds = [
+            (from_landmark, from_landmark[target], to_landmark, to_landmark[target])
+            for from_landmark, to_landmark in self.landmarks
+        ]
+
+        def estimate(cave):
+            best = 0
+            for from_landmark, from_target, to_landmark, to_target in bounds:
+                from_cave = from_landmark[cave]
+                if from_cave != UNREACHABLE and from_target != UNREACHABLE:
+                    best = max(best, from_target - from_cave)
+                to_cave = to_landmark[cave]
+                if to_cave != UNREACHABLE and to_target != UNREACHABLE:
+                    best = max(best, to_cave - to_target)
+            return best
+
+        links_out = self.links_out
+        came_from = {origin: None}
+        steps = {origin: 0}
+        # Ties on f are broken towards the larger step count, which heads straight for the target.
+        frontier = [(estimate(origin), 0, origin)]
+        while frontier:
+            _, negative_steps, cave = heapq.heappop(frontier)
+            if cave == target:
+                route = []
+                while came_from[cave] is not None:
+                    cave, direction = came_from[cave]
+                    route.append(direction)
+                route.reverse()
+                return route
+            if -negative_steps > steps[cave]:
+                continue
+            step = steps[cave] + 1
+            for direction, neighbour in links_out[cave].items():
+                if step < steps.get(neighbour, step + 1):
+                    steps[neighbour] = step
+                    came_from[neighbour] = (cave, direction)
+                    heapq.heappush(frontier, (step + estimate(neighbour), -step, neighbour))
+        return None
+
+    def find(self, name: str):
+        """Return the exact name of the cave called name in any case, or None."""
+        return self.lowercase_names.get(name.lower())
+
+    def route(self, origin: str, destination: str):
+        """
+        Find a shortest route between two caves.
+
+        Args:
+            origin (str): Name of the cave to start from.
+            destination (str): Name of the cave to reach.
+        Returns:
+            list or None: The directions to take, in order, or None if there is no route.
+        Raises:
+            KeyError: If either cave is unknown.
+        """
+        origin_id, target = self.ids[origin], self.ids[destination]
+        if target not in self.trees and self.landmarks:
+            self.searches[target] = self.searches.get(target, 0) + 1
+            if self.searches[target] >= TREE_AFTER:
+                del self.searches[target]
+                self.trees[target] = self._tree(target)
+                if len(self.trees) > TREE_CACHE_SIZE:
+                    self.trees.popitem(last=False)
+        tree = self.trees.get(target)
+        if tree is not None:
+            if self.landmarks:
+                self.trees.move_to_end(target)
+            distances, hops = tree
+            if distances[origin_id] == UNREACHABLE:
+                return None
+            route = []
+            cave = origin_id
+            while cave != target:
+                route.append(hops[cave])
+                cave = self.links_out[cave][hops[cave]]
+            return route
+
+        key = (origin_id, target)
+        if key in self.route_cache:
+            self.route_cache.move_to_end(key)
+            return self.route_cache[key]
+        route = self._search(origin_id, target)
+        self.route_cache[key] = route
+        if len(self.route_cache) > ROUTE_CACHE_SIZE:
+            self.route_cache.popitem(last=False)
+        return route
+
+    def distance(self, origin: str, destination: str):
+        """Return the number of moves between two caves, or None if there is no route."""
+        route = self.route(origin, destination)
+        return None if route is None else len(route)
+
+    def _repair(self, distances, cave: int, forward: bool):
+        """
+        Propagate a shortened distance at one cave through a distance table.
+
+        Args:
+            distances (array): The table to repair, already updated at cave.
+            cave (int): The cave whose distance just dropped.
+            forward (bool): Whether the table measures distances from a source
+                (propagate along outgoing links) or to a target (incoming links).
+        Returns:
+            list: The caves whose distance changed, including cave.
+        """
+        changed = [cave]
+        queue = deque([cave])
+        while queue:
+            current = queue.popleft()
+            step = distances[current] + 1
+            if forward:
+                neighbours = self.links_out[current].values()
+            else:
+                neighbours = [origin for origin, _ in self.links_in[current]]
+            for neighbour in neighbours:
+                if distances[neighbour] == UNREACHABLE or step < distances[neighbour]:
+                    distances[neighbour] = step
+                    changed.append(neighbour)
+                    queue.append(neighbour)
+        return changed
+
+    def _repair_removal(self, distances, hops, cut: int):
+        """
+        Repair a next-hop tree after the link a cave used to reach the target is removed.
+
+        Only the caves whose route passed through that cave are recomputed: they
+        are reattached through their best neighbour outside the broken part of
+        the tree, nearest first.
+
+        Args:
+            distances (array): The tree's distances, changed in place.
+            hops (list): The tree's next-hop directions, changed in place.
+            cut (int): The cave whose next hop was removed.
+        """
+        links_out, links_in = self.links_out, self.links_in
+        broken = {cut}
+        queue = deque([cut])
+        while queue:
+            cave = queue.popleft()
+            for origin, direction in links_in[cave]:
+                if origin not in broken and hops[origin] == direction:
+                    broken.add(origin)
+                    queue.append(origin)
+        for cave in broken:
+            distances[cave] = UNREACHABLE
+            hops[cave] = None
+
+        frontier = []
+        for cave in broken:
+            for direction, neighbour in links_out[cave].items():
+                if neighbour not in broken and distances[neighbour] != UNREACHABLE:
+                    step = distances[neighbour] + 1
+                    if distances[cave] == UNREACHABLE or step < distances[cave]:
+                        distances[cave] = step
+                        hops[cave] = direction
+            if distances[cave] != UNREACHABLE:
+                frontier.append((distances[cave], cave))
+        heapq.heapify(frontier)
+        while frontier:
+            distance, cave = heapq.heappop(frontier)
+            if distance > distances[cave]:
+                continue
+            for origin, direction in links_in[cave]:
+                if origin in broken and (
+                    distances[origin] == UNREACHABLE or distance + 1 < distances[origin]
+                ):
+                    distances[origin] = distance + 1
+                    hops[origin] = direction
+                    heapq.heappush(frontier, (distance + 1, origin))
+
+    def link(self, origin: str, direction: str, destination: str):
+        """
+        Link two caves and update the routing tables to match.
+
+        Args:
+            origin (str): Name of the cave the link starts from.
+            direction (str): The direction of the link.
+            destination (str): Name of the cave the link leads to.
+        """
+        if direction in self.links_out[self.ids[origin]]:
+            self.unlink(origin, direction)
+        self.caves[origin].link_cave(self.caves[destination], direction)
+        origin_id, destination_id = self.ids[origin], self.ids[destination]
+        self._add_edge(origin_id, direction, destination_id)
+        self.route_cache.clear()
+
+        # A new link can only make routes shorter.
+        for distances, hops in self.trees.values():
+            if distances[destination_id] == UNREACHABLE:
+                continue
+            step = distances[destination_id] + 1
+            if distances[origin_id] == UNREACHABLE or step < distances[origin_id]:
+                distances[origin_id] = step
+                hops[origin_id] = direction
+                for cave in self._repair(distances, origin_id, forward=False)[1:]:
+                    for hop, neighbour in self.links_out[cave].items():
+                        if distances[neighbour] == distances[cave] - 1:
+                            hops[cave] = hop
+                            break
+        for from_landmark, to_landmark in self.landmarks:
+            if from_landmark[origin_id] != UNREACHABLE:
+                step = from_landmark[origin_id] + 1
+                if from_landmark[destination_id] == UNREACHABLE or step < from_landmark[destination_id]:
+                    from_landmark[destination_id] = step
+                    self._repair(from_landmark, destination_id, forward=True)
+            if to_landmark[destination_id] != UNREACHABLE:
+                step = to_landmark[destination_id] + 1
+                if to_landmark[origin_id] == UNREACHABLE or step < to_landmark[origin_id]:
+                    to_landmark[origin_id] = step
+                    self._repair(to_landmark, origin_id, forward=False)
+
+    def unlink(self, origin: str, direction: str):
+        """
+        Remove a link and update the routing tables to match.
+
+        Args:
+            origin (str): Name of the cave the link starts from.
+            direction (str): The direction of the link.
+        """
+        origin_id = self.ids[origin]
+        destination_id = self.links_out[origin_id].pop(direction, None)
+        if destination_id is None:
+            return
+        self.links_in[destination_id].discard((origin_id, direction))
+        self.caves[origin].unlink_cave(direction)
+        self.route_cache.clear()
+
+        # Only trees that routed through the removed link can have changed.
+        for distances, hops in self.trees.values():
+            if hops[origin_id] == direction:
+                self._repair_removal(distances, hops, origin_id)
+        # Landmark distances that grow only make the A* estimate looser, never wrong,
+        # so the landmark tables are left as they are.
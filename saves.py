@@ -0,0 +1,398 @@
+"""Module for saving games: binary snapshots plus an append-only journal of input.
+
+A save is a directory holding two files:
+    snapshot: the session's state at the start of some turn (see snapshot()).
+    journal: every line of input accepted since that snapshot.
+
+Recording a turn only appends one small record to the journal. Every
+CHECKPOINT_EVERY records, at the start of a turn, a new snapshot is written
+and the journal starts over, so loading a save never replays more than a
+few dozen lines however long the game has run.
+
+Both files carry a generation number. A checkpoint writes the new snapshot
+before replacing the journal, so after a crash between the two the snapshot
+is newer than the journal, and the journal is simply ignored.
+"""
+
+import copy
+import os
+import struct
+import zlib
+from pathlib import Path
+
+import catalog
+from character import Person
+from output import capture
+from session import GameSession
+
+SNAPSHOT_MAGIC = b"CAVESAVE"
+JOURNAL_MAGIC = b"CAVEJRNL"
+SAVE_VERSION = 2
+# Versions restore() can read. Version 1 snapshots do not store the language.
+READABLE_VERSIONS = (1, 2)
+CHECKPOINT_EVERY = 64
+
+OUTCOMES = (None, "win", "dead", "quit")
+
+_HEADER = struct.Struct("<8sBI")  # magic, version, generation
+_RECORD = struct.Struct("<II")  # length, crc32
+_STRING = struct.Struct("<H")
+_COUNT = struct.Struct("<I")
+_STATE = struct.Struct("<hB")  # health (-1 once dead in older saves), outcome
+_AFFINITY = struct.Struct("<i")
+_FLAGS = struct.Struct("B")
+
+# Flags for a changed cave.
+HAS_ITEM = 1
+HAS_CHARACTER = 2
+# Starts a stored conversation that is the text itself rather than a message key.
+TEXT_MARKER = "="
+
+
+class SaveError(ValueError):
+    """Raised when a save is damaged, of another version, or from another world."""
+
+
+class _Reader:
+    """Reads the fields of a snapshot in order."""
+
+    __slots__ = ("data", "offset")
+
+    def __init__(self, data: bytes, offset: int):
+        """Start reading data at offset."""
+        self.data = data
+        self.offset = offset
+
+    def unpack(self, layout: struct.Struct):
+        """Read a fixed-size field."""
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def string(self):
+        """Read a length-prefixed string."""
+        (length,) = self.unpack(_STRING)
+        text = self.data[self.offset:self.offset + length].decode()
+        self.offset += length
+        return text
+
+
+def _string(text: str):
+    """Encode a string as a length-prefixed field."""
+    encoded = text.encode()
+    return _STRING.pack(len(encoded)) + encoded
+
+
+def snapshot(session: GameSession, generation: int = 0, at_prompt: bool = False):
+    """
+    Encode the state of a session at the start of a turn.
+
+    Only what the player has changed is stored: the language, the current
+    cave, inventory, health, outcome, and the caves and characters the
+    session has copied.
+
+    Args:
+        session (GameSession): A session waiting for a command, or one that is over.
+        generation (int): The journal generation the snapshot starts.
+        at_prompt (bool): Also take a session waiting for the answer to a
+            prompt. Which prompt is not stored: the caller must keep it.
+    Returns:
+        bytes: The snapshot.
+    """
+    if not (session.over or session.at_turn_start or at_prompt):
+        raise ValueError("sessions can only be saved at the start of a turn")
+    parts = [
+        _HEADER.pack(SNAPSHOT_MAGIC, SAVE_VERSION, generation),
+        _string(session.locale),
+        _STATE.pack(
+            session.health,
+            OUTCOMES.index(session.outcome),
+        ),
+        _string(session.current_cave.get_name()),
+        _COUNT.pack(len(session.inventory.stacks)),
+    ]
+    for item, count in session.inventory.stacks.values():
+        parts += (_string(item.get_name()), _COUNT.pack(count))
+
+    parts.append(_COUNT.pack(len(session.changed_caves)))
+    for name, cave in session.changed_caves.items():
+        item = cave.get_item()
+        flags = (HAS_ITEM if item else 0) | (HAS_CHARACTER if cave.get_character() else 0)
+        parts += (_string(name), _FLAGS.pack(flags), _string(item.get_name() if item else ""))
+
+    # A character changed and then defeated stays in changed_characters, but
+    # its cave no longer has it.
+    characters = [
+        (name, character)
+        for name, character in session.changed_characters.items()
+        if session.changed_caves[name].get_character() is not None
+    ]
+    parts.append(_COUNT.pack(len(characters)))
+    for name, character in characters:
+        affinity = character.affinity if isinstance(character, Person) else 0
+        parts += (
+            _string(name),
+            _string(_conversation_key(character)),
+            _AFFINITY.pack(affinity),
+        )
+    return b"".join(parts)
+
+
+def _conversation_key(character):
+    """
+    Return how a character's conversation is stored in a snapshot.
+
+    Returns:
+        str: "" for none, the key of the message it is, or, for a conversation
+            that is not one of the messages (an enemy's own), the text after
+            TEXT_MARKER.
+    """
+    conversation = character.conversation
+    if conversation is None:
+        return ""
+    for key, message in character.messages.items():
+        if message is conversation:
+            return key
+    return TEXT_MARKER + str(conversation)
+
+
+def restore(world, data: bytes, locale: str = catalog.DEFAULT_LOCALE):
+    """
+    Rebuild a session from a snapshot.
+
+    Args:
+        world (World): The world the snapshot was taken in, or None for the
+            shared default world.
+        data (bytes): The snapshot.
+        locale (str): The language to continue the game in if the snapshot
+            does not say, or names a language that is no longer available.
+    Returns:
+        tuple: (GameSession, journal generation).
+    Raises:
+        SaveError: If the snapshot is damaged or refers to things not in the world.
+    """
+    try:
+        reader = _Reader(data, 0)
+        magic, version, generation = reader.unpack(_HEADER)
+        if magic != SNAPSHOT_MAGIC or version not in READABLE_VERSIONS:
+            raise SaveError(f"not a version {SAVE_VERSION} snapshot")
+        if version >= 2:
+            saved = reader.string()
+            if saved in catalog.available():
+                locale = saved
+        session = GameSession(world, locale)
+        world = session.world
+        health, outcome = reader.unpack(_STATE)
+        session.health = max(health, 0)
+        current = reader.string()
+
+        session.inventory.stacks.clear()
+        for _ in range(reader.unpack(_COUNT)[0]):
+            item = world.items[reader.string()]
+            session.inventory.add(item, reader.unpack(_COUNT)[0])
+
+        for _ in range(reader.unpack(_COUNT)[0]):
+            name = reader.string()
+            flags = reader.unpack(_FLAGS)[0]
+            item_name = reader.string()
+            cave = copy.copy(world.caves[name])
+            cave.set_item(world.items[item_name] if flags & HAS_ITEM else None)
+            if not flags & HAS_CHARACTER:
+                cave.remove_character()
+            session.changed_caves[name] = cave
+            session.owned.add(name)
+
+        for _ in range(reader.unpack(_COUNT)[0]):
+            name = reader.string()
+            key = reader.string()
+            (affinity,) = reader.unpack(_AFFINITY)
+            cave = session.changed_caves[name]
+            if cave.get_character() is None:
+                # Older snapshots can list characters that have been defeated.
+                continue
+            character = copy.copy(cave.get_character())
+            if key.startswith(TEXT_MARKER):
+                character.set_conversation(key[len(TEXT_MARKER):])
+            else:
+                character.set_conversation(character.messages[key] if key else None)
+            if isinstance(character, Person):
+                character.affinity = affinity
+            cave.set_character(character)
+            session.changed_characters[name] = character
+        session.current_cave = session._cave(world.caves[current])
+    except (struct.error, UnicodeDecodeError) as error:
+        raise SaveError(f"damaged snapshot: {error}") from error
+    except (KeyError, AttributeError) as error:
+        raise SaveError(f"snapshot does not match this world: {error}") from error
+
+    if OUTCOMES[outcome] is None:
+        session.pending = session._command
+    else:
+        session.outcome = OUTCOMES[outcome]
+    return session, generation
+
+
+def read_journal(data: bytes):
+    """
+    Decode the records of a journal.
+
+    A record cut short or corrupted by a crash ends the journal.
+
+    Args:
+        data (bytes): The journal, without its header.
+    Returns:
+        list: The input lines, in order.
+    """
+    lines = []
+    offset = 0
+    while offset + _RECORD.size <= len(data):
+        length, checksum = _RECORD.unpack_from(data, offset)
+        start = offset + _RECORD.size
+        record = data[start:start + length]
+        if len(record) < length or zlib.crc32(record) != checksum:
+            break
+        lines.append(record.decode())
+        offset = start + length
+    return lines
+
+
+class SaveFile:
+    """
+    Class that saves one session to a directory as it is played.
+
+    Start a new save with checkpoint(), or continue an existing one with load(),
+    then call record() after every step() of the session.
+    """
+
+    def __init__(self, directory, checkpoint_every: int = CHECKPOINT_EVERY, sync: bool = False):
+        """
+        Initialize a SaveFile object.
+
+        Args:
+            directory (Path): The save directory. Created if it does not exist.
+            checkpoint_every (int): Journal records between snapshots.
+            sync (bool): fsync every write, so saves also survive power loss
+                rather than only a crash of the game.
+        """
+        self.directory = Path(directory)
+        self.snapshot_path = self.directory / "snapshot"
+        self.journal_path = self.directory / "journal"
+        self.checkpoint_every = checkpoint_every
+        self.sync = sync
+        self.generation = 0
+        self.records = 0
+        self._journal = None
+
+    def exists(self):
+        """Return True if there is a saved game to load."""
+        return self.snapshot_path.exists()
+
+    def _replace(self, path: Path, data: bytes):
+        """Atomically replace a file's contents."""
+        temporary = path.with_name(path.name + ".tmp")
+        with open(temporary, "wb") as file:
+            file.write(data)
+            if self.sync:
+                os.fsync(file.fileno())
+        temporary.replace(path)
+
+    def _open_journal(self):
+        """Open the journal for appending."""
+        if self._journal is not None:
+            os.close(self._journal)
+        self._journal = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND)
+
+    def checkpoint(self, session: GameSession):
+        """
+        Write a snapshot of the session and start a new, empty journal.
+
+        Args:
+            session (GameSession): A session at the start of a turn, or over.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.generation += 1
+        self._replace(self.snapshot_path, snapshot(session, self.generation))
+        self._replace(
+            self.journal_path, _HEADER.pack(JOURNAL_MAGIC, SAVE_VERSION, self.generation)
+        )
+        self._open_journal()
+        self.records = 0
+
+    def record(self, session: GameSession, text: str):
+        """
+        Save one line of input that the session has just accepted.
+
+        Args:
+            session (GameSession): The session, after step(text).
+            text (str): The line of input.
+        """
+        encoded = text.encode()
+        os.write(self._journal, _RECORD.pack(len(encoded), zlib.crc32(encoded)) + encoded)
+        if self.sync:
+            os.fsync(self._journal)
+        self.records += 1
+        if self.records >= self.checkpoint_every and (session.over or session.at_turn_start):
+            self.checkpoint(session)
+
+    def load(self, world, locale: str = catalog.DEFAULT_LOCALE):
+        """
+        Load the saved session: restore the snapshot, then replay the journal.
+
+        Args:
+            world (World): The world the game was saved in, or None for the
+                shared default world.
+            locale (str): The language to continue the game in, if the save
+                does not say.
+        Returns:
+            tuple: (GameSession, list of events to show the player).
+        Raises:
+            SaveError: If the save is damaged or from another world.
+        """
+        session, self.generation = restore(world, self.snapshot_path.read_bytes(), locale)
+        lines = []
+        try:
+            journal = self.journal_path.read_bytes()
+        except FileNotFoundError:
+            journal = b""
+        # Journals are the same in every version, so one left by a version 1 save is kept.
+        headers = [
+            _HEADER.pack(JOURNAL_MAGIC, version, self.generation) for version in READABLE_VERSIONS
+        ]
+        if journal[:_HEADER.size] in headers:
+            lines = read_journal(journal[_HEADER.size:])
+
+        events = []
+        for line in lines:
+            events = session.step(line)
+        # Only show what the session is waiting on: everything after the last pause.
+        for index in range(len(events) - 1, -1, -1):
+            if events[index].kind == "pause":
+                events = events[index + 1:]
+                break
+        if not lines and not session.over:
+            with capture() as events, catalog.using(session.locale):
+                session.begin_turn()
+        if session.over or session.at_turn_start:
+            # Start a clean journal, dropping any torn record left by a crash.
+            self.checkpoint(session)
+        else:
+            # Loaded mid-prompt: keep the records, so the answer is replayed after them.
+            self._rewrite_journal(lines)
+        return session, events
+
+    def _rewrite_journal(self, lines: list):
+        """Replace the journal with the given records, for a session loaded mid-prompt."""
+        header = _HEADER.pack(JOURNAL_MAGIC, SAVE_VERSION, self.generation)
+        records = b"".join(
+            _RECORD.pack(len(line.encode()), zlib.crc32(line.encode())) + line.encode()
+            for line in lines
+        )
+        self._replace(self.journal_path, header + records)
+        self._open_journal()
+        self.records = len(lines)
+
+    def close(self):
+        """Close the journal."""
+        if self._journal is not None:
+            os.close(self._journal)
+            self._journal = None
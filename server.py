@@ -0,0 +1,260 @@
+"""Module for serving many games at once over TCP, telnet style.
+
+Each player has a game of their own, unless the server is started with
+shared=True: then every player is in the same world (see multiplayer.py),
+and sees the others in the caves they share.
+
+Games of a player's own can be hibernated while the player is idle, moved
+out of memory to an SQLite database until their next command (see
+hibernation.py).
+
+Games can be served by several workers, each a thread with its own event
+loop, sharing the port. Players step their games without waiting for each
+other, even in a shared world unless they are in the same cave, so the
+workers run in parallel on a Python without the global interpreter lock.
+On one with it, they take turns.
+"""
+
+import asyncio
+import itertools
+import threading
+from functools import partial
+
+import catalog
+from catalog import tr
+from output import SINKS
+from saves import SaveError
+from session import GameSession
+from world import DEFAULT_WORLD, shared_world
+
+# Telnet IAC GA (go ahead): sent after every prompt so clients know it is their turn.
+GO_AHEAD = b"\xff\xf9"
+MAX_LINE = 1024
+# Seconds between looking for idle sessions to hibernate.
+SWEEP_EVERY = 1.0
+
+
+def format_events(events, sink):
+    """
+    Turn game events into the bytes sent to a network player.
+
+    Pauses are dropped, since the player reads at their own pace.
+
+    Args:
+        events (list): Events returned by a GameSession.
+        sink (PlainSink): The sink that formats the events.
+    Returns:
+        bytes: The encoded output.
+    """
+    data = sink.render([event for event in events if event.kind != "pause"]).encode()
+    if events and events[-1].kind == "prompt":
+        data += GO_AHEAD
+    return data
+
+
+def waker(event: asyncio.Event):
+    """
+    Return a function that sets an event from any thread.
+
+    Args:
+        event (asyncio.Event): The event, which belongs to the running loop.
+    Returns:
+        callable: Sets the event, directly if called on the event's loop.
+    """
+    loop = asyncio.get_running_loop()
+
+    def wake():
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            event.set()
+        else:
+            loop.call_soon_threadsafe(event.set)
+
+    return wake
+
+
+async def send_messages(session, writer, sink, wake: asyncio.Event):
+    """Send a multiplayer session's messages from other players as they arrive."""
+    while True:
+        await wake.wait()
+        wake.clear()
+        events = session.messages()
+        if events:
+            writer.write(format_events(events, sink))
+            await writer.drain()
+
+
+async def handle_player(
+    reader,
+    writer,
+    world_path=DEFAULT_WORLD,
+    sink=None,
+    locale="en",
+    show_tutorial=True,
+    shared=None,
+    names=None,
+    sessions=None,
+):
+    """
+    Run one player's game over a connection until it ends or they disconnect.
+
+    Args:
+        reader (asyncio.StreamReader): The connection's reader.
+        writer (asyncio.StreamWriter): The connection's writer.
+        world_path (Path): The world file to play in.
+        sink (PlainSink): The sink that formats output. Defaults to plain text.
+        locale (str): The language the game starts in.
+        show_tutorial (bool): Whether to show the tutorial before the first turn.
+        shared (SharedWorld): The world all players share, or None for a game
+            of the player's own.
+        names (iterator): Where to take the player's name from in a shared world.
+        sessions (SessionManager): Holds the game while the player is idle, so
+            it can be hibernated, or None to hold it here.
+    """
+    sink = sink or SINKS["plain"]()
+    sender = None
+    if shared is not None:
+        from multiplayer import MultiplayerSession
+
+        session = MultiplayerSession(shared, next(names), locale)
+        wake = asyncio.Event()
+        session.listener = waker(wake)
+        sender = asyncio.create_task(send_messages(session, writer, sink, wake))
+    else:
+        session = GameSession(shared_world(world_path), locale)
+    key = f"{id(writer):x}"
+    try:
+        events = session.start(show_tutorial)
+        if sessions is not None:
+            # Only the manager holds the game from here on, so it can hibernate it.
+            sessions.add(key, session)
+            step, session = partial(sessions.step, key), None
+        else:
+            step = session.step
+        writer.write(format_events(events, sink))
+        await writer.drain()
+        while not (events and events[-1].kind == "end"):
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # The player sent a line longer than MAX_LINE.
+                break
+            if not line:
+                break
+            try:
+                events = step(line.decode("utf-8", "ignore").rstrip("\r\n"))
+            except SaveError:
+                # The game was hibernated and cannot be restored (logged by sessions).
+                with catalog.using(locale):
+                    writer.write(f"{tr('server.session_lost')}\n".encode())
+                await writer.drain()
+                break
+            writer.write(format_events(events, sink))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        if sender is not None:
+            sender.cancel()
+            session.leave()
+        if sessions is not None:
+            sessions.remove(key)
+        writer.close()
+
+
+async def serve(
+    host: str = "127.0.0.1",
+    port: int = 4000,
+    world_path=DEFAULT_WORLD,
+    output_format: str = "plain",
+    locale: str = "en",
+    show_tutorial: bool = True,
+    shared: bool = False,
+    workers: int = 1,
+    hibernate_db=None,
+    hibernate_after: float | None = None,
+    max_resident: int | None = None,
+):
+    """
+    Accept players forever, each with their own game or all in one shared world.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+        world_path (Path): The world file to play in.
+        output_format (str): "ansi", "plain" or "json".
+        locale (str): The language games start in. Players can change it with
+            the language command.
+        show_tutorial (bool): Whether to show each player the tutorial.
+        shared (bool): Whether all players share one world and see each other.
+        workers (int): How many event loops to serve games on, each on its own thread.
+        hibernate_db (Path): Hibernate idle games to this SQLite database, or
+            None to keep every game in memory. Not with shared or workers.
+        hibernate_after (float): Seconds idle before a game is hibernated.
+            Defaults to hibernation.HIBERNATE_AFTER.
+        max_resident (int): The most games to keep in memory, or None for no limit.
+    """
+    # Load the world and the catalog once up front, so a broken file fails at startup.
+    world = shared_world(world_path)
+    catalog.load(locale)
+    options = {}
+    sweeper = None
+    if shared:
+        from multiplayer import SharedWorld
+
+        # Messages are delivered once the loop that queued them is next free,
+        # so a command's messages to each player go out together.
+        options["shared"] = SharedWorld(
+            world, lambda flush: asyncio.get_running_loop().call_soon(flush)
+        )
+        options["names"] = map("player{}".format, itertools.count(1))
+    if hibernate_db is not None:
+        if shared or workers != 1:
+            raise ValueError("only games of a player's own on one worker can be hibernated")
+        from hibernation import HIBERNATE_AFTER, SessionManager, SessionStore
+
+        options["sessions"] = SessionManager(
+            world,
+            SessionStore(hibernate_db),
+            HIBERNATE_AFTER if hibernate_after is None else hibernate_after,
+            max_resident,
+        )
+        # The loop only holds tasks weakly, so this one is kept until shutdown.
+        sweeper = asyncio.create_task(hibernate_idle(options["sessions"]))
+    handler = partial(
+        handle_player,
+        world_path=world_path,
+        sink=SINKS[output_format](),
+        locale=locale,
+        show_tutorial=show_tutorial,
+        **options,
+    )
+    for _ in range(workers - 1):
+        threading.Thread(
+            target=asyncio.run, args=(listen(handler, host, port, True),), daemon=True
+        ).start()
+    print(f"Serving on {host}:{port}")
+    try:
+        await listen(handler, host, port, workers > 1)
+    finally:
+        if sweeper is not None:
+            sweeper.cancel()
+
+
+async def hibernate_idle(sessions):
+    """Hibernate idle sessions every SWEEP_EVERY seconds, forever."""
+    while True:
+        await asyncio.sleep(SWEEP_EVERY)
+        sessions.sweep()
+
+
+async def listen(handler, host: str, port: int, reuse_port: bool):
+    """Accept connections on one event loop forever, passing each to a handler."""
+    server = await asyncio.start_server(
+        handler, host, port, limit=MAX_LINE, backlog=4096, reuse_port=reuse_port
+    )
+    async with server:
+        await server.serve_forever()
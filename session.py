@@ -0,0 +1,509 @@
+"""Module containing the GameSession class, which runs one game without a terminal."""
+
+import copy
+from time import perf_counter_ns
+
+import catalog
+from catalog import tr
+from character import Enemy, Boss
+from commands import command, registry
+import health
+from inventory import Inventory
+import metrics
+from output import capture, emit, say
+
+TUTORIAL = ("tutorial.1", "tutorial.2", "tutorial.3", "tutorial.4")
+
+
+class GameSession:
+    """
+    A single player's game, advanced one line of input at a time.
+
+    Output is returned as a list of Event objects (see output.Event) rather than
+    printed. Commands that need more input, like the boss fight, give or the
+    inventory viewer, end with a "prompt" event and the next call to step is
+    taken as the answer to that prompt.
+
+    The world is shared with other sessions and never modified. A cave or
+    character is copied into the session the first time the player changes it,
+    so a session's memory grows with what the player has done, not with the size
+    of the world. Forks (see fork) share the session's own copies in the same
+    way, until one of them changes them.
+    """
+
+    def __init__(self, world=None, locale: str = catalog.DEFAULT_LOCALE):
+        """
+        Initialize a GameSession object.
+
+        Args:
+            world (World): The world to play in. Defaults to the shared default world.
+            locale (str): The language to show the game's own text in (see catalog).
+        """
+        if world is None:
+            # Imported here so that importing session does not import the world builder.
+            from world import shared_world
+
+            world = shared_world()
+        self.world = world
+        self.changed_caves = {}
+        self.changed_characters = {}
+        # Names of the changed caves (and their characters) this session has
+        # copied itself, rather than shares with a fork.
+        self.owned = set()
+        # Whether changed_caves, changed_characters and inventory are shared with a fork.
+        self.shared = False
+        self.locale = locale
+        self.current_cave = world.start
+        self.inventory = Inventory(world.inventory)
+        self.health = health.STARTING_HEALTH
+        self.pending = None
+        self.outcome = None
+        # The command the player is carrying out, for timing steps by command.
+        self.command_name = None
+
+    @property
+    def over(self):
+        """Return True once the game has been won, lost or quit."""
+        return self.outcome is not None
+
+    @property
+    def at_turn_start(self):
+        """Return True if the session is waiting for a command rather than an answer."""
+        return self.pending == self._command
+
+    def start(self, show_tutorial: bool = True):
+        """
+        Begin the game.
+
+        Args:
+            show_tutorial (bool): Whether to show the tutorial before the first turn.
+        Returns:
+            list: The events for the opening of the game.
+        """
+        metrics.count("games_started")
+        with capture() as events, catalog.using(self.locale):
+            if show_tutorial:
+                self.tutorial()
+                emit("pause")
+            self.begin_turn()
+        return events
+
+    def step(self, text: str):
+        """
+        Feed one line of player input into the game.
+
+        Args:
+            text (str): The command, or the answer to the pending prompt.
+        Returns:
+            list: The events produced in response.
+        """
+        with capture() as events, catalog.using(self.locale):
+            if self.pending is not None:
+                handler, self.pending = self.pending, None
+                started = perf_counter_ns()
+                handler(text)
+                metrics.observe("command_seconds", self.command_name, perf_counter_ns() - started)
+        return events
+
+    def tutorial(self):
+        """Show the tutorial instructions."""
+        for section in TUTORIAL:
+            say()
+            emit("rule")
+            say()
+            say(tr(section))
+            emit("pause", tr("tutorial.continue"))
+        say()
+        emit("rule")
+        say()
+        say(tr("tutorial.end"), "magenta")
+
+    def _cave(self, cave):
+        """Return the session's version of a world cave."""
+        return self.changed_caves.get(cave.get_name(), cave)
+
+    def fork(self):
+        """
+        Return an independent copy of the game that continues from this point.
+
+        Takes the same time however long the game has run: the fork shares all
+        of the session's state, and either one copies a piece of it only when
+        it first changes it.
+
+        Returns:
+            GameSession: The new session.
+        """
+        twin = object.__new__(type(self))
+        twin.__dict__.update(self.__dict__)
+        self.shared = twin.shared = True
+        self.owned = set()
+        twin.owned = set()
+        if getattr(self.pending, "__self__", None) is self:
+            twin.pending = self.pending.__func__.__get__(twin)
+        return twin
+
+    def _unshare(self):
+        """Copy the session's tables of changes and inventory if a fork shares them."""
+        if self.shared:
+            self.changed_caves = dict(self.changed_caves)
+            self.changed_characters = dict(self.changed_characters)
+            self.inventory = self.inventory.copy()
+            self.shared = False
+
+    def _add_item(self, item):
+        """Add an item to the inventory."""
+        self._unshare()
+        self.inventory.add(item)
+
+    def _edit_cave(self):
+        """Return the current cave, copying it into the session if it is still shared."""
+        name = self.current_cave.get_name()
+        if name not in self.owned:
+            self._unshare()
+            cave = copy.copy(self.current_cave)
+            # A character changed before a fork is shared with it too.
+            character = self.changed_characters.get(name)
+            if character is not None:
+                character = copy.copy(character)
+                self.changed_characters[name] = character
+                if cave.get_character() is not None:
+                    cave.set_character(character)
+            self.changed_caves[name] = cave
+            self.current_cave = cave
+            self.owned.add(name)
+        return self.current_cave
+
+    def _edit_inhabitant(self):
+        """Return the current cave's character, copying it into the session if it is still shared."""
+        cave = self._edit_cave()
+        # Keyed by cave, as generated worlds can have several characters with one name.
+        name = cave.get_name()
+        if name not in self.changed_characters:
+            self.changed_characters[name] = copy.copy(cave.get_character())
+            cave.set_character(self.changed_characters[name])
+        return self.changed_characters[name]
+
+    def ask(self, prompt: str, handler, color: str | None = None):
+        """
+        Emit a prompt and route the next line of input to a handler.
+
+        Args:
+            prompt (str): The question to ask.
+            handler (callable): Called with the player's answer.
+            color (str): termcolor colour name for the prompt, or None.
+        """
+        self.pending = handler
+        emit("prompt", prompt, color)
+
+    def begin_turn(self):
+        """Describe the current cave and ask for a command."""
+        emit("rule")
+        say()
+        say(tr("turn.location"))
+        self.current_cave.get_details()
+        self.ask(tr("turn.prompt"), self._command, "cyan")
+
+    def end_turn(self, pause: bool = True):
+        """
+        Finish the current command and start the next turn.
+
+        Args:
+            pause (bool): Whether to pause before describing the cave again.
+        """
+        if pause:
+            emit("pause")
+        self.begin_turn()
+
+    def finish(self, outcome: str):
+        """
+        End the game.
+
+        Args:
+            outcome (str): "win", "dead" or "quit".
+        """
+        self.outcome = outcome
+        self.pending = None
+        metrics.count("games_finished", outcome)
+        emit("end", outcome)
+
+    def _hurt(self, amount: int):
+        """
+        Take damage, ending the game if the player dies.
+
+        Returns:
+            bool: True if the player survived.
+        """
+        metrics.count("damage", amount=amount)
+        updated = health.update(-amount, self.health)
+        if updated is False:
+            self.health = 0
+            self.finish("dead")
+            return False
+        self.health = updated
+        return True
+
+    def _missing_item(self, message: str, item_name: str):
+        """Say that an item is not in the inventory, suggesting the closest match."""
+        say(message)
+        suggestion = self.world.item_index.closest(item_name)
+        if suggestion is not None and suggestion in self.inventory:
+            say(tr("command.suggest", suggestion=suggestion))
+
+    def _command(self, text: str):
+        """Run a command typed at the main prompt."""
+        text = text.strip().lower()
+        if text == "":
+            self.command_name = "blank"
+            self.ask(tr("turn.prompt"), self._command, "cyan")
+            return
+
+        say()
+        handler = registry.resolve(text)
+        if handler is not None:
+            self.command_name = handler.__name__
+            if handler in registry.takes_argument:
+                self._run(handler, "")
+            else:
+                self._run(handler)
+            return
+        with_argument = registry.resolve_with_argument(text)
+        if with_argument is not None:
+            handler, argument = with_argument
+            self.command_name = handler.__name__
+            self._run(handler, argument)
+            return
+        self.command_name = "unknown"
+        say(tr("command.unknown"))
+        suggestion = registry.suggest(text)
+        if suggestion is not None:
+            say(tr("command.suggest", suggestion=suggestion))
+        self.end_turn()
+
+    def _run(self, handler, *argument):
+        """Run a command's handler, or the subclass's override of it if it is a session method."""
+        if GameSession.__dict__.get(handler.__name__) is handler:
+            handler = getattr(type(self), handler.__name__)
+        handler(self, *argument)
+
+    @command("quit", "exit", "end", "leave")
+    def quit(self):
+        """Quit the game."""
+        self.finish("quit")
+
+    @command("move", "go")
+    def move(self):
+        """Move to a linked cave, asking which way if there is a choice."""
+        exits = self.current_cave.get_exits()
+        if len(exits) > 1:
+            self.ask(tr("move.prompt"), self._move)
+        else:
+            self._move(exits[0][0] if exits else "")
+
+    def _move(self, text: str):
+        """Move in the direction given."""
+        destination = self.current_cave.move(text.strip().lower())
+        if destination is not self.current_cave:
+            metrics.count("moves")
+        self.current_cave = self._cave(destination)
+        self.end_turn()
+
+    @command("goto", "go to", "travel", argument=True)
+    def goto(self, destination: str):
+        """Walk along the shortest route to the cave named."""
+        if not destination:
+            self.ask(tr("goto.prompt"), self._goto)
+        else:
+            self._goto(destination)
+
+    def _goto(self, text: str):
+        """Walk to the cave named, one move at a time."""
+        router = self.world.router
+        if router is None:
+            say(tr("goto.unroutable"))
+            self.end_turn()
+            return
+        destination = router.find(text.strip())
+        if destination is None:
+            say(tr("goto.unknown", name=text.strip().lower()))
+        else:
+            route = router.route(self.current_cave.get_name(), destination)
+            if route is None:
+                say(tr("goto.no_route", name=destination))
+            elif not route:
+                say(tr("goto.here", name=destination))
+            for direction in route or ():
+                metrics.count("moves")
+                self.current_cave = self._cave(self.current_cave.move(direction))
+        self.end_turn()
+
+    @command("talk", "speak")
+    def talk(self):
+        """Talk to the cave's inhabitant."""
+        inhabitant = self.current_cave.get_character()
+        if inhabitant:
+            inhabitant.talk()
+        else:
+            say(tr("talk.nobody"))
+        self.end_turn()
+
+    @command("fight", "battle", "attack")
+    def fight(self):
+        """Fight the cave's inhabitant, asking what to fight with."""
+        inhabitant = self.current_cave.get_character()
+        if not self.inventory:
+            say(tr("fight.no_items"))
+            self.end_turn()
+        elif not inhabitant:
+            say(tr("fight.nobody"))
+            self.end_turn()
+        elif isinstance(inhabitant, Boss):
+            self.ask(tr("fight.boss_prompt", name=inhabitant.get_name()), self._fight_boss)
+        else:
+            self.ask(tr("fight.prompt"), self._fight)
+
+    def _fight(self, text: str):
+        """Fight the cave's inhabitant with the item named."""
+        combat_item = text.strip().lower()
+        if combat_item not in self.inventory:
+            self._missing_item(tr("fight.missing"), combat_item)
+            self.end_turn()
+            return
+        inhabitant = self.current_cave.get_character()
+        loot = inhabitant.fight(combat_item)
+        if isinstance(inhabitant, Enemy):
+            metrics.count("fights", "lost" if loot is False else "won")
+            if loot is False:
+                self._hurt(2)
+                if not self.over:
+                    self.finish("dead")
+                return
+            self._edit_cave().remove_character()
+            if loot:
+                self._add_item(loot)
+        self.end_turn()
+
+    def _fight_boss(self, text: str):
+        """Fight the boss with the two items named."""
+        combat_items = text.strip().lower().split(", ")
+        if len(combat_items) != 2:
+            say(tr("fight.boss_item_count"))
+            self.end_turn()
+            return
+        missing = [item for item in combat_items if item not in self.inventory]
+        for item in missing:
+            self._missing_item(tr("fight.boss_missing", item=item), item)
+        if missing:
+            self.end_turn()
+            return
+        won = self.current_cave.get_character().fight(combat_items)
+        metrics.count("boss_fights", "won" if won else "lost")
+        self.finish("win" if won else "dead")
+
+    @command("pickup", "pick up", "get")
+    def pickup(self):
+        """Pick up the cave's item, unless an enemy is guarding it."""
+        inhabitant = self.current_cave.get_character()
+        item = self.current_cave.get_item()
+        if item:
+            if inhabitant and isinstance(inhabitant, Enemy):
+                say(tr("pickup.attacked", item=item.get_name(), name=inhabitant.get_name()))
+                if not self._hurt(1):
+                    return
+            else:
+                self._add_item(item)
+                item.pickup()
+                self._edit_cave().remove_item()
+        else:
+            say(tr("pickup.nothing"))
+        self.end_turn()
+
+    @command("give", "handover")
+    def give(self):
+        """Give an item to the cave's inhabitant, asking which one."""
+        inhabitant = self.current_cave.get_character()
+        if not self.inventory:
+            say(tr("give.no_items"))
+            self.end_turn()
+        elif not inhabitant:
+            say(tr("give.nobody"))
+            self.end_turn()
+        else:
+            self.ask(tr("give.prompt", name=inhabitant.get_name()), self._give)
+
+    def _give(self, text: str):
+        """Give the item named to the cave's inhabitant."""
+        give_item_name = text.strip().lower()
+        if give_item_name not in self.inventory:
+            self._missing_item(tr("give.missing"), give_item_name)
+            self.end_turn()
+            return
+        inhabitant = self._edit_inhabitant()
+        give_result = inhabitant.give(give_item_name)
+        if isinstance(inhabitant, Enemy):
+            if not self._hurt(2):
+                return
+        elif give_result:
+            metrics.count("quests_completed")
+            self._add_item(give_result)
+            give_result.obtain()
+        self.end_turn()
+
+    @command("inventory", "inv", "show inventory", "show inv", "bag")
+    def show_inventory(self):
+        """Show a humanized list of inventory items, then offer to show descriptions."""
+        names_list = self.inventory.names()
+        match len(names_list):
+            case 0:
+                say(tr("inventory.empty"))
+            case 1:
+                say(tr("inventory.one", item=names_list[0]))
+            case _:
+                items = tr("inventory.separator").join(names_list[:-1])
+                say(tr("inventory.many", items=items, last=names_list[-1]))
+        self.ask(tr("inventory.describe_prompt"), self._inventory_choice)
+
+    def _inventory_choice(self, text: str):
+        """Handle the answer to whether to show item descriptions."""
+        if text == "y":
+            self.ask(tr("inventory.which"), self._describe_item)
+        else:
+            say(tr("inventory.declined"))
+            self.end_turn(pause=False)
+
+    def _describe_item(self, text: str):
+        """Show the description of one inventory item, then ask for another."""
+        item_name = text.strip().lower()
+        if item_name == "none":
+            self.end_turn(pause=False)
+            return
+        item = self.inventory.get(item_name)
+        if item is not None:
+            say(item.get_description())
+        else:
+            self._missing_item(tr("inventory.missing"), item_name)
+        self.ask(tr("inventory.which"), self._describe_item)
+
+    @command("language", "lang", argument=True)
+    def language(self, locale: str):
+        """Switch the game to another language, asking which if none is given."""
+        if not locale:
+            self.ask(tr("language.prompt", locales=", ".join(catalog.available())), self._language)
+        else:
+            self._language(locale)
+
+    def _language(self, text: str):
+        """Switch to the locale named."""
+        locale = text.strip().lower()
+        if locale in catalog.available():
+            self.locale = locale
+            catalog.set_current(locale)
+            say(tr("language.changed"))
+        else:
+            say(tr("language.unknown", name=locale, locales=", ".join(catalog.available())))
+        self.end_turn()
+
+    @command("?", "help", "tutorial")
+    def help(self):
+        """Show the tutorial again."""
+        self.tutorial()
+        self.end_turn()
@@ -0,0 +1,511 @@
+"""Module for checking that a world can be won, by searching every state the game can reach.
+
+The search runs on the world's rules reduced to integer ids and bitsets (see
+Model), worked out with the same checks the game itself uses (Person.wants,
+Enemy.defeated_by, Boss.defeated_by). Each state is packed into one int:
+
+    cave id | inventory bitset | health
+
+The game never takes an item away, and that keeps the rest of the state
+implied by the inventory:
+    - The inventory is a set, as no rule depends on how many of an item are
+      held, and a cave's item counts as taken once an item of that name is held.
+    - A finished quest shows up as the person's reward in the inventory, which
+      is all a quest ever changes.
+    - A defeated enemy shows up as its drop. Picking up what it guarded is part
+      of the same action ("fight and pickup", two commands). A plan that
+      leaves the item behind and comes back for it is never shorter, so an
+      enemy whose item is still there counts as alive.
+States that would play out identically are counted once, which is what
+lets generated worlds be searched in seconds.
+
+Check world files, or a generated world:
+    python solver.py [world files] [--seed N --size N] [--workers N]
+"""
+
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import health
+from character import Boss, Enemy, Person
+
+# Frontiers smaller than this are expanded in-process even with workers.
+PARALLEL_MIN = 4096
+CHUNK_SIZE = 2048
+EXAMPLES = 3
+
+
+class Model:
+    """Class holding the rules of a world as integer ids and bitsets."""
+
+    def __init__(self, world):
+        """
+        Initialize a Model from a world.
+
+        Every cave of the world is visited, so generated worlds are built in full.
+
+        Args:
+            world (World): The world to model.
+        """
+        caves = list(world.caves.values())
+        self.names = [cave.get_name() for cave in caves]
+        index = {name: number for number, name in enumerate(self.names)}
+
+        item_names = {name.lower() for name in world.items}
+        item_names.update(item.get_name().lower() for item in world.inventory)
+        for cave in caves:
+            item, character = cave.get_item(), cave.get_character()
+            if item:
+                item_names.add(item.get_name().lower())
+            if isinstance(character, Enemy) and character.drop:
+                item_names.add(character.drop.get_name().lower())
+            if isinstance(character, Person):
+                item_names.add(character.reward_item.get_name().lower())
+        self.items = sorted(item_names)
+        bits = {name: 1 << number for number, name in enumerate(self.items)}
+
+        def bit(item):
+            return bits[item.get_name().lower()] if item else 0
+
+        def mask(check):
+            return sum(bits[name] for name in self.items if check(name))
+
+        self.start = index[world.start.get_name()]
+        self.start_inventory = sum(bit(item) for item in world.inventory)
+        self.exits = []
+        self.cave_items = []
+        # Per cave, for whoever lives there: (weakness mask, drop bit) for an
+        # enemy, (wanted mask, reward bit) for a person, or the pairs of items
+        # that defeat a boss.
+        self.enemies = []
+        self.people = []
+        self.bosses = []
+        for cave in caves:
+            self.exits.append(
+                tuple((index[name], ("move", direction)) for direction, name in cave.get_exits())
+            )
+            self.cave_items.append(bit(cave.get_item()))
+            character = cave.get_character()
+            enemy = person = boss = None
+            if isinstance(character, Boss):
+                boss = [
+                    (bits[first] | bits[second], f"{first}, {second}")
+                    for first, second in combinations(self.items, 2)
+                    if character.defeated_by([first, second])
+                ]
+            elif isinstance(character, Enemy):
+                enemy = (mask(character.defeated_by), bit(character.drop))
+            elif isinstance(character, Person):
+                person = (mask(character.wants), bit(character.reward_item))
+            self.enemies.append(enemy)
+            self.people.append(person)
+            self.bosses.append(boss)
+
+        self.item_shift = max(1, (len(caves) - 1).bit_length())
+        self.health_shift = self.item_shift + len(self.items)
+
+    def pack(self, cave: int, inventory: int, hp: int):
+        """Pack the parts of a state into one int."""
+        return cave | inventory << self.item_shift | hp << self.health_shift
+
+    def unpack(self, state: int):
+        """Return (cave, inventory, health) for a packed state."""
+        return (
+            state & ((1 << self.item_shift) - 1),
+            (state >> self.item_shift) & ((1 << len(self.items)) - 1),
+            state >> self.health_shift,
+        )
+
+    def item_name(self, mask: int):
+        """Return the name of the lowest item in a mask."""
+        return self.items[(mask & -mask).bit_length() - 1]
+
+    def expand(self, state: int, damage: bool = False):
+        """
+        List what can happen from a state.
+
+        Args:
+            state (int): The packed state.
+            damage (bool): Also follow actions that only cost health.
+        Returns:
+            tuple: (list of (next state, commands used, action), number of
+                actions that kill the player, winning action or None).
+                Actions that change nothing are left out.
+        """
+        cave = state & ((1 << self.item_shift) - 1)
+        inventory = (state >> self.item_shift) & ((1 << len(self.items)) - 1)
+        hp = state >> self.health_shift
+        pack = self.pack
+        # Moving only changes the cave, which is the lowest field.
+        rest = state - cave
+        successors = [(destination | rest, 1, move) for destination, move in self.exits[cave]]
+        deaths = 0
+        win = None
+        item = self.cave_items[cave]
+        enemy = self.enemies[cave]
+        person = self.people[cave]
+        boss = self.bosses[cave]
+        guarded = enemy is not None or boss is not None
+        held = bin(inventory).count("1")
+        item_wanted = item and not inventory & item
+
+        if item_wanted:
+            if not guarded:
+                successors.append((pack(cave, inventory | item, hp), 1, ("pickup", None)))
+            elif damage and hp > 1:
+                successors.append((pack(cave, inventory, hp - 1), 1, ("pickup", None)))
+            elif damage:
+                deaths += 1
+
+        if enemy is not None:
+            weakness, drop = enemy
+            usable = inventory & weakness
+            deaths += held - bin(usable).count("1")
+            if usable:
+                name = self.item_name(usable)
+                if not inventory & drop:
+                    successors.append((pack(cave, inventory | drop, hp), 1, ("fight", name)))
+                if item_wanted:
+                    successors.append(
+                        (pack(cave, inventory | drop | item, hp), 2, ("fight and pickup", name))
+                    )
+        if boss is not None:
+            winning = [text for pair, text in boss if inventory & pair == pair]
+            deaths += held * (held - 1) // 2 - len(winning)
+            if winning:
+                win = ("fight", winning[0])
+
+        if person is not None:
+            wanted, reward = person
+            offered = inventory & wanted
+            if offered and reward and not inventory & reward:
+                successors.append(
+                    (pack(cave, inventory | reward, hp), 1, ("give", self.item_name(offered)))
+                )
+        elif guarded and inventory and damage:
+            if hp > 2:
+                successors.append(
+                    (pack(cave, inventory, hp - 2), 1, ("give", self.item_name(inventory)))
+                )
+            else:
+                deaths += 1
+        return successors, deaths, win
+
+    def reachable_caves(self):
+        """Return the ids of the caves that can be walked to from the start."""
+        seen = bytearray(len(self.names))
+        seen[self.start] = 1
+        stack = [self.start]
+        while stack:
+            for destination, _ in self.exits[stack.pop()]:
+                if not seen[destination]:
+                    seen[destination] = 1
+                    stack.append(destination)
+        return [cave for cave in range(len(self.names)) if seen[cave]]
+
+    def obtainable(self, caves: list):
+        """
+        Work out every item the player can end up holding, however long it takes.
+
+        Args:
+            caves (list): The ids of the caves the player can reach.
+        Returns:
+            int: The inventory bitset.
+        """
+        inventory = self.start_inventory
+        changed = True
+        while changed:
+            changed = False
+            for cave in caves:
+                gained = 0
+                enemy, person = self.enemies[cave], self.people[cave]
+                if enemy is not None:
+                    if inventory & enemy[0]:
+                        gained = enemy[1] | self.cave_items[cave]
+                elif self.bosses[cave] is None:
+                    gained = self.cave_items[cave]
+                if person is not None and inventory & person[0]:
+                    gained |= person[1]
+                if gained & ~inventory:
+                    inventory |= gained
+                    changed = True
+        return inventory
+
+    def winnable(self):
+        """
+        Check whether the world can be won, without searching for how.
+
+        Nothing in the game is ever used up, so this only has to find every
+        item the player can get and check them against each reachable boss.
+
+        Returns:
+            bool: True if the world can be won.
+        """
+        caves = self.reachable_caves()
+        inventory = self.obtainable(caves)
+        return any(
+            inventory & pair == pair
+            for cave in caves
+            for pair, _ in self.bosses[cave] or ()
+        )
+
+    def commands(self, cave: int, action: tuple):
+        """
+        Return the lines a player types to take an action.
+
+        Args:
+            cave (int): The cave the action is taken in.
+            action (tuple): (kind, argument) as returned by expand.
+        Returns:
+            list: Input lines for GameSession.step.
+        """
+        kind, argument = action
+        if kind == "move" and len(self.exits[cave]) == 1:
+            return ["move"]
+        if kind == "fight and pickup":
+            return ["fight", argument, "pickup"]
+        return [kind] if argument is None else [kind, argument]
+
+
+class Solution:
+    """Class holding what a search of a world found."""
+
+    def __init__(self):
+        """Initialize an empty Solution."""
+        # Input lines for the shortest win, and how many commands it takes.
+        self.commands = None
+        self.length = None
+        self.states = 0
+        self.deaths = 0
+        # Input that leads to a few examples of each, and how many there are.
+        self.dead_ends = []
+        self.dead_end_count = 0
+        self.softlocks = []
+        self.softlock_count = 0
+        self.complete = True
+        self.seconds = 0.0
+
+    @property
+    def winnable(self):
+        """Return True if the search found a way to win."""
+        return self.commands is not None
+
+
+_worker_model = None
+_worker_damage = False
+
+
+def _init_worker(model: Model, damage: bool):
+    """Set up a worker process with the model to expand states with."""
+    global _worker_model, _worker_damage
+    _worker_model = model
+    _worker_damage = damage
+
+
+def _expand_chunk(chunk: list):
+    """Expand a list of states in a worker process."""
+    return [_worker_model.expand(state, _worker_damage) for state in chunk]
+
+
+def solve(world, workers: int = 1, damage: bool = False, max_states: int | None = None):
+    """
+    Search every state reachable in a world.
+
+    States are explored in order of how many commands it takes to reach them
+    (actions cost one or two commands), so the first win found is a shortest
+    one. Afterwards, states from which no win can be reached are found by
+    searching backwards from the winning states.
+
+    Args:
+        world (World): The world to search.
+        workers (int): Processes to expand large frontiers with.
+        damage (bool): Also follow actions that only cost health, like
+            picking up a guarded item. They never help, but their states are
+            part of the game.
+        max_states (int): Stop after this many states. None searches them all.
+    Returns:
+        Solution: The shortest win, if any, and the states found.
+    """
+    started = time.perf_counter()
+    model = Model(world)
+    solution = Solution()
+    states = [model.pack(model.start, model.start_inventory, health.STARTING_HEALTH)]
+    # The transposition table: packed state to its position in states.
+    index = {states[0]: 0}
+    distances = array("i", [0])
+    parents = array("i", [-1])
+    actions = [None]
+    expanded = bytearray(1)
+    edges_from = array("i")
+    edges_to = array("i")
+    winners = []
+    dead_ends = []
+    best = None
+    # buckets[n] holds the states first reached with n commands.
+    buckets = [[0]]
+    distance = 0
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model, damage))
+    try:
+        while any(buckets[distance:]):
+            # Skip states since reached more cheaply from another bucket.
+            frontier = [
+                position
+                for position in buckets[distance]
+                if distances[position] == distance and not expanded[position]
+            ]
+            buckets[distance] = None
+            batch = [states[position] for position in frontier]
+            if executor is not None and len(batch) >= PARALLEL_MIN:
+                chunks = [batch[start:start + CHUNK_SIZE] for start in range(0, len(batch), CHUNK_SIZE)]
+                results = [result for chunk in executor.map(_expand_chunk, chunks) for result in chunk]
+            else:
+                results = [model.expand(state, damage) for state in batch]
+
+            # Actions cost at most two commands.
+            while len(buckets) < distance + 3:
+                buckets.append([])
+            lookup = index.get
+            for position, (successors, deaths, win) in zip(frontier, results):
+                expanded[position] = 1
+                solution.deaths += deaths
+                if win is not None:
+                    winners.append(position)
+                    if best is None:
+                        best = (position, win)
+                moved = False
+                for state, cost, action in successors:
+                    reached = distance + cost
+                    target = lookup(state)
+                    if target is None:
+                        target = len(states)
+                        index[state] = target
+                        states.append(state)
+                        distances.append(reached)
+                        parents.append(position)
+                        actions.append(action)
+                        expanded.append(0)
+                        buckets[reached].append(target)
+                    elif distances[target] > reached:
+                        distances[target] = reached
+                        parents[target] = position
+                        actions[target] = action
+                        buckets[reached].append(target)
+                    if target != position:
+                        moved = True
+                    edges_from.append(position)
+                    edges_to.append(target)
+                if not moved and win is None:
+                    dead_ends.append(position)
+            distance += 1
+            if max_states is not None and len(states) >= max_states:
+                solution.complete = not any(buckets[distance:])
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    def path(position, last=None):
+        steps = []
+        while position > 0:
+            steps.append((parents[position], actions[position]))
+            position = parents[position]
+        steps.reverse()
+        if last is not None:
+            steps.append(last)
+        lines = []
+        for origin, action in steps:
+            lines += model.commands(model.unpack(states[origin])[0], action)
+        return lines
+
+    if best is not None:
+        solution.commands = path(best[0], best)
+        solution.length = distances[best[0]] + 1
+
+    # Walk the edges backwards from the winning states to find the states that can still win.
+    count = len(states)
+    starts = array("i", bytes(4 * (count + 1)))
+    for target in edges_to:
+        starts[target + 1] += 1
+    for position in range(count):
+        starts[position + 1] += starts[position]
+    sources = array("i", bytes(4 * len(edges_to)))
+    fill = array("i", starts)
+    for source, target in zip(edges_from, edges_to):
+        sources[fill[target]] = source
+        fill[target] += 1
+    can_win = bytearray(count)
+    queue = []
+    for position in winners:
+        if not can_win[position]:
+            can_win[position] = 1
+            queue.append(position)
+    while queue:
+        position = queue.pop()
+        for source in sources[starts[position]:starts[position + 1]]:
+            if not can_win[source]:
+                can_win[source] = 1
+                queue.append(source)
+
+    stuck = [position for position in range(count) if expanded[position] and not can_win[position]]
+    solution.softlock_count = len(stuck)
+    solution.softlocks = [path(position) for position in stuck[:EXAMPLES]]
+    solution.dead_end_count = len(dead_ends)
+    solution.dead_ends = [path(position) for position in dead_ends[:EXAMPLES]]
+    solution.states = count
+    solution.seconds = time.perf_counter() - started
+    return solution
+
+
+def report(name: str, solution: Solution):
+    """Print what a search found."""
+    stopped = "" if solution.complete else " (stopped early)"
+    print(f"{name}: {solution.states:,} states in {solution.seconds:.2f} s{stopped}")
+    if solution.winnable:
+        print(f"  shortest win: {solution.length} commands")
+        print(f"    {' / '.join(solution.commands)}")
+    else:
+        print("  cannot be won")
+    print(f"  fatal actions: {solution.deaths:,}")
+    print(f"  softlocks: {solution.softlock_count:,}")
+    for lines in solution.softlocks:
+        print(f"    after: {' / '.join(lines) or '(start)'}")
+    print(f"  dead ends: {solution.dead_end_count:,}")
+    for lines in solution.dead_ends:
+        print(f"    after: {' / '.join(lines) or '(start)'}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from generator import generate_world
+    from world import DEFAULT_WORLD, build_world
+
+    parser = argparse.ArgumentParser(description="Check that worlds can be won.")
+    parser.add_argument("worlds", nargs="*", help="world files to check")
+    parser.add_argument("--seed", type=int, help="check a generated world with this seed")
+    parser.add_argument("--size", type=int, default=50, help="width and height of a generated world")
+    parser.add_argument("--workers", type=int, default=1, help="processes to search with")
+    parser.add_argument("--damage", action="store_true", help="also follow actions that cost health")
+    parser.add_argument("--max-states", type=int, help="stop after this many states")
+    parser.add_argument(
+        "--quick", action="store_true", help="only check that the world can be won"
+    )
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        checks = [(f"seed {args.seed}", generate_world(args.seed, args.size, args.size))]
+    else:
+        checks = [(str(path), build_world(path)) for path in args.worlds or [DEFAULT_WORLD]]
+    for name, world in checks:
+        if args.quick:
+            started = time.perf_counter()
+            winnable = Model(world).winnable()
+            seconds = time.perf_counter() - started
+            print(f"{name}: {'can' if winnable else 'cannot'} be won ({seconds:.2f} s)")
+        else:
+            report(name, solve(world, args.workers, args.damage, args.max_states))
@@ -0,0 +1,235 @@
+"""Module for playing scripted games without a terminal, at full speed.
+
+A transcript is a text file of what a player types, one line per command or
+answer to a prompt, in order. Pauses take no input: they are left out of the
+output, as is the tutorial's waiting, so a whole playthrough runs without
+stopping. What each line answers is echoed after its prompt, so the output
+reads like the game as played.
+
+The output can be written to standard output, or recorded as golden files,
+one per transcript, and later checked against them, as a regression suite.
+Golden files keep the transcripts' paths below the directory they share, so
+transcripts with the same name in different directories do not collide:
+
+    python -m main --transcript tests/*.txt --golden golden/
+    python -m main --transcript tests/*.txt --golden golden/ --check
+
+With reload, the game is saved and restored at the start of every turn, as
+if the player quit and came back each time. It should change nothing, so
+checking the same golden files with --reload tests saves too. The suite in
+playthroughs/ covers talking, giving, fighting and winning, and is run as:
+
+    python -m main --transcript playthroughs/*.txt --golden playthroughs/golden --check
+    python -m main --transcript playthroughs/*.txt --golden playthroughs/golden --check --reload
+
+Transcripts are played in parallel with jobs > 1, each worker process
+building the world once.
+"""
+
+import difflib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import catalog
+from output import SINKS, Event
+from saves import restore, snapshot
+from session import GameSession
+
+GOLDEN_SUFFIX = ".out"
+# Lines of a failed check's diff to show.
+MAX_DIFF_LINES = 40
+
+# The world worker processes play in (see _load_world).
+_world = None
+
+
+def read_transcript(path):
+    """
+    Read the lines of a transcript.
+
+    Args:
+        path (str): The file, or "-" for standard input.
+    Returns:
+        list: The lines, without line breaks.
+    """
+    text = sys.stdin.read() if str(path) == "-" else Path(path).read_text(encoding="utf-8")
+    return text.splitlines()
+
+
+def play_transcript(
+    lines,
+    world=None,
+    locale: str = catalog.DEFAULT_LOCALE,
+    show_tutorial: bool = True,
+    output_format: str = "plain",
+    reload: bool = False,
+):
+    """
+    Play a game from a transcript, without pausing.
+
+    Lines left over once the game is over are ignored.
+
+    Args:
+        lines (list): What the player types, one line per prompt.
+        world (World): The world to play in. Defaults to the shared default world.
+        locale (str): The language to play in.
+        show_tutorial (bool): Whether to show the tutorial first.
+        output_format (str): "plain", "ansi" or "json".
+        reload (bool): Save and restore the game at the start of every turn.
+    Returns:
+        str: Everything the game wrote, with the lines echoed after their prompts.
+    """
+    sink = SINKS[output_format]()
+    session = GameSession(world, locale)
+    events = session.start(show_tutorial)
+    for line in lines:
+        if session.over:
+            break
+        if reload and session.at_turn_start:
+            session, _ = restore(world, snapshot(session), session.locale)
+        events.append(Event("input", line))
+        events += session.step(line)
+    return sink.render([event for event in events if event.kind != "pause"])
+
+
+def transcript_root(paths):
+    """Return the deepest directory holding every transcript file in paths."""
+    directories = [str(Path(path).resolve().parent) for path in paths if str(path) != "-"]
+    return Path(os.path.commonpath(directories)) if directories else Path.cwd()
+
+
+def golden_path(golden, transcript, root=None):
+    """
+    Return the golden file of a transcript.
+
+    Args:
+        golden (Path): The directory of golden files.
+        transcript (Path): The transcript file, or "-" for standard input.
+        root (Path): The directory the transcript's path is kept below (see
+            transcript_root). Defaults to the transcript's own directory.
+    Returns:
+        Path: The golden file, with the transcript's suffix replaced by GOLDEN_SUFFIX.
+    """
+    if str(transcript) == "-":
+        return Path(golden) / ("-" + GOLDEN_SUFFIX)
+    path = Path(transcript).resolve()
+    relative = path.relative_to(root) if root is not None else Path(path.name)
+    return Path(golden) / relative.with_suffix(GOLDEN_SUFFIX)
+
+
+def _load_world(world_path, seed, size):
+    """Build the world transcripts are played in, once per process."""
+    global _world
+    if seed is not None:
+        from generator import generate_world
+
+        _world = generate_world(seed, size, size)
+    elif world_path is not None:
+        from world import shared_world
+
+        _world = shared_world(world_path)
+    else:
+        _world = None
+
+
+def _play_file(path, locale, show_tutorial, output_format, reload):
+    """Play one transcript file in the process's world, returning the output."""
+    lines = read_transcript(path)
+    return play_transcript(lines, _world, locale, show_tutorial, output_format, reload)
+
+
+def run(
+    paths,
+    golden=None,
+    check: bool = False,
+    jobs: int = 1,
+    world_path=None,
+    seed=None,
+    size: int = 1000,
+    locale: str = catalog.DEFAULT_LOCALE,
+    show_tutorial: bool = True,
+    output_format: str = "plain",
+    reload: bool = False,
+):
+    """
+    Play transcripts, writing or checking their output.
+
+    Args:
+        paths (list): Transcript files, or "-" for standard input.
+        golden (Path): Directory of golden files: write the outputs there, or
+            with check, compare them with what is there. None writes the
+            outputs to standard output.
+        check (bool): Compare with the golden files instead of writing them.
+        jobs (int): How many processes to play transcripts in.
+        world_path (Path): The world file to play in, or None for the default.
+        seed (int): Play a generated world with this seed instead.
+        size (int): Width and height of the generated world.
+        locale (str): The language to play in.
+        show_tutorial (bool): Whether to show the tutorial first.
+        output_format (str): "plain", "ansi" or "json".
+        reload (bool): Save and restore each game at the start of every turn.
+    Returns:
+        int: The exit status: 1 if any check failed, otherwise 0.
+    """
+    started = time.perf_counter()
+    options = (locale, show_tutorial, output_format, reload)
+    if "-" in map(str, paths) or jobs <= 1 or len(paths) == 1:
+        _load_world(world_path, seed, size)
+        outputs = (_play_file(path, *options) for path in paths)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(jobs, initializer=_load_world, initargs=(world_path, seed, size))
+        chunk = max(1, len(paths) // (jobs * 4))
+        outputs = pool.map(
+            _play_file, paths, *([option] * len(paths) for option in options), chunksize=chunk
+        )
+
+    failed = 0
+    root = transcript_root(paths)
+    try:
+        for path, output in zip(paths, outputs):
+            if golden is None:
+                if len(paths) > 1:
+                    sys.stdout.write(f"==> {path} <==\n")
+                sys.stdout.write(output)
+            elif not check:
+                expected = golden_path(golden, path, root)
+                expected.parent.mkdir(parents=True, exist_ok=True)
+                expected.write_text(output, encoding="utf-8")
+            elif not _matches(path, golden_path(golden, path, root), output):
+                failed += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if golden is not None:
+        elapsed = (time.perf_counter() - started) * 1e3
+        done = f"{len(paths)} written"
+        if check:
+            done = f"{len(paths) - failed} passed, {failed} failed"
+        print(f"{done} in {elapsed:.0f} ms ({elapsed / max(1, len(paths)):.2f} ms per transcript)")
+    return 1 if failed else 0
+
+
+def _matches(path, golden, output: str):
+    """Compare a transcript's output with its golden file, printing a diff if they differ."""
+    try:
+        expected = golden.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        print(f"FAILED {path}: no golden file {golden}")
+        return False
+    if output == expected:
+        return True
+    print(f"FAILED {path}")
+    diff = difflib.unified_diff(
+        expected.splitlines(), output.splitlines(), str(golden), "output", lineterm=""
+    )
+    for number, line in enumerate(diff):
+        if number == MAX_DIFF_LINES:
+            print("...")
+            break
+        print(line)
+    return False
@@ -0,0 +1,331 @@
+"""Module for playing in a full-screen terminal interface.
+
+The screen is split into fixed panes: the room (what the game has said since
+the current turn began) on the left, health and inventory on the right, and
+an input bar along the bottom. Each frame is drawn into a Canvas of cells,
+then compared with the frame already on the screen, and only the runs of
+cells that changed are written, with one write per frame. Between turns
+most of the screen stays the same, so far less is sent than a repaint,
+which matters over slow SSH links.
+
+Paragraphs are wrapped to the room pane's width by wrap(), which caches by
+(text, width). A resize changes the width, so the frame after it is wrapped
+afresh and repainted in full.
+
+Input is read a line at a time, with the terminal's own line editing. The
+bar sits one row above the bottom, so pressing enter never scrolls the
+screen, and what the terminal echoed is recorded in the previous frame so
+the next diff clears it.
+"""
+
+import os
+import signal
+import sys
+import textwrap
+from functools import lru_cache
+
+import catalog
+from catalog import tr
+
+SIDE_WIDTH = 24
+DEFAULT_SIZE = (80, 24)
+BLANK = (" ", None)
+# Runs of changed cells closer than this are written as one run, unchanged
+# cells and all, as that is shorter than moving the cursor between them.
+MERGE_GAP = 6
+
+CLEAR = "\x1b[2J"
+RESET = "\x1b[0m"
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+ALTERNATE_SCREEN = "\x1b[?1049h"
+MAIN_SCREEN = "\x1b[?1049l"
+
+
+@lru_cache(maxsize=4096)
+def wrap(text: str, width: int):
+    """
+    Wrap text to a width, keeping its line breaks and leading indentation.
+
+    Args:
+        text (str): The text, possibly several lines.
+        width (int): The most characters on a line.
+    Returns:
+        tuple: The wrapped lines.
+    """
+    lines = []
+    for paragraph in text.split("\n"):
+        lines += textwrap.wrap(paragraph, max(1, width)) or [""]
+    return tuple(lines)
+
+
+@lru_cache(maxsize=None)
+def _style(color: str | None):
+    """Return the escape code that switches to a termcolor colour name."""
+    if color is None:
+        return RESET
+    from termcolor import COLORS
+
+    return f"\x1b[{COLORS[color]}m"
+
+
+class Canvas:
+    """Class holding one frame: a grid of (character, colour) cells."""
+
+    __slots__ = ("width", "height", "rows")
+
+    def __init__(self, width: int, height: int):
+        """
+        Initialize a blank Canvas.
+
+        Args:
+            width (int): Columns.
+            height (int): Rows.
+        """
+        self.width = width
+        self.height = height
+        self.rows = [[BLANK] * width for _ in range(height)]
+
+    def write(self, row: int, column: int, text: str, color: str | None = None, limit=None):
+        """
+        Write text at a position, cut off at the edge of the canvas.
+
+        Args:
+            row (int): The row, from 0 at the top.
+            column (int): The column, from 0 at the left.
+            text (str): The text. It should not contain line breaks.
+            color (str): termcolor colour name, or None for the default colour.
+            limit (int): Also cut it off at this column.
+        """
+        if not 0 <= row < self.height:
+            return
+        end = min(self.width, limit if limit is not None else self.width)
+        cells = self.rows[row]
+        for offset, char in enumerate(text[: max(0, end - column)]):
+            cells[column + offset] = (char, color)
+
+
+def diff(previous: Canvas | None, current: Canvas):
+    """
+    Return the output that turns the previous frame into the current one.
+
+    Args:
+        previous (Canvas): The frame on the screen, or None to repaint in full.
+        current (Canvas): The frame to show.
+    Returns:
+        str: Cursor movements, colour changes and characters.
+    """
+    parts = [RESET]
+    if previous is None:
+        # A cleared screen is a blank frame, so only what is not blank is written.
+        parts.append(CLEAR)
+        previous = Canvas(current.width, current.height)
+    style = None
+    for y, (old, new) in enumerate(zip(previous.rows, current.rows)):
+        if old == new:
+            continue
+        x, width = 0, len(new)
+        while x < width:
+            if old[x] == new[x]:
+                x += 1
+                continue
+            end, unchanged = x + 1, 0
+            while end < width and unchanged <= MERGE_GAP:
+                unchanged = unchanged + 1 if old[end] == new[end] else 0
+                end += 1
+            end -= unchanged
+            parts.append(f"\x1b[{y + 1};{x + 1}H")
+            for char, color in new[x:end]:
+                if color != style:
+                    parts.append(_style(color))
+                    style = color
+                parts.append(char)
+            x = end
+    if style is not None:
+        parts.append(RESET)
+    return "".join(parts) if len(parts) > 1 else ""
+
+
+class FullScreen:
+    """Class showing a game's events full-screen and reading the player's answers."""
+
+    def __init__(self, stream=None, answers=None, size: tuple | None = None):
+        """
+        Initialize a FullScreen object.
+
+        Args:
+            stream (file): Where to draw. Defaults to standard output.
+            answers (file): Where to read the player's answers. Defaults to standard input.
+            size (tuple): (columns, rows) to draw at, instead of the terminal's size.
+        """
+        self.stream = stream or sys.stdout
+        self.answers = answers or sys.stdin
+        self.fixed_size = size
+        # What the game has said this turn, as (text, colour), and the bar's text.
+        self.lines = []
+        self.bar = ""
+        self.session = None
+        self.previous = None
+        self.waiting = False
+        self.pausing = False
+        self.closed = False
+        self.frames = 0
+        self.bytes_written = 0
+        self._old_handler = None
+
+    def __enter__(self):
+        """Switch to the terminal's alternate screen, and redraw when it is resized."""
+        self.stream.write(ALTERNATE_SCREEN)
+        if hasattr(signal, "SIGWINCH") and self.stream.isatty():
+            self._old_handler = signal.signal(signal.SIGWINCH, self._resized)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Switch back to the main screen, as it was before the game."""
+        if self._old_handler is not None:
+            signal.signal(signal.SIGWINCH, self._old_handler)
+        self.stream.write(RESET + SHOW_CURSOR + MAIN_SCREEN)
+        self.stream.flush()
+
+    def _resized(self, signum, frame):
+        """Repaint in full at the new size, at once if waiting for the player."""
+        self.previous = None
+        if self.waiting:
+            self.draw()
+
+    def size(self):
+        """Return the (columns, rows) to draw at."""
+        if self.fixed_size:
+            return self.fixed_size
+        try:
+            return tuple(os.get_terminal_size(self.stream.fileno()))
+        except (AttributeError, OSError, ValueError):
+            return DEFAULT_SIZE
+
+    def show(self, events, session):
+        """
+        Show a list of game events, waiting for the player at pauses and prompts.
+
+        Args:
+            events (list): Events returned by the session.
+            session (GameSession): The session, for its health and inventory.
+        Returns:
+            str or None: The player's answer to the final prompt, if there was one.
+        """
+        self.session = session
+        for event in events:
+            match event.kind:
+                case "rule":
+                    self.lines.clear()
+                case "text":
+                    self.lines.append((event.text, event.color))
+                case "prompt":
+                    if event.text.strip("\n"):
+                        self.lines.append((event.text.rstrip("\n"), event.color))
+                    return self.ask("> ")
+                case "pause":
+                    self.ask(event.text or self.text("tutorial.continue"), pause=True)
+                case "end":
+                    self.ask(self.text("tutorial.continue"), pause=True)
+        return None
+
+    def text(self, key: str, **fields):
+        """Fill in a message in the session's language."""
+        with catalog.using(self.session.locale):
+            return tr(key, **fields)
+
+    def ask(self, bar: str, pause: bool = False):
+        """
+        Draw the frame with some text in the input bar, and read a line.
+
+        Args:
+            bar (str): The text before the cursor.
+            pause (bool): Whether this only waits for enter.
+        Returns:
+            str: The line, without its line break. At the end of input this
+                is "" for a pause and "quit" otherwise.
+        """
+        self.bar = bar
+        self.pausing = pause
+        self.draw()
+        self.waiting = True
+        try:
+            line = "" if self.closed else self.answers.readline()
+        finally:
+            self.waiting = False
+        if not line:
+            self.closed = True
+            return "" if pause else "quit"
+        answer = line.rstrip("\r\n")
+        # The terminal echoed the answer after the bar; keep the frame in step.
+        row, column = self.bar_position()
+        if self.previous is not None:
+            if column + len(answer) < self.previous.width:
+                self.previous.write(row, column, answer)
+            else:
+                self.previous = None
+        return answer
+
+    def bar_position(self):
+        """Return the (row, column) the cursor waits at."""
+        _, height = self.size()
+        return max(0, height - 2), len(self.bar)
+
+    def layout(self, width: int, height: int):
+        """
+        Draw the current state of the game into a new Canvas.
+
+        Returns:
+            Canvas: The frame.
+        """
+        canvas = Canvas(width, height)
+        side = min(SIDE_WIDTH, width // 3)
+        room_width = width - side - 1 if side >= 8 else width
+        pane_height = max(0, height - 3)
+
+        lines = []
+        for text, color in self.lines:
+            lines += ((line, color) for line in wrap(text, room_width))
+        for row, (line, color) in enumerate(lines[-pane_height:] if pane_height else ()):
+            canvas.write(row, 0, line, color, limit=room_width)
+
+        if room_width < width:
+            for row in range(pane_height):
+                canvas.write(row, room_width, "│", "green")
+            self.layout_side(canvas, room_width + 2, pane_height)
+        if height >= 3:
+            canvas.write(height - 3, 0, "─" * width, "green")
+        canvas.write(height - 2, 0, self.bar, "yellow" if self.pausing else "cyan")
+        return canvas
+
+    def layout_side(self, canvas: Canvas, column: int, height: int):
+        """Draw the health and inventory pane, starting at a column."""
+        session = self.session
+        hp = session.health
+        with catalog.using(session.locale):
+            rows = [(tr("tui.health"), "magenta"), ("♡" * hp + f" {hp}", "red"), ("", None)]
+            rows.append((tr("tui.inventory"), "magenta"))
+            names = session.inventory.names()
+            rows += ((name, None) for name in names) if names else [(tr("tui.empty"), None)]
+        for row, (text, color) in enumerate(rows[:height]):
+            canvas.write(row, column, text, color)
+
+    def draw(self):
+        """Draw the current frame, writing only what changed since the last one."""
+        width, height = self.size()
+        canvas = self.layout(width, height)
+        previous = self.previous
+        if previous is not None and (previous.width, previous.height) != (width, height):
+            previous = None
+        row, column = self.bar_position()
+        output = (
+            HIDE_CURSOR
+            + diff(previous, canvas)
+            + f"\x1b[{row + 1};{min(column, width - 1) + 1}H"
+            + SHOW_CURSOR
+        )
+        self.stream.write(output)
+        self.stream.flush()
+        self.previous = canvas
+        self.frames += 1
+        self.bytes_written += len(output.encode())
@@ -1,7 +1,11 @@
 """Module for utility functions."""
 
+from catalog import tr
+from output import say
+
+
 def death_screen():
     """Display the death screen message."""
-    print("***")
-    print("YOU HAVE DIED")
-    print("***")
+    say("***")
+    say(tr("death.banner"))
+    say("***")
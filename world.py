@@ -0,0 +1,444 @@
+"""Module that loads the game world from data files.
+
+Worlds are described by JSON files (see worlds/default.json). Loading a world
+validates it and caches the result in a binary bundle next to the source file,
+which is reused until the source changes. The shared world also moves its
+descriptions and dialogue into a content pack (see content.py) next to the
+source file.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+from cave import Cave, CaveGraph, DIRECTIONS
+from character import Person, Enemy, Boss
+from commands import BKTree
+from content import open_pack
+from item import Item
+from routing import Router
+
+DEFAULT_WORLD = Path(__file__).with_name("worlds") / "default.json"
+
+BUNDLE_MAGIC = b"CAVEWRLD"
+BUNDLE_VERSION = 1
+
+PERSON_MESSAGES = ("description", "pre_gift", "grateful", "ungrateful", "post_gift")
+ENEMY_MESSAGES = ("description", "attack_success", "attack_failure")
+# How validate names the JSON types it expects.
+_TYPE_NAMES = {str: "a string", list: "a list", dict: "an object"}
+
+
+class WorldError(ValueError):
+    """Raised when a world file is malformed or refers to things that do not exist."""
+
+
+class World:
+    """Class holding the caves, characters and items of one game world."""
+
+    def __init__(
+        self,
+        caves: dict,
+        start: Cave,
+        inventory: list,
+        items: dict = None,
+        routable: bool = True,
+        router=None,
+    ):
+        """
+        Initialize a World object.
+
+        Args:
+            caves (dict): Cave name to Cave object for every cave in the world.
+            start (Cave): The cave the player starts in.
+            inventory (list): The items the player starts with.
+            items (dict): Item name to Item object for every item in the world.
+            routable (bool): Whether a Router may be built over every cave.
+            router: A router for caves too many to index, such as
+                generator.GeneratedRouter, used instead of a Router.
+        """
+        self.caves = caves
+        self.start = start
+        self.inventory = inventory
+        self.items = items or {}
+        # Lowercase item names, for suggesting what a mistyped item name meant.
+        self.item_index = BKTree(name.lower() for name in self.items)
+        self.routable = routable
+        self._router = router
+
+    @property
+    def router(self):
+        """Return the router for this world's caves, built on first use, or None if not routable."""
+        if self._router is None and self.routable:
+            self._router = Router(self.caves)
+        return self._router
+
+
+def validate(data: dict):
+    """
+    Check world data for mistakes that would otherwise surface mid-game.
+
+    Args:
+        data (dict): World data, as read from a world file.
+    Returns:
+        list: A description of each problem found. Empty if the data is valid.
+    """
+    if not isinstance(data, dict):
+        return ["world data must be an object"]
+    problems = []
+    for key in ("start", "inventory", "caves", "links", "items"):
+        if key not in data:
+            problems.append(f"missing top-level key {key!r}")
+    if problems:
+        return problems
+
+    def check_type(value, kind, where, name):
+        if isinstance(value, kind):
+            return True
+        problems.append(f"{where}: {name} must be {_TYPE_NAMES[kind]}")
+        return False
+
+    check_type(data["start"], str, "start", "the start cave")
+    for key, kind in (("inventory", list), ("links", list), ("caves", dict), ("items", dict)):
+        check_type(data[key], kind, key, "the value")
+    for key in ("people", "enemies", "bosses"):
+        check_type(data.get(key, {}), dict, key, "the value")
+    if problems:
+        return problems
+
+    items = data["items"]
+    caves = data["caves"]
+    people = data.get("people", {})
+    enemies = data.get("enemies", {})
+    bosses = data.get("bosses", {})
+
+    for name, description in items.items():
+        check_type(description, str, f"item {name!r}", "the description")
+
+    def check_item(name, where):
+        if not check_type(name, str, where, "an item"):
+            return
+        if name not in items:
+            problems.append(f"{where}: unknown item {name!r}")
+
+    def check_messages(messages, required, where):
+        if not check_type(messages, dict, where, "messages"):
+            return
+        for key in required:
+            if key not in messages:
+                problems.append(f"{where}: missing message {key!r}")
+        for key, message in messages.items():
+            check_type(message, str, where, f"message {key!r}")
+
+    if data["start"] not in caves:
+        problems.append(f"start: unknown cave {data['start']!r}")
+    for name in data["inventory"]:
+        check_item(name, "inventory")
+
+    characters = [*people, *enemies, *bosses]
+    for name in {name for name in characters if characters.count(name) > 1}:
+        problems.append(f"character {name!r} is defined more than once")
+
+    for name, cave in caves.items():
+        where = f"cave {name!r}"
+        if not check_type(cave, dict, where, "the cave"):
+            continue
+        if "description" not in cave:
+            problems.append(f"{where}: missing description")
+        else:
+            check_type(cave["description"], str, where, "the description")
+        if "item" in cave:
+            check_item(cave["item"], where)
+        if "character" in cave and check_type(cave["character"], str, where, "the character"):
+            if cave["character"] not in characters:
+                problems.append(f"{where}: unknown character {cave['character']!r}")
+
+    for link in data["links"]:
+        if not isinstance(link, list) or len(link) != 3:
+            problems.append(f"link {link!r}: expected [from, direction, to]")
+            continue
+        if not all(isinstance(part, str) for part in link):
+            problems.append(f"link {link!r}: caves and direction must be strings")
+            continue
+        for name in (link[0], link[2]):
+            if name not in caves:
+                problems.append(f"link {link!r}: unknown cave {name!r}")
+        if link[1] != link[1].lower():
+            problems.append(f"link {link!r}: direction must be lower case")
+
+    for name, person in people.items():
+        where = f"person {name!r}"
+        if not check_type(person, dict, where, "the person"):
+            continue
+        check_messages(person.get("messages", {}), PERSON_MESSAGES, where)
+        quest_items = person.get("quest_items", [])
+        if not isinstance(quest_items, list) or len(quest_items) != 2:
+            problems.append(f"{where}: quest_items must be [wanted item, reward item]")
+        else:
+            for item in quest_items:
+                check_item(item, where)
+
+    for name, enemy in enemies.items():
+        where = f"enemy {name!r}"
+        if not check_type(enemy, dict, where, "the enemy"):
+            continue
+        check_messages(enemy.get("messages", {}), ENEMY_MESSAGES, where)
+        check_item(enemy.get("weakness", ""), where)
+        if enemy.get("drop") is not None:
+            check_item(enemy["drop"], where)
+        if "conversation" in enemy:
+            check_type(enemy["conversation"], str, where, "the conversation")
+
+    for name, boss in bosses.items():
+        where = f"boss {name!r}"
+        if not check_type(boss, dict, where, "the boss"):
+            continue
+        check_messages(boss.get("messages", {}), ENEMY_MESSAGES, where)
+        if not boss.get("weakness"):
+            problems.append(f"{where}: missing weakness list")
+        elif check_type(boss["weakness"], list, where, "the weakness"):
+            for item in boss["weakness"]:
+                check_item(item, where)
+
+    return problems
+
+
+def compile_world(source: bytes):
+    """
+    Parse and validate the contents of a world file.
+
+    Args:
+        source (bytes): The JSON world file contents.
+    Returns:
+        dict: The validated world data.
+    Raises:
+        WorldError: If the data is not valid JSON or fails validation.
+    """
+    try:
+        data = json.loads(source)
+    except json.JSONDecodeError as error:
+        raise WorldError(f"invalid JSON: {error}") from error
+    problems = validate(data)
+    if problems:
+        raise WorldError("\n".join(problems))
+    return data
+
+
+def bundle_path(path: Path):
+    """Return where the compiled bundle for a world file is cached."""
+    return path.with_suffix(".bundle")
+
+
+def load_world_data(path: Path = DEFAULT_WORLD):
+    """
+    Load validated world data, compiling the world file only if it has changed.
+
+    The bundle header holds a format version and a hash of the source, so a
+    stale or incompatible bundle is recompiled and rewritten.
+
+    Args:
+        path (Path): The JSON world file.
+    Returns:
+        dict: The validated world data.
+    """
+    path = Path(path)
+    source = path.read_bytes()
+    header = BUNDLE_MAGIC + bytes([BUNDLE_VERSION]) + hashlib.sha256(source).digest()
+    bundle = bundle_path(path)
+    try:
+        compiled = bundle.read_bytes()
+        if compiled.startswith(header):
+            return pickle.loads(compiled[len(header):])
+    except (OSError, EOFError, pickle.UnpicklingError):
+        # EOFError: a bundle cut short, e.g. by a crash in an older version.
+        pass
+
+    data = compile_world(source)
+    # Written to a temporary file and moved into place, so that a process
+    # starting at the same time never reads half a bundle.
+    temporary = bundle.with_name(f"{bundle.name}.{os.getpid()}.tmp")
+    try:
+        temporary.write_bytes(header + pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+        os.replace(temporary, bundle)
+    except OSError:
+        temporary.unlink(missing_ok=True)
+    return data
+
+
+def pack_path(path: Path):
+    """Return where the content pack for a world file is kept."""
+    return path.with_suffix(".pack")
+
+
+def pack_world_data(path: Path, data: dict):
+    """
+    Move the narrative text of world data into the world's content pack.
+
+    Args:
+        path (Path): The JSON world file the data came from.
+        data (dict): Validated world data.
+    Returns:
+        dict: A copy of the data with every description, message and
+            conversation replaced by a content.Text handle, or the data
+            unchanged if the pack could not be written.
+    """
+    texts = []
+    ids = {}
+
+    def intern(text):
+        if text not in ids:
+            ids[text] = len(texts)
+            texts.append(text)
+        return ids[text]
+
+    for cave in data["caves"].values():
+        intern(cave["description"])
+    for description in data["items"].values():
+        intern(description)
+    for kind in ("people", "enemies", "bosses"):
+        for character in data.get(kind, {}).values():
+            for message in character["messages"].values():
+                intern(message)
+            if "conversation" in character:
+                intern(character["conversation"])
+
+    store = open_pack(pack_path(path), texts)
+    if store is None:
+        return data
+    handles = [store.text(index) for index in range(len(texts))]
+
+    def handle(text):
+        return handles[ids[text]]
+
+    packed = dict(data)
+    packed["caves"] = {
+        name: {**cave, "description": handle(cave["description"])}
+        for name, cave in data["caves"].items()
+    }
+    packed["items"] = {name: handle(text) for name, text in data["items"].items()}
+    for kind in ("people", "enemies", "bosses"):
+        characters = {}
+        for name, character in data.get(kind, {}).items():
+            character = dict(character)
+            character["messages"] = {
+                key: handle(message) for key, message in character["messages"].items()
+            }
+            if "conversation" in character:
+                character["conversation"] = handle(character["conversation"])
+            characters[name] = character
+        packed[kind] = characters
+    return packed
+
+
+_loaded = {}
+_packed = {}
+
+
+def build_world(path: Path = DEFAULT_WORLD, compact: bool = False, packed: bool = False):
+    """
+    Build a fresh copy of a game world.
+
+    The world file is only loaded once per process; every call after that just
+    creates new objects from the cached data.
+
+    Args:
+        path (Path): The JSON world file.
+        compact (bool): Store cave links in a CaveGraph instead of a dict per
+            cave. Uses less memory on very large worlds, but only allows
+            the directions in cave.DIRECTIONS.
+        packed (bool): Hold descriptions and dialogue as handles into the
+            world's content pack instead of as strings.
+    Returns:
+        World: The caves, characters and items, ready to be played.
+    """
+    path = Path(path)
+    if packed:
+        if path not in _packed:
+            _packed[path] = pack_world_data(path, load_world_data(path))
+        data = _packed[path]
+    else:
+        if path not in _loaded:
+            _loaded[path] = load_world_data(path)
+        data = _loaded[path]
+
+    items = {name: Item(name, description) for name, description in data["items"].items()}
+
+    characters = {}
+    for name, person in data.get("people", {}).items():
+        characters[name] = Person(
+            name=name,
+            messages=person["messages"],
+            quest_items=[items[item] for item in person["quest_items"]],
+        )
+    for name, enemy in data.get("enemies", {}).items():
+        characters[name] = Enemy(
+            name=name,
+            weakness=enemy["weakness"],
+            messages=enemy["messages"],
+            drop=items.get(enemy.get("drop")),
+        )
+        if "conversation" in enemy:
+            characters[name].set_conversation(enemy["conversation"])
+    for name, boss in data.get("bosses", {}).items():
+        characters[name] = Boss(
+            name=name,
+            weakness=list(boss["weakness"]),
+            messages=boss["messages"],
+        )
+
+    graph = CaveGraph() if compact else None
+    caves = {}
+    for name, spec in data["caves"].items():
+        cave = graph.add_cave(name) if compact else Cave(name)
+        cave.set_description(spec["description"])
+        if "item" in spec:
+            cave.set_item(items[spec["item"]])
+        if "character" in spec:
+            cave.set_character(characters[spec["character"]])
+        caves[name] = cave
+    for origin, direction, destination in data["links"]:
+        if compact and direction not in DIRECTIONS:
+            raise WorldError(f"compact worlds only support {DIRECTIONS}, not {direction!r}")
+        caves[origin].link_cave(caves[destination], direction)
+
+    return World(
+        caves=caves,
+        start=caves[data["start"]],
+        inventory=[items[name] for name in data["inventory"]],
+        items=items,
+    )
+
+
+_shared = {}
+
+
+def shared_world(path: Path = DEFAULT_WORLD):
+    """
+    Return the process-wide World for a world file, building it on first use.
+
+    The returned world is shared by every GameSession and must not be modified;
+    sessions copy the parts they change.
+
+    Args:
+        path (Path): The JSON world file.
+    Returns:
+        World: The shared world.
+    """
+    path = Path(path)
+    if path not in _shared:
+        _shared[path] = build_world(path, packed=True)
+    return _shared[path]
+
+
+if __name__ == "__main__":
+    import sys
+
+    for world_file in sys.argv[1:] or [DEFAULT_WORLD]:
+        try:
+            load_world_data(world_file)
+        except WorldError as error:
+            print(f"{world_file}:\n{error}")
+            sys.exit(1)
+        print(f"{world_file}: ok, bundle written to {bundle_path(Path(world_file))}")